@@ -0,0 +1,132 @@
+"""
+Parity check and benchmark for the NLI inference backends.
+
+Each backend is loaded in a fresh process so its peak RSS can be measured
+independently. Contradiction scores from every backend are compared against the
+fp32 PyTorch backend; the run exits non-zero if any backend drifts beyond its
+tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.nli_backends [--backends torch torch-int8 onnx] [--repeats 20]
+"""
+from typing import Dict, List
+import multiprocessing
+import statistics
+import argparse
+import resource
+import json
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.nli_backends import load_nli_backend, softmax
+from services.nli_model import NLI_MODEL_NAME
+
+# Maximum absolute difference in contradiction score allowed against fp32 torch
+TOLERANCES = {
+    'torch': 0.0,
+    'torch-int8': 0.1,
+    'onnx': 1e-3
+}
+
+STATEMENTS = [
+    "Users must be able to log in with their university account.",
+    "The system should never require a login.",
+    "All data shall be stored encrypted at rest.",
+    "Data can be stored in plain text to keep things simple.",
+    "The app should load in under two seconds.",
+    "It is fine if pages take a while to load.",
+    "Librarians can edit every booking.",
+    "Only the person who made a booking can change it.",
+]
+
+def _build_pairs() -> List[tuple]:
+    wrapped = [
+        f"In a requirement elicitation survey about the System, when asked 'What do you need?', the stakeholder responded: {s}"
+        for s in STATEMENTS
+    ]
+    return [(a, b) for a in wrapped for b in wrapped if a != b]
+
+def _run_backend(backend_name: str, onnx_path: str, batch_size: int, repeats: int, out_queue):
+    """Load one backend, score all pairs and time repeated batches (runs in a subprocess)."""
+    from transformers import AutoTokenizer
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    backend = load_nli_backend(backend_name, NLI_MODEL_NAME, onnx_path=onnx_path)
+    tokenizer = AutoTokenizer.from_pretrained(NLI_MODEL_NAME, use_fast=False)
+    pairs = _build_pairs()
+
+    def score(batch):
+        inputs = tokenizer(
+            [p for p, _ in batch], [h for _, h in batch],
+            padding=True, truncation=True, return_tensors=backend.tensor_type
+        )
+        return softmax(backend.logits(inputs))[:, 0].tolist()
+
+    scores = []
+    for start in range(0, len(pairs), batch_size):
+        scores.extend(score(pairs[start:start + batch_size]))
+
+    batch = pairs[:batch_size]
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        score(batch)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    out_queue.put({
+        "backend": backend_name,
+        "scores": scores,
+        "batch_size": len(batch),
+        "latency_ms_p50": statistics.median(latencies),
+        "latency_ms_mean": statistics.mean(latencies),
+        "latency_ms_min": min(latencies),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "load_rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    })
+
+def run(backends: List[str], onnx_path: str, batch_size: int, repeats: int) -> Dict:
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for backend_name in ['torch'] + [b for b in backends if b != 'torch']:
+        out_queue = context.Queue()
+        process = context.Process(target=_run_backend, args=(backend_name, onnx_path, batch_size, repeats, out_queue))
+        process.start()
+        results[backend_name] = out_queue.get()
+        process.join()
+
+    reference = results['torch']['scores']
+    for backend_name, result in results.items():
+        max_diff = max(abs(a - b) for a, b in zip(result.pop('scores'), reference))
+        result['max_abs_diff_vs_fp32'] = max_diff
+        result['tolerance'] = TOLERANCES.get(backend_name, 0.0)
+        result['parity_ok'] = max_diff <= result['tolerance']
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=['torch', 'torch-int8', 'onnx'])
+    parser.add_argument('--onnx-path', default=os.path.join(os.path.dirname(__file__), '../nli_onnx/nli-deberta-v3-small.onnx'))
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.backends, args.onnx_path, args.batch_size, args.repeats)
+
+    print(f"{'backend':<12} {'p50 ms':>8} {'mean ms':>8} {'peak RSS MB':>12} {'max diff':>10}  parity")
+    for name, r in results.items():
+        print(f"{name:<12} {r['latency_ms_p50']:>8.1f} {r['latency_ms_mean']:>8.1f} {r['peak_rss_mb']:>12.0f} "
+              f"{r['max_abs_diff_vs_fp32']:>10.4f}  {'ok' if r['parity_ok'] else 'FAIL'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if not all(r['parity_ok'] for r in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+"""
+Microbenchmarks for the backend hot paths.
+
+Runs offline and deterministically: the NLI cross-encoder is replaced by a small
+hashed bag-of-words stand-in behind the real batching scheduler, and LLM calls go
+to the mock LLM backend with zero latency. Results are written as JSON so runs on
+different commits can be compared with --compare.
+
+Benchmarks:
+    consistency     ConsistencyService.check_consistency as the number of previous segments grows (cold and cached)
+    similarity      RequirementService._calculate_similarity for short and long texts
+    stability       RequirementService.get_question_stability as the number of segments grows
+    logger          Logger.log latency (as seen by the caller) as each log file grows
+    cancel          AnalysisService._cancel_existing_analysis with deep queues
+    prompts         Prompt construction in DetectorService, InterventionService and RequirementService
+    llm_roundtrip   LLMManager.submit_request_async overhead on the mock backend
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmarks [--only consistency logger] [--repeats 20] [--output results.json]
+    python -m benchmarks.run_benchmarks --output new.json --compare old.json
+"""
+from typing import Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import statistics
+import tempfile
+import argparse
+import platform
+import asyncio
+import hashlib
+import logging
+import json
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Configure before any service reads APIConfig: offline LLM, no token budget in the way
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('MOCK_LLM_LATENCY', 'fixed:0')
+os.environ.setdefault('GPT4_TPM', '0')
+os.environ.setdefault('GPT4_RPM', '0')
+
+import numpy as np
+
+from services.api_config import APIConfig
+from services.nli_model import NLIModel, ContextText
+from services.nli_scheduler import NLIBatchScheduler
+from services.consistency_service import ConsistencyService
+from services.requirement_service import RequirementService
+from services.intervention_service import InterventionService
+from services.understandability_service import DetectorService
+from services.analysis_service import AnalysisService
+from services.llm_manager import LLMManager
+from services.logger import Logger
+from models.data_models import AnalysisRequest
+
+SENTENCES = [
+    "Users must be able to log in with their university account",
+    "The system should never require a login",
+    "All data shall be stored encrypted at rest",
+    "Data can be stored in plain text to keep things simple",
+    "The app should load in under two seconds",
+    "It is fine if pages take a while to load",
+    "Librarians can edit every booking",
+    "Only the person who made a booking can change it",
+    "Rooms can be booked up to two weeks in advance",
+    "A reminder is sent an hour before each booking",
+]
+
+class StandInNLIModel(NLIModel):
+    """
+    Deterministic replacement for the NLI cross-encoder.
+
+    Texts are embedded as hashed bag-of-words vectors through a fixed random
+    projection, so scoring costs grow with text length and batch size like the
+    real model (at a fraction of the cost) and identical pairs always get
+    identical scores. Batching goes through the real NLIBatchScheduler.
+    """
+    DIM = 256
+
+    def __init__(self):
+        if self._initialized:
+            return
+        config = APIConfig()
+        self.batch_size = max(1, config.nli_batch_size)
+        self.projection = np.random.default_rng(0).standard_normal((4096, self.DIM)).astype(np.float32)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nli-stand-in")
+        self.scheduler = NLIBatchScheduler(
+            score_fn=self.score_pairs_sync,
+            executor=self.executor,
+            window_ms=config.nli_batch_window_ms,
+            max_batch_size=self.batch_size
+        )
+        self._initialized = True
+
+    def get_stats(self) -> Dict:
+        return {"backend": "stand-in", **self.scheduler.get_stats()}
+
+    def _embed(self, text: str) -> np.ndarray:
+        rows = [int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % 4096 for word in text.lower().split()]
+        vector = self.projection[rows].sum(axis=0) if rows else np.zeros(self.DIM, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def score_pairs_sync(self, premises: List[ContextText], hypotheses: List[ContextText]) -> List[float]:
+        premise_vectors = np.stack([self._embed(text) for _, text in premises])
+        hypothesis_vectors = np.stack([self._embed(text) for _, text in hypotheses])
+        similarity = (premise_vectors * hypothesis_vectors).sum(axis=1)
+        return (1 / (1 + np.exp(8 * similarity))).tolist()
+
+class NullLogger:
+    """Discards log events, so benchmarks other than 'logger' do not measure file I/O"""
+    def log(self, data: dict):
+        pass
+
+class NullWebSocket:
+    async def send_json(self, data: dict):
+        pass
+
+def install_stand_in_nli():
+    """Make NLIModel() return the stand-in (it is a process-wide singleton)"""
+    if not isinstance(NLIModel._instance, StandInNLIModel):
+        instance = object.__new__(StandInNLIModel)
+        instance._initialized = False
+        instance.__init__()
+        NLIModel._instance = instance
+
+def summarize(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000,
+        "min_ms": ordered[0] * 1000
+    }
+
+def measure(fn: Callable[[], None], repeats: int, warmup: int = 1) -> Dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+async def measure_async(fn: Callable, repeats: int, warmup: int = 1) -> Dict:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def segment(i: int, question_idx: int = 1) -> Dict:
+    return {
+        "uuid": f"seg-{question_idx}-{i}",
+        "text": f"{SENTENCES[i % len(SENTENCES)]} (variant {i})",
+        "question_idx": question_idx
+    }
+
+async def bench_consistency(repeats: int) -> Dict:
+    service = ConsistencyService()
+    results = {}
+    for count in (5, 20, 50, 100):
+        previous = [segment(i, question_idx=i % 3 + 1) for i in range(count)]
+        run = {"i": 0}
+
+        async def cold():
+            # A new current text every call, so no pair score is cached
+            run["i"] += 1
+            current = {"uuid": "current", "text": f"{SENTENCES[0]} edit {count}-{run['i']}", "question_idx": 1}
+            await service.check_consistency(current, previous)
+
+        current = {"uuid": "current", "text": f"{SENTENCES[1]} cached {count}", "question_idx": 1}
+
+        async def cached():
+            await service.check_consistency(current, previous)
+
+        results[f"segments={count}"] = {
+            "cold": await measure_async(cold, repeats),
+            "cached": await measure_async(cached, repeats)
+        }
+    return results
+
+async def bench_similarity(repeats: int) -> Dict:
+    service = RequirementService(llm_manager=None, logger=NullLogger(), websocket_handler=NullWebSocket())
+    results = {}
+    for words in (10, 50, 200):
+        text1 = " ".join(SENTENCES[i % len(SENTENCES)] for i in range(words // 8 + 1)).split()[:words]
+        text2 = list(reversed(text1))
+        a, b = " ".join(text1), " ".join(text2)
+        results[f"words={words}"] = await measure_async(lambda: service._calculate_similarity(a, b), repeats)
+    return results
+
+async def bench_stability(repeats: int) -> Dict:
+    results = {}
+    for count in (5, 20, 100):
+        service = RequirementService(llm_manager=None, logger=NullLogger(), websocket_handler=NullWebSocket())
+        for i in range(count):
+            seg = segment(i)
+            await service.handle_segment_update(seg["uuid"], seg["text"], 1, i)
+            await service.handle_segment_update(seg["uuid"], seg["text"] + " updated", 1, i)
+        results[f"segments={count}"] = await measure_async(lambda: service.get_question_stability(1), repeats)
+    return results
+
+def bench_logger(repeats: int) -> Dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = Logger(log_dir)
+        logger.create_session_directory("benchmark")
+        events = {
+            "uuid": lambda i: {"type": "segment_edit", "uuid": f"seg-{i % 20}", "data": {"text": SENTENCES[i % 10]}},
+            "question": lambda i: {"type": "segment_similarity", "question_idx": i % 4, "data": {"score": 0.5}},
+            "list": lambda i: {"type": "activity_timeline", "interventionId": str(i), "activity_data": {"i": i}}
+        }
+        for kind, make_event in events.items():
+            written = 0
+            results[kind] = {}
+            for size in (100, 500, 1000):
+                # Grow the file to size entries, then time the next appends
+                while written < size:
+                    logger.log(make_event(written))
+                    written += 1
+
+                def append():
+                    nonlocal written
+                    logger.log(make_event(written))
+                    written += 1
+
+                results[kind][f"entries={size}"] = measure(append, repeats, warmup=0)
+        logger.close()
+    return results
+
+async def bench_cancel(repeats: int, llm_manager: LLMManager) -> Dict:
+    service = AnalysisService(
+        llm_manager=llm_manager,
+        websocket_handler=NullWebSocket(),
+        intervention_service=InterventionService(llm_manager),
+        logger=NullLogger()
+    )
+    results = {}
+    for depth in (10, 100, 1000):
+        samples = []
+        for _ in range(repeats):
+            service.queue = asyncio.Queue()
+            for i in range(depth):
+                await service.queue.put(AnalysisRequest(uuid=f"seg-{i}", text=SENTENCES[i % 10], question_idx=1, segment_idx=i))
+            started = time.perf_counter()
+            await service._cancel_existing_analysis(f"seg-{depth // 2}")
+            samples.append(time.perf_counter() - started)
+        results[f"queue_depth={depth}"] = summarize(samples)
+    return results
+
+def bench_prompts(repeats: int, llm_manager: LLMManager) -> Dict:
+    intervention_service = InterventionService(llm_manager)
+    detector = DetectorService(llm_manager, intervention_service)
+    requirement_service = RequirementService(llm_manager=llm_manager, logger=NullLogger(), websocket_handler=NullWebSocket())
+    segment_texts = {f"seg-{i}": SENTENCES[i % 10] for i in range(10)}
+    return {
+        "detection_prompt": measure(detector._build_detection_prompt, repeats),
+        "interpretation_prompt": measure(intervention_service._build_interpretation_prompt, repeats),
+        "requirement_prompt": measure(
+            lambda: requirement_service._build_requirement_prompt(1, "What do you need?", segment_texts), repeats
+        )
+    }
+
+async def bench_llm_roundtrip(repeats: int, llm_manager: LLMManager) -> Dict:
+    run = {"i": 0}
+
+    async def submit():
+        run["i"] += 1
+        await llm_manager.submit_request_async(
+            messages=[{"role": "user", "content": f"benchmark {run['i']}"}],
+            task_type="chat",
+            model="gpt-4",
+            max_tokens=1
+        )
+
+    return {"submit_request_async": await measure_async(submit, repeats)}
+
+async def run_benchmarks(names: List[str], repeats: int) -> Dict:
+    install_stand_in_nli()
+    llm_manager = LLMManager()
+    benchmarks = {
+        "consistency": lambda: bench_consistency(repeats),
+        "similarity": lambda: bench_similarity(repeats),
+        "stability": lambda: bench_stability(repeats),
+        "logger": lambda: asyncio.to_thread(bench_logger, repeats),
+        "cancel": lambda: bench_cancel(repeats, llm_manager),
+        "prompts": lambda: asyncio.to_thread(bench_prompts, repeats, llm_manager),
+        "llm_roundtrip": lambda: bench_llm_roundtrip(repeats, llm_manager)
+    }
+    results = {}
+    for name in names:
+        started = time.perf_counter()
+        results[name] = await benchmarks[name]()
+        print(f"{name:<14} done in {time.perf_counter() - started:.1f}s")
+    return results
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, Dict]:
+    """{'consistency/segments=5/cold': {...stats}, ...}"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if "mean_ms" in value:
+            flat[path] = value
+        else:
+            flat.update(flatten(value, path))
+    return flat
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print p50 ratios against a baseline run; returns False if anything regressed beyond threshold"""
+    ok = True
+    base = flatten(baseline["results"])
+    print(f"\nAgainst {baseline.get('revision', '?')} (p50, regression threshold {threshold:.0%}):")
+    for path, stats in flatten(current["results"]).items():
+        if path not in base or not base[path]["p50_ms"]:
+            continue
+        ratio = stats["p50_ms"] / base[path]["p50_ms"]
+        regressed = ratio > 1 + threshold
+        ok = ok and not regressed
+        print(f"  {path:<55} {base[path]['p50_ms']:>9.3f} -> {stats['p50_ms']:>9.3f} ms  x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    all_names = ["consistency", "similarity", "stability", "logger", "cancel", "prompts", "llm_roundtrip"]
+    parser.add_argument('--only', nargs='+', choices=all_names, default=all_names)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='p50 slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "results": asyncio.run(run_benchmarks(args.only, args.repeats))
+    }
+
+    print(f"\n{'benchmark':<55} {'p50 ms':>9} {'p95 ms':>9}")
+    for path, stats in flatten(report["results"]).items():
+        print(f"{path:<55} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
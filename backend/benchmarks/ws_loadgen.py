@@ -0,0 +1,268 @@
+"""
+Concurrent websocket load generator for the /ws endpoint.
+
+Opens N simulated participant sessions. Each session sends session_start, then
+answers the questions segment by segment: it "types" each segment at the given
+cadence, sends a segment_update, revisits segments with edits, then sends
+stability_check and generate_requirements for the question.
+
+Latency is measured from each segment_update to the analysis_complete for that
+uuid, and from each generate_requirements to the requirement_generation_complete
+for that question. An update that is edited again before its analysis completes
+is counted as superseded (the backend discards the earlier analysis), not as a
+timeout.
+
+Run the backend with the mock LLM so no API calls are made, and lift the
+per-model token budget unless it is part of what is being measured, e.g.
+    LLM_BACKEND=mock GPT4_TPM=0 uvicorn main:app --port 8000
+
+Usage (from backend/, requires the websockets package):
+    python -m benchmarks.ws_loadgen --sessions 20 [--url ws://localhost:8000/ws] [--output results.json]
+"""
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+import statistics
+import argparse
+import asyncio
+import random
+import uuid
+import json
+import time
+
+FRAGMENTS = [
+    "the system should let users book a study room",
+    "it must be fast",
+    "students log in with their university account",
+    "librarians can cancel any booking",
+    "bookings should be limited to a reasonable time",
+    "the app sends a reminder before the booking starts",
+    "it should work well on phones",
+    "data must be kept secure",
+    "users should be able to see which rooms are free",
+    "staff need a report of room usage every month",
+]
+
+EDITS = [
+    " and it should be easy to use",
+    " for all users",
+    " at peak times",
+    " unless the room is already taken",
+    " as soon as possible",
+]
+
+@dataclass
+class LoadStats:
+    sent: Dict[str, int] = field(default_factory=dict)
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: {"analysis": [], "requirements": []})
+    errors: Dict[str, int] = field(default_factory=dict)
+    superseded: int = 0
+    timed_out: int = 0
+
+    def count_sent(self, message_type: str):
+        self.sent[message_type] = self.sent.get(message_type, 0) + 1
+
+    def count_error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+class Session:
+    """One simulated participant on its own websocket connection"""
+    def __init__(self, index: int, args, stats: LoadStats):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(args.seed + index)
+        self.ws = None
+        self.segments: Dict[str, Dict] = {}  # uuid -> {text, question_idx, segment_idx}
+        self.pending_analysis: Dict[str, float] = {}  # uuid -> send time of the latest update
+        self.pending_requirements: Dict[int, float] = {}  # question id -> send time
+
+    async def run(self):
+        import websockets
+
+        await asyncio.sleep(self.args.ramp_up * self.index / max(1, self.args.sessions))
+        try:
+            async with websockets.connect(self.args.url, max_size=None) as ws:
+                self.ws = ws
+                receiver = asyncio.create_task(self._receive())
+                try:
+                    await self._send({
+                        "type": "session_start",
+                        "sessionId": f"loadgen-{self.args.seed}-{self.index}",
+                        "context": self.args.context,
+                        "timestamp": time.time()
+                    })
+                    for question_idx in range(1, self.args.questions + 1):
+                        await self._answer_question(question_idx)
+                    await self._drain()
+                finally:
+                    receiver.cancel()
+        except Exception as e:
+            self.stats.count_error(f"connection:{type(e).__name__}")
+        self.stats.timed_out += len(self.pending_analysis) + len(self.pending_requirements)
+
+    async def _answer_question(self, question_idx: int):
+        question_uuids = []
+        for segment_idx in range(self.args.segments_per_question):
+            segment_uuid = str(uuid.uuid4())
+            question_uuids.append(segment_uuid)
+            text = self.rng.choice(FRAGMENTS).capitalize() + "."
+            await self._type(text)
+            await self._update(segment_uuid, text, question_idx, segment_idx)
+            await self._think()
+
+        for _ in range(self.args.edits_per_question):
+            segment_uuid = self.rng.choice(question_uuids)
+            text = self._edit(self.segments[segment_uuid]["text"])
+            await self._type(text, edit=True)
+            await self._update(segment_uuid, text, question_idx, self.segments[segment_uuid]["segment_idx"])
+            await self._think()
+
+        if self.args.stability_checks:
+            await self._send({"type": "stability_check", "questionId": question_idx})
+        if self.args.requirements:
+            self.pending_requirements[question_idx] = time.perf_counter()
+            await self._send({
+                "type": "generate_requirements",
+                "questionId": question_idx,
+                "segments": [{"uuid": u, "text": self.segments[u]["text"]} for u in question_uuids],
+                "triggerMode": "manual"
+            })
+
+    def _edit(self, text: str) -> str:
+        pattern = self.args.edit_pattern
+        if pattern == "mixed":
+            pattern = self.rng.choice(["append", "rewrite"])
+        if pattern == "append":
+            return text.rstrip(".") + self.rng.choice(EDITS) + "."
+        return self.rng.choice(FRAGMENTS).capitalize() + "."
+
+    async def _type(self, text: str, edit: bool = False):
+        """Wait as long as typing the text (or the changed part, for edits) takes"""
+        chars = len(text) // 3 if edit else len(text)
+        await asyncio.sleep(chars / self.args.typing_cps)
+
+    async def _think(self):
+        await asyncio.sleep(self.rng.expovariate(1 / self.args.think_time) if self.args.think_time > 0 else 0)
+
+    async def _update(self, segment_uuid: str, text: str, question_idx: int, segment_idx: int):
+        self.segments[segment_uuid] = {"text": text, "question_idx": question_idx, "segment_idx": segment_idx}
+        if segment_uuid in self.pending_analysis:
+            self.stats.superseded += 1
+        self.pending_analysis[segment_uuid] = time.perf_counter()
+        await self._send({
+            "type": "segment_update",
+            "uuid": segment_uuid,
+            "text": text,
+            "questionIdx": question_idx,
+            "segmentIdx": segment_idx,
+            "interventionMode": self.args.intervention_mode,
+            "all_segments": self.segments
+        })
+
+    async def _send(self, message: Dict):
+        await self.ws.send(json.dumps(message))
+        self.stats.count_sent(message["type"])
+
+    async def _receive(self):
+        async for raw in self.ws:
+            message = json.loads(raw)
+            message_type = message.get("type")
+            now = time.perf_counter()
+            if message_type == "analysis_complete":
+                sent_at = self.pending_analysis.pop(message.get("uuid"), None)
+                if sent_at is not None:
+                    self.stats.latencies["analysis"].append(now - sent_at)
+            elif message_type == "analysis_error":
+                self.pending_analysis.pop(message.get("uuid"), None)
+                self.stats.count_error(message_type)
+            elif message_type == "requirement_generation_complete":
+                sent_at = self.pending_requirements.pop(message.get("questionId"), None)
+                if sent_at is not None:
+                    self.stats.latencies["requirements"].append(now - sent_at)
+            elif message_type == "requirement_generation_failed":
+                self.pending_requirements.pop(message.get("questionId"), None)
+                self.stats.count_error(message_type)
+
+    async def _drain(self):
+        """Wait for outstanding replies, up to the timeout"""
+        deadline = time.perf_counter() + self.args.timeout
+        while (self.pending_analysis or self.pending_requirements) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+
+def summarize(stats: LoadStats, duration: float, args) -> Dict:
+    results = {
+        "sessions": args.sessions,
+        "duration_s": duration,
+        "messages_sent": stats.sent,
+        "errors": stats.errors,
+        "superseded_updates": stats.superseded,
+        "timed_out": stats.timed_out,
+        "latency": {}
+    }
+    for kind, values in stats.latencies.items():
+        results["latency"][kind] = {
+            "completed": len(values),
+            "throughput_per_s": len(values) / duration if duration else 0.0,
+            "p50_s": percentile(values, 50),
+            "p95_s": percentile(values, 95),
+            "p99_s": percentile(values, 99),
+            "mean_s": statistics.mean(values) if values else None,
+            "max_s": max(values) if values else None
+        }
+    return results
+
+async def run(args) -> Dict:
+    stats = LoadStats()
+    started = time.perf_counter()
+    await asyncio.gather(*[Session(i, args, stats).run() for i in range(args.sessions)])
+    return summarize(stats, time.perf_counter() - started, args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='ws://localhost:8000/ws')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent participant sessions')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='Seconds over which sessions connect')
+    parser.add_argument('--questions', type=int, default=3)
+    parser.add_argument('--segments-per-question', type=int, default=3)
+    parser.add_argument('--edits-per-question', type=int, default=2)
+    parser.add_argument('--edit-pattern', choices=['append', 'rewrite', 'mixed'], default='mixed')
+    parser.add_argument('--typing-cps', type=float, default=5.0, help='Typing speed in characters per second')
+    parser.add_argument('--think-time', type=float, default=2.0, help='Mean pause between updates (seconds)')
+    parser.add_argument('--no-stability-checks', dest='stability_checks', action='store_false')
+    parser.add_argument('--no-requirements', dest='requirements', action='store_false')
+    parser.add_argument('--intervention-mode', default='on')
+    parser.add_argument('--context', default='context1')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds to wait for outstanding replies')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The load generator requires the websockets package") from e
+
+    results = asyncio.run(run(args))
+
+    print(f"{args.sessions} sessions in {results['duration_s']:.1f}s, "
+          f"{sum(results['messages_sent'].values())} messages sent")
+    print(f"{'reply':<14} {'done':>6} {'per s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}")
+    for kind, r in results['latency'].items():
+        fmt = lambda v: f"{v:>7.2f}" if v is not None else f"{'-':>7}"
+        print(f"{kind:<14} {r['completed']:>6} {r['throughput_per_s']:>7.2f} {fmt(r['p50_s'])} {fmt(r['p95_s'])} {fmt(r['p99_s'])}")
+    print(f"errors: {results['errors'] or 0}, superseded: {results['superseded_updates']}, timed out: {results['timed_out']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
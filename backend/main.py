@@ -1,21 +1,27 @@
 from fastapi import FastAPI, WebSocket, BackgroundTasks, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import Dict, Optional
 from services.logger import Logger
-from services.analysis_service import AnalysisService
-from services.intervention_service import InterventionService
-from services.requirement_service import RequirementService
 from services.llm_manager import LLMManager
+from services.session_registry import SessionRegistry
 from models.data_models import AnalysisRequest, InterventionResponse
 from datetime import datetime
+from contextlib import asynccontextmanager
 import logging
 import os
 import asyncio
-from services import context_store
+from services.metrics import REGISTRY
 
 
-app = FastAPI()
-llm_manager = LLMManager()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write out queued log events before the process exits
+    await asyncio.to_thread(logger.close)
+    sessions.close_store()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,24 +32,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
+# Initialize shared resources
 llm_manager = LLMManager()
 # Initialize logger with path
 log_dir = os.path.join(os.path.dirname(__file__), 'logs')
 os.makedirs(log_dir, exist_ok=True)
 logger = Logger(log_dir)
-intervention_service = InterventionService(llm_manager=llm_manager)
-requirement_service = RequirementService(llm_manager=llm_manager, websocket_handler=None, logger=logger)
-analysis_service = AnalysisService(llm_manager=llm_manager, websocket_handler=None, intervention_service=intervention_service, logger = logger)
+# Per-connection services and state, on top of the shared LLM manager, logger and NLI model
+sessions = SessionRegistry(llm_manager=llm_manager, logger=logger)
+# The event loop only keeps weak references to tasks; hold fire-and-forget ones until they finish
+background_tasks = set()
+
+def spawn(coro) -> asyncio.Task:
+    """Run coro in the background without it being garbage collected mid-flight"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def report_archive(channel, session_id: Optional[str], archive):
+    """Tell the client whether its submitted session was archived"""
+    try:
+        result = await asyncio.wrap_future(archive)
+        message = {"type": "survey_archive_complete", "sessionId": session_id, "status": result["status"]}
+    except Exception as e:
+        logging.error(f"❌ Archiving session {session_id} failed: {e}")
+        message = {"type": "survey_archive_failed", "sessionId": session_id, "error": str(e)}
+    try:
+        await channel.send_json(message)
+    except Exception:
+        pass  # Client already gone; the outcome is in the log and metrics
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    session_state = {"segments": {}, "analysisStatus": {}}  # Initialize session state
-
-    # Assign the websocket handler to analysis service
-    analysis_service.ws = websocket
-    requirement_service.ws = websocket
+    # Isolated services, state and outbound channel for this connection
+    session = sessions.open(websocket)
+    session_state = session.state
+    session_logger = session.logger
+    analysis_service = session.analysis_service
+    requirement_service = session.requirement_service
 
     try:
         while True:
@@ -51,25 +84,19 @@ async def websocket_endpoint(websocket: WebSocket):
             print("Received websocket message:", data)
 
             if data["type"] == "sync_state":
+                # A reconnect (possibly to another worker) rejoins its session from the session-state store
+                if data.get("sessionId") and session.session_id is None:
+                    await session.resume(data["sessionId"])
                 session_state["segments"] = data.get("segments", {})
                 session_state["analysisStatus"] = data.get("analysisStatus", {})
 
             elif data["type"] == "session_start":
                 session_id = data["sessionId"]
-                logger.create_session_directory(session_id)
-                session_state["segments"] = data.get("segments", {})   #Initialize session state      
-
-                # Set the active context
-                context_id = data.get("context", "context1")
-                context_store.set_context(context_id)
-                logging.info(f"Setting context to: {context_id}")
-
-                await requirement_service.reset_state()
-                await intervention_service.reset_state()
-                await analysis_service.reset_state()
+                # New log directory, fresh state and this participant's context
+                await session.start(session_id, data.get("context", "context1"), data.get("segments", {}))
 
                 # Log session start information
-                logger.log({
+                session_logger.log({
                     "type": "session_start",
                     "sessionId": session_id,
                     "context": data.get("context"),
@@ -107,7 +134,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         all_segments=session_state["segments"]
                     )
 
-                asyncio.create_task(requirement_service.handle_segment_update(
+                spawn(requirement_service.handle_segment_update(
                     uuid=uuid,
                     text=text,
                     question_idx=question_idx,
@@ -115,7 +142,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 ))
 
                 # Log edit event
-                logger.log({
+                session_logger.log({
                     "type": "segment_edit",
                     "uuid": uuid,
                     "data": data,
@@ -132,7 +159,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 trigger_mode = data["triggerMode"]
                 
                 # Handle requirement generation asynchronously
-                asyncio.create_task(requirement_service.generate_requirements(
+                spawn(requirement_service.generate_requirements(
                     question_id=question_id,
                     segments=segments,
                     trigger_mode=trigger_mode
@@ -145,7 +172,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 await requirement_service.handle_discard_request(question_id)
                 
                 # Log the discard request
-                logger.log({
+                session_logger.log({
                     "type": "requirement_generation_discard_request",
                     "question_id": question_id,
                     "timestamp": datetime.now().isoformat()
@@ -154,6 +181,12 @@ async def websocket_endpoint(websocket: WebSocket):
             elif data["type"] == "generate_all_baseline_requirements":
                 await requirement_service.handle_generate_all_baseline_requirements(data)
 
+            elif data["type"] == "get_active_contradictions":
+                await session.channel.send_json({
+                    "type": "active_contradictions",
+                    "contradictions": analysis_service.get_active_contradictions(session_state["segments"])
+                })
+
             elif data["type"] == "pause_analysis":
                 await analysis_service.pause_analysis()
             
@@ -162,7 +195,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 
             elif data["type"] == "segment_timing":
                 # Log segment timing data
-                logger.log({
+                session_logger.log({
                     "type": "segment_timing",
                     "uuid": data["uuid"],
                     "timing_data": data 
@@ -170,7 +203,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
             elif data["type"] == "intervention_response":
                 # Log the response
-                logger.log({
+                session_logger.log({
                     "type": "intervention_response",
                     "uuid": data["uuid"],
                     "timing_data": data 
@@ -178,7 +211,7 @@ async def websocket_endpoint(websocket: WebSocket):
             
             elif data["type"] == "activity_timeline":
                 # Log activity timeline
-                logger.log({
+                session_logger.log({
                     "type": "activity_timeline",
                     "interventionId": data.get("interventionId"),
                     "activity_data": data.get("data")
@@ -186,7 +219,7 @@ async def websocket_endpoint(websocket: WebSocket):
             
             elif data["type"] == "intervention_feedback":
                 # Log feedback
-                logger.log({
+                session_logger.log({
                     "type": "intervention_feedback",
                     "timestamp": data.get("timestamp"),
                     "interventionId": data.get("interventionId"),
@@ -195,21 +228,21 @@ async def websocket_endpoint(websocket: WebSocket):
             
             elif data["type"] == "display_mode_change":
                 # Log display mode change
-                logger.log({
+                session_logger.log({
                     "type": "display_mode_change",
                     "data": data
                 })
 
             elif data["type"] == "intervention_mode_change":
                 # Log intervention mode change
-                logger.log({
+                session_logger.log({
                     "type": "intervention_mode_change",
                     "data": data
                 })
 
             elif data["type"] == "requirement_rating":
                 # Log requirement rating
-                logger.log({
+                session_logger.log({
                     "type": "requirement_rating",
                     "question_idx": data["questionId"],
                     "data": data
@@ -217,18 +250,28 @@ async def websocket_endpoint(websocket: WebSocket):
                 
             elif data["type"] == "submit_survey":
                 # Log final survey state
-                logger.log({
+                session_logger.log({
                     "type": "survey_submission",
                     "timestamp": data.get("timestamp"),
                     "final_state": data.get("finalState"),
                     "session_id": data.get("sessionId")
                 })
-                
+                # Zip the session in the background; confirm right away
+                archive = session_logger.archive_session()
+
                 # Send confirmation back to client
-                await websocket.send_json({
+                await session.channel.send_json({
                     "type": "survey_submission_confirmed",
                     "sessionId": data.get("sessionId")
                 })
+                spawn(report_archive(session.channel, data.get("sessionId"), archive))
+                # The session is finished; it won't be resumed
+                await session.forget()
+
+            # Snapshot the session so another worker can take over after a reconnect
+            await session.save()
 
     except WebSocketDisconnect:
         print("Client disconnected")
+    finally:
+        await sessions.close(session)
@@ -6,7 +6,9 @@ import asyncio
 import uuid
 from models.data_models import AnalysisRequest  
 from services.understandability_service import DetectorService
-from services.consistency_service import ConsistencyService
+from services.consistency_service import ConsistencyService, ContradictionResult
+from services.contradiction_matrix import ContradictionMatrix
+from services.cancellation import CancellationToken
 import logging
 import os
 
@@ -15,10 +17,12 @@ class AnalysisService:
                  llm_manager,  
                  websocket_handler,
                  intervention_service, 
-                 logger):
+                 logger,
+                 context_id: str = None,
+                 consistency_service: ConsistencyService = None):
         # Initialize sub-services
-        self.detector = DetectorService(llm_manager, intervention_service)
-        self.consistency = ConsistencyService()  
+        self.detector = DetectorService(llm_manager, intervention_service, context_id=context_id)
+        self.consistency = consistency_service or ConsistencyService(context_id=context_id)
         self.ws = websocket_handler
         self.logger = logger
         # Use single asyncio.Queue for analysis requests
@@ -27,22 +31,56 @@ class AnalysisService:
         self.currently_processing = None  # Track UUID currently being processed
         self.is_paused = False # Flag to track if the queue processing is paused
         self.discard_results = set()  # Set to track UUIDs whose results should be discarded
+        self.cancel_tokens = {}  # {uuid: CancellationToken} for the analysis currently running
         self.analysis_status = {}
         self.active_interventions = {}
         self.segments = {}
         self.analysis_results = {}
+        # Contradiction scores between this session's segments, kept across analyses
+        self.contradiction_matrix = ContradictionMatrix(self.consistency.contradiction_threshold)
     
-    async def reset_state(self):
+    async def reset_state(self, context_id: str = None):
         """Reset all session-specific state"""
         # Reset this service's state
         self.analysis_status = {}
         self.active_interventions = {}
         self.segments = {}
         self.analysis_results = {}
+        self.contradiction_matrix = ContradictionMatrix(self.consistency.contradiction_threshold)
         
         # Reset child services' state and reload their contexts
-        await self.detector.reset_state()
-        await self.consistency.reset_state()
+        await self.detector.reset_state(context_id)
+        await self.consistency.reset_state(context_id)
+
+    def export_state(self) -> Dict:
+        """Session state needed to resume the session on another worker"""
+        return {
+            "analysis_status": self.analysis_status,
+            "active_interventions": self.active_interventions,
+            "segments": self.segments,
+            "analysis_results": self.analysis_results,
+            "contradiction_texts": self.contradiction_matrix.texts,
+            "contradiction_scores": self.contradiction_matrix.scores,
+            "contradiction_skipped": self.contradiction_matrix.skipped
+        }
+
+    def restore_state(self, state: Dict):
+        """Resume from export_state() output"""
+        self.analysis_status = state.get("analysis_status", {})
+        self.active_interventions = state.get("active_interventions", {})
+        self.segments = state.get("segments", {})
+        self.analysis_results = state.get("analysis_results", {})
+        self.contradiction_matrix = ContradictionMatrix(self.consistency.contradiction_threshold)
+        self.contradiction_matrix.texts = state.get("contradiction_texts", {})
+        self.contradiction_matrix.scores = state.get("contradiction_scores", {})
+        self.contradiction_matrix.skipped = state.get("contradiction_skipped", {})
+
+    async def close(self):
+        """Stop work for a closed session: drop queued analyses and cancel the running one"""
+        self.queue = asyncio.Queue()
+        for uuid, token in list(self.cancel_tokens.items()):
+            self.discard_results.add(uuid)
+            token.cancel()
 
     async def _cancel_existing_analysis(self, uuid):
         """Internal method to handle cancellation logic
@@ -50,7 +88,8 @@ class AnalysisService:
         Handles old analysis at various stages:
         1. In queue: Directly removed from queue
         2. Currently being processed: Added to discard_results set (checked in _process_queue)
-        - Analysis will complete but results won't be sent 
+        - Its LLM calls are cancelled: queued calls are dropped and in-flight calls aborted
+        - Results won't be sent 
         - Any consistency interventions referencing this segment will be filtered
         3. Completed but not sent: Results will be dropped (via discard_results check in _handle_analysis_result)
         """
@@ -58,6 +97,8 @@ class AnalysisService:
         if uuid == self.currently_processing:
             self.discard_results.add(uuid)
             logging.info(f"⚠️ [Analysis] Marking current analysis for discard: UUID={uuid}")
+            if uuid in self.cancel_tokens:
+                self.cancel_tokens[uuid].cancel()
         
         # Remove from queue if present
         temp_queue = asyncio.Queue()
@@ -127,6 +168,7 @@ class AnalysisService:
                 
                 request = await self.queue.get()
                 self.currently_processing = request.uuid
+                self.cancel_tokens[request.uuid] = CancellationToken()
                 logging.info(f"📤 [Analysis] Processing analysis for UUID: {request.uuid}")
                 
                 try:
@@ -161,6 +203,7 @@ class AnalysisService:
                 finally:
                     # self.queue.task_done()
                     self.currently_processing = None
+                    self.cancel_tokens.pop(request.uuid, None)
 
         finally:
             logging.info("🏁 [Analysis] Queue processing completed")
@@ -173,7 +216,11 @@ class AnalysisService:
             
             # Create tasks for parallel execution
             detector_task = asyncio.create_task(
-                self.detector.detect_ambiguity(request.text, request.question_idx)
+                self.detector.detect_ambiguity(
+                    request.text,
+                    request.question_idx,
+                    cancel_token=self.cancel_tokens.get(request.uuid)
+                )
             )
             
             logging.info(f"{request.all_segments.items()}")
@@ -192,15 +239,7 @@ class AnalysisService:
             logging.info(f"📤 [Analysis] Found {len(previous_segments)} previous segments for analysis")
             
             consistency_task = asyncio.create_task(
-                self.consistency.check_consistency( 
-                    {
-                        'uuid': request.uuid,
-                        'text': request.text,
-                        'question_idx': request.question_idx,
-                        'segment_idx': request.segment_idx
-                    },
-                    previous_segments
-                )
+                self._check_consistency_incremental(request, previous_segments)
             )
 
             # Wait for both analyses to complete
@@ -271,6 +310,64 @@ class AnalysisService:
             logging.error(f"❌ [Analysis] Error in parallel analysis: {e}")
             return {"error": str(e)}
         
+    async def _check_consistency_incremental(self, request: AnalysisRequest, previous_segments) -> ContradictionResult:
+        """Check consistency using the session's contradiction matrix.
+
+        Only pairs without a valid score (because either side changed or was never
+        scored) are sent to the NLI model; the rest come from the matrix. Pairs the
+        pre-filter skips are recorded as skipped, so they are not sent again either.
+        """
+        segments = dict(request.all_segments)
+        segments[request.uuid] = {**segments.get(request.uuid, {}), 'text': request.text}
+        self.contradiction_matrix.sync(segments)
+
+        previous_uuids = [segment['uuid'] for segment in previous_segments]
+        missing = set(self.contradiction_matrix.missing_pairs(request.uuid, previous_uuids))
+        logging.info(f"🧮 [Consistency] {len(previous_uuids) - len(missing)} pairs from matrix, {len(missing)} to score for UUID={request.uuid}")
+
+        result = await self.consistency.check_consistency(
+            {
+                'uuid': request.uuid,
+                'text': request.text,
+                'question_idx': request.question_idx,
+                'segment_idx': request.segment_idx
+            },
+            [segment for segment in previous_segments if segment['uuid'] in missing]
+        )
+        self.contradiction_matrix.update(request.uuid, segments, result.scores, result.skipped or ())
+
+        # Report the full row for this segment, including pairs scored earlier
+        row = self.contradiction_matrix.row(request.uuid)
+        contradictions = [
+            {
+                "previous_segment": {
+                    "uuid": segment['uuid'],
+                    "text": segment['text']
+                },
+                "current_segment": {
+                    "uuid": request.uuid,
+                    "text": request.text
+                },
+                "contradiction_score": row[segment['uuid']]
+            }
+            for segment in previous_segments
+            if row.get(segment['uuid'], 0.0) >= self.contradiction_matrix.threshold
+        ]
+        return ContradictionResult(
+            detected=len(contradictions) > 0,
+            contradictions=contradictions,
+            pairs_skipped=result.pairs_skipped,
+            scores={
+                uuid: row[uuid] for uuid in previous_uuids
+                if uuid in row and not self.contradiction_matrix.is_skipped(request.uuid, uuid)
+            }
+        )
+
+    def get_active_contradictions(self, all_segments: Dict):
+        """All open contradictions among the current segments, read from the matrix without rescoring"""
+        self.contradiction_matrix.sync(all_segments)
+        return self.contradiction_matrix.active_contradictions()
+
     async def _handle_analysis_result(self, request: AnalysisRequest):
         logging.info(f"📤 [Analysis] Sending results for UUID={request.uuid}")
         try:
@@ -295,6 +392,14 @@ class AnalysisService:
                     "status": "completed",
                     "interventions": interventions
                 })
+
+                # Log completion so update-to-result latency can be analysed per intervention
+                self.logger.log({
+                    "type": "analysis_complete",
+                    "uuid": request.uuid,
+                    "intervention_ids": [intervention.get("id") for intervention in interventions],
+                    "latency": time.time() - request.timestamp
+                })
             else:
                 raise Exception(analysis_result["error"])
 
@@ -10,6 +10,20 @@ class ModelConfig:
     timeout: int
     retry_attempts: int = 3
     retry_delay: int = 1
+    rpm: int = 0  # Requests per minute budget, 0 = unlimited
+    tpm: int = 0  # Tokens per minute budget, 0 = unlimited
+
+# OpenAI's published per-model rate limits by usage tier: {tier: {model: (rpm, tpm)}}.
+# A project's tier (1-5) rises with its spend and is shown under Limits in the
+# OpenAI dashboard; set OPENAI_USAGE_TIER to it, or override a single value with
+# GPT4_RPM/GPT4_TPM/GPT35_RPM/GPT35_TPM (0 = unlimited).
+RATE_LIMIT_TIERS = {
+    '1': {'gpt-4': (500, 10000), 'gpt-3.5-turbo': (3500, 200000)},
+    '2': {'gpt-4': (5000, 40000), 'gpt-3.5-turbo': (3500, 2000000)},
+    '3': {'gpt-4': (5000, 80000), 'gpt-3.5-turbo': (3500, 4000000)},
+    '4': {'gpt-4': (10000, 300000), 'gpt-3.5-turbo': (10000, 10000000)},
+    '5': {'gpt-4': (10000, 1000000), 'gpt-3.5-turbo': (10000, 50000000)},
+}
 
 class APIConfig:
     _instance = None
@@ -28,27 +42,108 @@ class APIConfig:
         dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')  
         load_dotenv(dotenv_path)
 
+        # LLM backend: 'openai' or 'mock' (local stand-in, no API key needed)
+        self.llm_backend = os.getenv('LLM_BACKEND', 'openai')
+
         # API Configuration
         self.openai_api_key = os.getenv('LLM_API_KEY_DEV')
-        if not self.openai_api_key:
+        if not self.openai_api_key and self.llm_backend == 'openai':
             raise ValueError("OPENAI_API_KEY not found in environment variables")
+
+        # Mock LLM backend
+        self.mock_llm_latency = os.getenv('MOCK_LLM_LATENCY', 'lognormal:0.6,0.4')  # fixed:s, uniform:lo,hi or lognormal:median,sigma
+        self.mock_llm_token_latency_ms = float(os.getenv('MOCK_LLM_TOKEN_LATENCY_MS', '0'))  # Added per completion token
+        self.mock_llm_error_rate = float(os.getenv('MOCK_LLM_ERROR_RATE', '0'))  # Fraction of calls failing with an API error
+        self.mock_llm_rate_limit_rate = float(os.getenv('MOCK_LLM_RATE_LIMIT_RATE', '0'))  # Fraction of calls failing with a 429
+        self.mock_llm_retry_after = float(os.getenv('MOCK_LLM_RETRY_AFTER', '1'))  # retry-after on injected 429s (seconds)
+        self.mock_llm_ambiguity_rate = float(os.getenv('MOCK_LLM_AMBIGUITY_RATE', '0.3'))  # Fraction of "Yes" ambiguity answers
+        self.mock_llm_responses_path = os.getenv('MOCK_LLM_RESPONSES_PATH', '')  # Optional JSON list of canned responses
+        self.mock_llm_seed = int(os.getenv('MOCK_LLM_SEED', '0'))
             
         # System Configuration
         self.max_concurrent_requests = int(os.getenv('MAX_CONCURRENT_REQUESTS', '10'))
         self.max_retries = int(os.getenv('MAX_RETRIES', '3'))
         self.retry_delay = int(os.getenv('RETRY_DELAY', '1'))
+
+        # Hedged requests: duplicate slow requests of these task types (empty = disabled)
+        self.llm_hedge_task_types = {
+            t.strip() for t in os.getenv('LLM_HEDGE_TASK_TYPES', '').split(',') if t.strip()
+        }
+        self.llm_hedge_percentile = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))  # Latency percentile that triggers a hedge
+        self.llm_hedge_min_samples = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))  # Latencies needed before hedging starts
+        self.llm_hedge_min_delay = float(os.getenv('LLM_HEDGE_MIN_DELAY', '0.5'))  # Never hedge sooner than this (seconds)
+        self.llm_hedge_max_ratio = float(os.getenv('LLM_HEDGE_MAX_RATIO', '0.1'))  # Max hedges per request of a task type
+
+        # LLM Response Cache (only deterministic, temperature=0 requests of these task types are cached)
+        self.llm_cache_task_types = {
+            t.strip() for t in os.getenv('LLM_CACHE_TASK_TYPES', 'analysis').split(',') if t.strip()
+        }
+        self.llm_cache_max_entries = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000'))
+        self.llm_cache_ttl = float(os.getenv('LLM_CACHE_TTL', '86400'))  # Seconds, 0 = never expire
+        self.llm_cache_db_path = os.getenv('LLM_CACHE_DB_PATH', '')  # Empty = in-memory tier only
+
+        # Session event log: when appended events are flushed to the OS / fsynced to disk
+        self.log_flush_policy = os.getenv('LOG_FLUSH_POLICY', 'always')  # 'always', 'interval' or 'never'
+        self.log_fsync_policy = os.getenv('LOG_FSYNC_POLICY', 'interval')  # 'always', 'interval' or 'never'
+        self.log_sync_interval = float(os.getenv('LOG_SYNC_INTERVAL', '1'))  # Seconds, for the 'interval' policies
+        self.log_queue_size = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # Events waiting for the background writer; more are dropped
+        self.log_batch_size = int(os.getenv('LOG_BATCH_SIZE', '256'))  # Max events written per batch
+        self.log_batch_interval = float(os.getenv('LOG_BATCH_INTERVAL', '0.05'))  # Max seconds to collect a batch
+        self.archive_workers = int(os.getenv('ARCHIVE_WORKERS', '1'))  # Threads zipping submitted sessions
+
+        # Session state: where snapshots live so any worker can resume a session after reconnect
+        self.session_store = os.getenv('SESSION_STORE', 'memory')  # 'memory', 'sqlite' or 'redis'
+        self.session_store_path = os.getenv(  # For 'sqlite'
+            'SESSION_STORE_PATH',
+            os.path.join(os.path.dirname(__file__), '../session_state/session_state.db')
+        )
+        self.session_store_url = os.getenv('SESSION_STORE_URL', 'redis://localhost:6379/0')  # For 'redis'
+        self.session_state_ttl = float(os.getenv('SESSION_STATE_TTL', '86400'))  # Seconds, 0 = keep forever
+        self.session_state_save_interval = float(os.getenv('SESSION_STATE_SAVE_INTERVAL', '1'))  # Min seconds between saves
+
+        # Consistency (NLI) Model Configuration
+        self.nli_batch_size = int(os.getenv('NLI_BATCH_SIZE', '16'))  # Max pairs per forward pass
+        self.nli_batch_window_ms = float(os.getenv('NLI_BATCH_WINDOW_MS', '10'))  # How long to collect pairs across sessions
+        self.nli_score_cache_size = int(os.getenv('NLI_SCORE_CACHE_SIZE', '50000'))  # Max cached pair scores (~150 bytes each)
+        self.nli_token_cache_size = int(os.getenv('NLI_TOKEN_CACHE_SIZE', '20000'))  # Max cached tokenized segments
+        self.nli_workers = int(os.getenv('NLI_WORKERS', '1'))  # Inference worker threads
+        self.nli_torch_threads = int(os.getenv('NLI_TORCH_THREADS', '0'))  # 0 = torch default
+        self.nli_backend = os.getenv('NLI_BACKEND', 'torch')  # 'torch', 'torch-int8' or 'onnx'
+        self.nli_onnx_path = os.getenv(
+            'NLI_ONNX_PATH',
+            os.path.join(os.path.dirname(__file__), '../nli_onnx/nli-deberta-v3-small.onnx')
+        )
+
+        # Bi-encoder pre-filter in front of the NLI model
+        # 'off': score every pair, 'shadow': score every pair but report what would be skipped, 'on': score the shortlist only
+        self.nli_prefilter_mode = os.getenv('NLI_PREFILTER_MODE', 'off')
+        self.nli_prefilter_model = os.getenv('NLI_PREFILTER_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+        self.nli_prefilter_top_k = int(os.getenv('NLI_PREFILTER_TOP_K', '8'))
+        self.nli_prefilter_min_similarity = float(os.getenv('NLI_PREFILTER_MIN_SIMILARITY', '0.2'))
         
+        # Proactive rate limiting uses the limits of this usage tier (see RATE_LIMIT_TIERS)
+        self.openai_usage_tier = os.getenv('OPENAI_USAGE_TIER', '2')
+        if self.openai_usage_tier not in RATE_LIMIT_TIERS:
+            raise ValueError(
+                f"Unknown OpenAI usage tier '{self.openai_usage_tier}'. Available: {sorted(RATE_LIMIT_TIERS)}"
+            )
+        tier_limits = RATE_LIMIT_TIERS[self.openai_usage_tier]
+
         # Default Model Configurations
         self.model_configs = {
             'gpt-4': ModelConfig(
                 max_tokens=500,
                 temperature=0.3,
-                timeout=30
+                timeout=30,
+                rpm=int(os.getenv('GPT4_RPM', tier_limits['gpt-4'][0])),
+                tpm=int(os.getenv('GPT4_TPM', tier_limits['gpt-4'][1]))
             ),
             'gpt-3.5-turbo': ModelConfig(
                 max_tokens=300,
                 temperature=0.5,
-                timeout=20
+                timeout=20,
+                rpm=int(os.getenv('GPT35_RPM', tier_limits['gpt-3.5-turbo'][0])),
+                tpm=int(os.getenv('GPT35_TPM', tier_limits['gpt-3.5-turbo'][1]))
             )
         }
         
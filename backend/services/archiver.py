@@ -0,0 +1,173 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_for
+from typing import Dict, List, Optional, Tuple
+import threading
+import hashlib
+import logging
+import zipfile
+import time
+import os
+
+from .api_config import APIConfig
+from .metrics import REGISTRY
+
+ARCHIVES = REGISTRY.counter('session_archives_total', 'Session archive jobs, by outcome', ['outcome'])
+ARCHIVE_DURATION = REGISTRY.histogram('session_archive_duration_seconds', 'Time to zip a session directory')
+ARCHIVES_PENDING = REGISTRY.gauge('session_archives_pending', 'Session archive jobs queued or running')
+
+class SessionArchiver:
+    """
+    Zips session directories on a background executor.
+
+    The archive is written file by file (zipfile streams each file in chunks)
+    to <session_dir>.zip.tmp and renamed over <session_dir>.zip once complete,
+    so a crash never leaves a partial archive behind. Jobs are idempotent: a
+    directory whose contents haven't changed since its archive was written
+    (tracked by a signature in the zip comment) is not zipped again. Submitting
+    a directory that is already being archived queues one follow-up job, shared
+    by every submit until it starts, because the running job may have listed the
+    files before the caller's latest writes.
+
+    submit() returns a concurrent.futures.Future that resolves to
+    {"status": "completed" | "up_to_date", "path", "files", "duration"} or
+    raises the archiving error; get_status() reports the last result per directory.
+    """
+    def __init__(self, workers: int = None):
+        self.workers = workers or APIConfig().archive_workers
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="archiver")
+        self._lock = threading.Lock()
+        self._running: Dict[str, Future] = {}
+        self._follow_ups: Dict[str, Future] = {}  # Resolve with the job that runs after the current one
+        self._status: Dict[str, Dict] = {}
+        REGISTRY.add_collector('archiver', lambda: ARCHIVES_PENDING.set(len(self._running)))
+
+    def submit(self, session_dir: str) -> Future:
+        session_dir = os.path.normpath(session_dir)
+        with self._lock:
+            if session_dir in self._running:
+                follow_up = self._follow_ups.get(session_dir)
+                if follow_up is None:
+                    follow_up = self._follow_ups[session_dir] = Future()
+                return follow_up
+            job = self._start(session_dir)
+        job.add_done_callback(lambda f: self._finished(session_dir, f))
+        return job
+
+    def get_status(self, session_dir: str = None) -> Dict:
+        with self._lock:
+            if session_dir is not None:
+                return dict(self._status.get(os.path.normpath(session_dir), {"status": "unknown"}))
+            return {path: dict(status) for path, status in self._status.items()}
+
+    def shutdown(self, wait: bool = True):
+        """Stop the executor; with wait, after running jobs and their follow-ups have finished"""
+        while wait:
+            with self._lock:
+                pending = list(self._follow_ups.values()) or list(self._running.values())
+            if not pending:
+                break
+            wait_for(pending)
+        self._executor.shutdown(wait=wait)
+
+    def _start(self, session_dir: str) -> Future:
+        """Queue an archive job; the caller holds _lock and adds the _finished callback"""
+        job = self._executor.submit(self._archive, session_dir)
+        self._running[session_dir] = job
+        self._status[session_dir] = {"status": "pending"}
+        return job
+
+    def _finished(self, session_dir: str, future: Future):
+        error = future.exception()
+        next_job = start_error = None
+        with self._lock:
+            self._running.pop(session_dir, None)
+            if error is None:
+                self._status[session_dir] = future.result()
+            else:
+                self._status[session_dir] = {"status": "failed", "error": str(error)}
+            follow_up = self._follow_ups.pop(session_dir, None)
+            if follow_up is not None:
+                try:
+                    next_job = self._start(session_dir)
+                except RuntimeError as e:  # Executor already shut down
+                    start_error = e
+        if error is None:
+            ARCHIVES.inc(outcome=future.result()["status"])
+        else:
+            ARCHIVES.inc(outcome="failed")
+            logging.error(f"❌ [Archiver] Failed to archive {session_dir}: {error}")
+
+        if start_error is not None:
+            follow_up.set_exception(start_error)
+        elif next_job is not None:
+            next_job.add_done_callback(lambda f: self._finished(session_dir, f))
+            next_job.add_done_callback(lambda f: _relay(f, follow_up))
+
+    def _archive(self, session_dir: str) -> Dict:
+        start = time.time()
+        with self._lock:
+            self._status[session_dir] = {"status": "running"}
+        path = session_dir + ".zip"
+        files = self._list_files(session_dir)
+        signature = self._signature(files)
+
+        if self._existing_signature(path) == signature:
+            logging.info(f"📦 [Archiver] Archive already up to date: {path}")
+            return {"status": "up_to_date", "path": path, "files": len(files), "duration": time.time() - start}
+
+        tmp_path = path + ".tmp"
+        try:
+            with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for file_path, arcname, _, _ in files:
+                    archive.write(file_path, arcname)
+                archive.comment = signature
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        duration = time.time() - start
+        ARCHIVE_DURATION.observe(duration)
+        # Log completion in main log
+        logging.info(f"Survey completed and stored: {session_dir} ({len(files)} files, {duration:.2f}s)")
+        return {"status": "completed", "path": path, "files": len(files), "duration": duration}
+
+    @staticmethod
+    def _list_files(session_dir: str) -> List[Tuple[str, str, int, int]]:
+        """(path, name in archive, size, mtime) of every file, in a stable order"""
+        if not os.path.isdir(session_dir):
+            raise FileNotFoundError(f"Session directory not found: {session_dir}")
+        files = []
+        for root, dirs, names in os.walk(session_dir):
+            dirs.sort()
+            for name in sorted(names):
+                if name.endswith(".tmp"):
+                    continue
+                file_path = os.path.join(root, name)
+                stat = os.stat(file_path)
+                files.append((file_path, os.path.relpath(file_path, session_dir), stat.st_size, stat.st_mtime_ns))
+        return files
+
+    @staticmethod
+    def _signature(files: List[Tuple[str, str, int, int]]) -> bytes:
+        digest = hashlib.sha256()
+        for _, arcname, size, mtime in files:
+            digest.update(f"{arcname}\0{size}\0{mtime}\n".encode('utf-8'))
+        return digest.hexdigest().encode('ascii')
+
+    @staticmethod
+    def _existing_signature(path: str) -> Optional[bytes]:
+        try:
+            with zipfile.ZipFile(path) as archive:
+                return archive.comment
+        except (OSError, zipfile.BadZipFile):
+            return None
+
+def _relay(source: Future, target: Future):
+    """Resolve target with source's result or error"""
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,35 @@
+from typing import Callable, List
+import logging
+
+class CancellationToken:
+    """
+    Cooperative cancellation signal passed from the services down to LLMManager.
+
+    Whoever owns the work calls cancel(); everything holding the token either
+    checks `cancelled` or registers a callback to abort its part of the work.
+    """
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"❌ [Cancellation] Callback failed: {e}")
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run callback on cancellation (immediately if already cancelled)"""
+        if self.cancelled:
+            callback()
+        else:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[], None]):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
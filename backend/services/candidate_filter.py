@@ -0,0 +1,94 @@
+from typing import List, Dict
+from collections import OrderedDict
+from concurrent.futures import Executor
+from transformers import AutoTokenizer, AutoModel
+import numpy as np
+import torch
+import threading
+import asyncio
+import logging
+
+class CandidateFilter:
+    """
+    First-stage pre-filter for consistency checks.
+
+    A small bi-encoder embeds each segment once (cached per segment UUID and
+    recomputed only when its text changes). Cosine similarity against the current
+    segment then picks the top-k most related previous segments, and only that
+    shortlist is sent to the NLI cross-encoder.
+    """
+    def __init__(self, model_name: str, top_k: int, min_similarity: float, executor: Executor, max_cached: int = 10000):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.executor = executor
+        self.max_cached = max_cached
+
+        # {segment_uuid: (text, normalized embedding)}
+        self._embeddings = OrderedDict()
+        self._encode_lock = threading.Lock()
+
+        # Running counters across all checks
+        self.pairs_considered = 0
+        self.pairs_skipped = 0
+
+    def invalidate(self, uuid: str):
+        """Drop the cached embedding for a segment"""
+        self._embeddings.pop(uuid, None)
+
+    async def shortlist(self, current_segment: Dict, previous_segments: List[Dict]) -> List[int]:
+        """Return indices into previous_segments worth scoring with the cross-encoder, in input order."""
+        if not previous_segments:
+            return []
+
+        segments = [current_segment] + previous_segments
+        stale = [
+            segment for segment in segments
+            if self._embeddings.get(segment['uuid'], (None,))[0] != segment['text']
+        ]
+        if stale:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self.executor, self._encode, [s['text'] for s in stale])
+            for segment, vector in zip(stale, vectors):
+                self._store(segment['uuid'], segment['text'], vector)
+
+        current_vector = self._lookup(current_segment['uuid'])
+        previous_vectors = np.stack([self._lookup(s['uuid']) for s in previous_segments])
+        similarities = previous_vectors @ current_vector
+
+        ranked = np.argsort(-similarities)[:self.top_k]
+        keep = sorted(int(i) for i in ranked if similarities[i] >= self.min_similarity)
+
+        self.pairs_considered += len(previous_segments)
+        self.pairs_skipped += len(previous_segments) - len(keep)
+        logging.info(f"🔎 [Consistency] Pre-filter kept {len(keep)}/{len(previous_segments)} previous segments for UUID={current_segment['uuid']}")
+        return keep
+
+    def get_stats(self) -> Dict:
+        return {
+            "cached_embeddings": len(self._embeddings),
+            "pairs_considered": self.pairs_considered,
+            "pairs_skipped": self.pairs_skipped
+        }
+
+    def _store(self, uuid: str, text: str, vector: np.ndarray):
+        self._embeddings[uuid] = (text, vector)
+        self._embeddings.move_to_end(uuid)
+        while len(self._embeddings) > self.max_cached:
+            self._embeddings.popitem(last=False)
+
+    def _lookup(self, uuid: str) -> np.ndarray:
+        self._embeddings.move_to_end(uuid)
+        return self._embeddings[uuid][1]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Mean-pooled, L2-normalized sentence embeddings (blocking)."""
+        with self._encode_lock, torch.no_grad():
+            inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+            token_embeddings = self.model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        return pooled.numpy()
@@ -1,31 +1,105 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dataclasses import dataclass
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import torch.nn.functional as F
+from collections import OrderedDict
 from . import context_store 
+from .api_config import APIConfig
+from .nli_model import NLIModel
+from .candidate_filter import CandidateFilter
 import logging
-import asyncio
 import os
 import json
+import hashlib
+
+PREFILTER_MODES = ('off', 'on', 'shadow')
 
 @dataclass
 class ContradictionResult:
     detected: bool
     contradictions: List[Dict] = None  # Now includes UUIDs
+    pairs_skipped: int = 0  # Pairs left out (or, in shadow mode, that would be left out) by the pre-filter
+    scores: Dict[str, float] = None  # Contradiction score per scored previous segment UUID
+    skipped: List[str] = None  # Previous segment UUIDs the pre-filter left out unscored ('on' mode)
+
+class ContradictionScoreCache:
+    """Bounded LRU cache of contradiction scores keyed on context-wrapped (premise, hypothesis) text.
+
+    Keys are SHA-256 digests, so each entry costs a fixed ~150 bytes regardless of text length
+    and max_entries bounds the memory used.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._scores = OrderedDict()  # {digest: contradiction_score}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(premise: str, hypothesis: str) -> bytes:
+        return hashlib.sha256(f"{premise}\x00{hypothesis}".encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[float]:
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key: bytes, score: float):
+        if self.max_entries <= 0:
+            return
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        while len(self._scores) > self.max_entries:
+            self._scores.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._scores),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+def prefilter_mode(config: APIConfig) -> str:
+    """NLI_PREFILTER_MODE, checked against PREFILTER_MODES"""
+    if config.nli_prefilter_mode not in PREFILTER_MODES:
+        raise ValueError(f"Unknown NLI pre-filter mode '{config.nli_prefilter_mode}'. Available: {list(PREFILTER_MODES)}")
+    return config.nli_prefilter_mode
+
+def build_candidate_filter(config: APIConfig) -> Optional[CandidateFilter]:
+    """The bi-encoder pre-filter NLI_PREFILTER_MODE asks for ('on' or 'shadow'), or None when it is 'off'"""
+    if prefilter_mode(config) == 'off':
+        return None
+    return CandidateFilter(
+        model_name=config.nli_prefilter_model,
+        top_k=config.nli_prefilter_top_k,
+        min_similarity=config.nli_prefilter_min_similarity,
+        executor=NLIModel().executor
+    )
 
 class ConsistencyService:
-    def __init__(self):
-        self.model = AutoModelForSequenceClassification.from_pretrained('cross-encoder/nli-deberta-v3-small')
-        self.tokenizer = AutoTokenizer.from_pretrained('cross-encoder/nli-deberta-v3-small', use_fast=False)
+    def __init__(self, context_id: str = None, score_cache: ContradictionScoreCache = None, candidate_filter: CandidateFilter = None):
+        # Shared model; inference runs in its own worker pool off the event loop
+        self.nli = NLIModel()
         self.contradiction_threshold = 0.9
+        config = APIConfig()
+        # Scores only depend on the context-wrapped texts, so the cache survives session resets
+        # (and can be shared between sessions)
+        self.score_cache = score_cache or ContradictionScoreCache(config.nli_score_cache_size)
+        # Optional bi-encoder shortlist in front of the cross-encoder
+        self.prefilter_mode = prefilter_mode(config)
+        self.candidate_filter = candidate_filter or build_candidate_filter(config)
         # Load questions 
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
 
-    async def reset_state(self):
+    async def reset_state(self, context_id: str = None):
         """Reset all session-specific state"""
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id or self.context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
         logging.info (f"Questions: {self.questions}, System Context: {self.system_context}")
     
     def _add_context(self, text: str, question_idx: int) -> str:
@@ -40,60 +114,101 @@ class ConsistencyService:
             # Early return if no previous segments
             if not previous_segments:
                 logging.info(f"No previous segments to check against for UUID: {current_segment['uuid']}")
-                return ContradictionResult(detected=False, contradictions=[])
+                return ContradictionResult(detected=False, contradictions=[], scores={})
+
+            logging.info(f"🔄 [Consistency] Starting check for UUID={current_segment['uuid']} against {len(previous_segments)} previous segments")
+
+            # Narrow down to the most related previous segments before running the cross-encoder
+            pairs_skipped = 0
+            skipped = []
+            shortlisted_uuids = None
+            if self.candidate_filter is not None:
+                shortlist = await self.candidate_filter.shortlist(current_segment, previous_segments)
+                pairs_skipped = len(previous_segments) - len(shortlist)
+                shortlisted_uuids = {previous_segments[i]['uuid'] for i in shortlist}
+                if self.prefilter_mode == 'on':
+                    skipped = [segment['uuid'] for segment in previous_segments if segment['uuid'] not in shortlisted_uuids]
+                    previous_segments = [previous_segments[i] for i in shortlist]
+
+            # Add question context to both sides of every (previous, current) pair
+            current_text_with_context = self._add_context(
+                current_segment['text'], 
+                current_segment.get('question_idx', 0)
+            )
+            prev_texts_with_context = [
+                self._add_context(
+                    prev_segment['text'], 
+                    prev_segment.get('question_idx', 0)  # Default to 0 if not provided
+                )
+                for prev_segment in previous_segments
+            ]
+            logging.info(f"Current segment [{current_segment['uuid']}]: {current_text_with_context[:100]}...")
+
+            # Only run the model on pairs that are not already cached
+            cache_keys = [
+                self.score_cache.make_key(prev_text, current_text_with_context)
+                for prev_text in prev_texts_with_context
+            ]
+            contradiction_scores = [self.score_cache.get(key) for key in cache_keys]
+            missing = [i for i, score in enumerate(contradiction_scores) if score is None]
+            logging.info(f"🔄 [Consistency] {len(previous_segments) - len(missing)} cached pair scores, {len(missing)} to compute")
+
+            if missing:
+                new_scores = await self.nli.score_pairs(
+                    [(previous_segments[i].get('question_idx', 0), prev_texts_with_context[i]) for i in missing],
+                    [(current_segment.get('question_idx', 0), current_text_with_context)] * len(missing)
+                )
+                for i, score in zip(missing, new_scores):
+                    contradiction_scores[i] = score
+                    self.score_cache.put(cache_keys[i], score)
 
             contradictions = []
-            self.model.eval()
-            
-            async with asyncio.Lock():  # Protect model inference
-                with torch.no_grad():
-                    # runs model inference for pairwise consistency check
-                    for prev_segment in previous_segments:
-                        await asyncio.sleep(0)  # Allow other tasks
-                        logging.info(f"🔄 [Consistency] Starting check for UUID={current_segment['uuid']} against {len(previous_segments)} previous segments")
-                        logging.info(f"💭 [Consistency] Comparing segments:")
-                        
-                        
-                        # Add question context to both segments
-                        prev_text_with_context = self._add_context(
-                            prev_segment['text'], 
-                            prev_segment.get('question_idx', 0)  # Default to 0 if not provided
-                        )
-                        current_text_with_context = self._add_context(
-                            current_segment['text'], 
-                            current_segment.get('question_idx', 0)
-                        )
-                        logging.info(f"Previous segment [{prev_segment['uuid']}]: {prev_text_with_context[:100]}...")
-                        logging.info(f"Current segment [{current_segment['uuid']}]: {current_text_with_context[:100]}...")
-                        inputs = self.tokenizer(
-                            [prev_text_with_context],
-                            [current_text_with_context],
-                            padding=True,
-                            truncation=True,
-                            return_tensors="pt"
-                        )
-
-                        outputs = self.model(**inputs)
-                        scores = F.softmax(outputs.logits, dim=1)
-                        contradiction_score = scores[0][0].item()  # Get score for 'contradiction'
-                        logging.info(f"🔄 [Consistency] [Consistency] Contradiction score: {contradiction_score:.2f}")
-
-                        if contradiction_score >= self.contradiction_threshold:
-                            contradictions.append({
-                                "previous_segment": {
-                                    "uuid": prev_segment['uuid'],
-                                    "text": prev_segment['text']
-                                },
-                                "current_segment": {
-                                    "uuid": current_segment['uuid'],
-                                    "text": current_segment['text']
-                                },
-                                "contradiction_score": contradiction_score
-                            })
+            for prev_segment, contradiction_score in zip(previous_segments, contradiction_scores):
+                logging.info(f"🔄 [Consistency] Contradiction score against [{prev_segment['uuid']}]: {contradiction_score:.2f}")
+
+                if contradiction_score >= self.contradiction_threshold:
+                    contradictions.append({
+                        "previous_segment": {
+                            "uuid": prev_segment['uuid'],
+                            "text": prev_segment['text']
+                        },
+                        "current_segment": {
+                            "uuid": current_segment['uuid'],
+                            "text": current_segment['text']
+                        },
+                        "contradiction_score": contradiction_score
+                    })
+
+            if self.prefilter_mode == 'shadow' and shortlisted_uuids is not None:
+                missed = [
+                    c for c in contradictions
+                    if c['previous_segment']['uuid'] not in shortlisted_uuids
+                ]
+                logging.info(f"🔎 [Consistency] Shadow pre-filter would skip {pairs_skipped} pairs and miss {len(missed)} contradictions")
 
             detected = len(contradictions) > 0
-            return ContradictionResult(detected=detected, contradictions=contradictions)
+            scores = {
+                prev_segment['uuid']: contradiction_score
+                for prev_segment, contradiction_score in zip(previous_segments, contradiction_scores)
+            }
+            return ContradictionResult(
+                detected=detected,
+                contradictions=contradictions,
+                pairs_skipped=pairs_skipped,
+                scores=scores,
+                skipped=skipped
+            )
 
         except Exception as e:
             logging.error(f"Error in consistency check: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def get_cache_stats(self) -> Dict:
+        """Hit/miss counters and size of the contradiction score cache"""
+        return self.score_cache.stats()
+
+    def get_prefilter_stats(self) -> Dict:
+        """Pairs considered/skipped by the bi-encoder pre-filter"""
+        if self.candidate_filter is None:
+            return {"mode": self.prefilter_mode}
+        return {"mode": self.prefilter_mode, **self.candidate_filter.get_stats()}
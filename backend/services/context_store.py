@@ -5,6 +5,7 @@ import logging
 # Global storage for context data
 _CURRENT_CONTEXT_ID = "context1"  # Default to context1
 _CONTEXT_DATA = {}
+_AMBIGUITY_TYPES = None
 
 def _init_contexts():
     """Initialize contexts from a single file (called on module import)"""
@@ -33,14 +34,30 @@ def set_context(context_id):
         logging.warning(f"Context '{context_id}' not found, using context1")
         _CURRENT_CONTEXT_ID = "context1"
 
-def load_context():
-    """Get current context data (questions and system_context)"""
-    context = _CONTEXT_DATA.get(_CURRENT_CONTEXT_ID, _CONTEXT_DATA.get("context1", {}))
+def resolve_context_id(context_id):
+    """The context id to use for a requested one (context1 if it doesn't exist)"""
+    if context_id in _CONTEXT_DATA:
+        return context_id
+    logging.warning(f"Context '{context_id}' not found, using context1")
+    return "context1"
+
+def load_context(context_id=None):
+    """Get context data (questions and system_context) for context_id, or the active context"""
+    context = _CONTEXT_DATA.get(context_id or _CURRENT_CONTEXT_ID, _CONTEXT_DATA.get("context1", {}))
     return context.get("questions", {}), context.get("system_context", {
         "name": "System",
         "description": "",
         "type": "Web Application"
     })
 
+def load_ambiguity_types():
+    """Parsed ambiguity_types.json, read once and shared by every session (treat as read-only)"""
+    global _AMBIGUITY_TYPES
+    if _AMBIGUITY_TYPES is None:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(current_dir, 'ambiguity_types.json'), 'r') as f:
+            _AMBIGUITY_TYPES = json.load(f)
+    return _AMBIGUITY_TYPES
+
 # Initialize contexts when this module is imported
 _init_contexts()
\ No newline at end of file
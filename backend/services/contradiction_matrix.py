@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, List, Set
+import logging
+
+class ContradictionMatrix:
+    """
+    Per-session contradiction scores, segment UUID x segment UUID.
+
+    NLI scores are directional, so scores[uuid][other] is the score of uuid (the
+    hypothesis) checked against the earlier segment other (the premise). Each
+    segment's text at scoring time is kept alongside. A segment whose text changes
+    has its row and column invalidated,
+    and an emptied or deleted segment is dropped, so only pairs involving changed
+    segments ever need to be recomputed.
+
+    Pairs the pre-filter left out are stored as skipped with a score of 0.0, so
+    they are not sent again until one of their segments changes, and are never
+    reported as contradictions.
+    """
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        # {segment_uuid: text the stored scores were computed against}
+        self.texts: Dict[str, str] = {}
+        # {hypothesis_uuid: {premise_uuid: contradiction_score}}
+        self.scores: Dict[str, Dict[str, float]] = {}
+        # {hypothesis_uuid: {premise_uuid, ...}} pairs in scores that were skipped, not scored
+        self.skipped: Dict[str, Set[str]] = {}
+
+    def sync(self, segments: Dict[str, Dict]):
+        """Drop deleted/emptied segments and invalidate segments whose text changed"""
+        for uuid in list(self.texts):
+            segment = segments.get(uuid)
+            if segment is None or not segment.get('text', '').strip():
+                logging.info(f"🧮 [Consistency] Dropping segment {uuid} from contradiction matrix")
+                self.remove(uuid)
+            elif segment['text'] != self.texts[uuid]:
+                logging.info(f"🧮 [Consistency] Invalidating row/column for changed segment {uuid}")
+                self.remove(uuid)
+
+    def remove(self, uuid: str):
+        """Remove a segment's row and column"""
+        self.texts.pop(uuid, None)
+        self.scores.pop(uuid, None)
+        self.skipped.pop(uuid, None)
+        for row in self.scores.values():
+            row.pop(uuid, None)
+        for skipped in self.skipped.values():
+            skipped.discard(uuid)
+
+    def missing_pairs(self, uuid: str, others: List[str]) -> List[str]:
+        """UUIDs in others (premises) that have no valid score with uuid as the hypothesis"""
+        row = self.scores.get(uuid, {})
+        return [other for other in others if other not in row]
+
+    def update(self, uuid: str, segments: Dict[str, Dict], scores: Dict[str, float], skipped: Iterable[str] = ()):
+        """Store freshly computed scores of uuid (hypothesis) against other segments (premises),
+        and the premises the pre-filter skipped"""
+        skipped = [other for other in skipped if other not in scores]
+        for segment_uuid in [uuid, *scores, *skipped]:
+            text = segments[segment_uuid]['text']
+            if self.texts.get(segment_uuid, text) != text:
+                self.remove(segment_uuid)  # Scores against its old text are stale
+            self.texts[segment_uuid] = text
+        for other, score in scores.items():
+            self.scores.setdefault(uuid, {})[other] = score
+            self.skipped.get(uuid, set()).discard(other)
+        for other in skipped:
+            self.scores.setdefault(uuid, {})[other] = 0.0
+            self.skipped.setdefault(uuid, set()).add(other)
+
+    def is_skipped(self, uuid: str, other: str) -> bool:
+        return other in self.skipped.get(uuid, ())
+
+    def row(self, uuid: str) -> Dict[str, float]:
+        return dict(self.scores.get(uuid, {}))
+
+    def active_contradictions(self) -> List[Dict]:
+        """
+        All currently known pairs at or above the contradiction threshold, as
+        [premise, hypothesis]; a pair scored in both directions is reported once, with its higher score
+        """
+        pairs = {}
+        for uuid, row in self.scores.items():
+            for other, score in row.items():
+                if self.is_skipped(uuid, other):
+                    continue
+                key = frozenset((uuid, other))
+                if score >= self.threshold and score > pairs.get(key, {}).get("contradiction_score", -1.0):
+                    pairs[key] = {
+                        "segment_uuids": [other, uuid],
+                        "contradiction_score": score
+                    }
+        return sorted(pairs.values(), key=lambda c: c["contradiction_score"], reverse=True)
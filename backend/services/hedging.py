@@ -0,0 +1,63 @@
+from typing import Dict, Optional, Set
+from collections import deque
+import threading
+
+class HedgingPolicy:
+    """
+    Decides when a slow request gets a duplicate ("hedge") sent.
+
+    A request of an opted-in task type is hedged once it has been running longer
+    than the given percentile of recent successful attempt latencies for that task
+    type. Hedges are capped at max_ratio of the requests of each task type so
+    hedging cannot add more than that fraction of extra load.
+    """
+    def __init__(self, task_types: Set[str], percentile: float, min_samples: int,
+                 min_delay: float, max_ratio: float, window: int = 200):
+        self.task_types = task_types
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def applies_to(self, task_type: str) -> bool:
+        return task_type in self.task_types
+
+    def record_latency(self, task_type: str, latency: float):
+        """Record a successful attempt's latency, or how long a primary had run when its hedge won"""
+        if not self.applies_to(task_type):
+            return
+        with self._lock:
+            self._latencies.setdefault(task_type, deque(maxlen=self._window)).append(latency)
+
+    def hedge_delay(self, task_type: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies have been seen"""
+        with self._lock:
+            samples = sorted(self._latencies.get(task_type, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[index])
+
+    def count(self, task_type: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(
+                task_type, {"requests": 0, "hedges_sent": 0, "hedge_wins": 0, "suppressed_by_budget": 0}
+            )
+            counters[counter] += 1
+
+    def budget_allows(self, task_type: str) -> bool:
+        """Whether one more hedge keeps hedges within max_ratio of requests"""
+        with self._lock:
+            counters = self._counters.get(task_type, {})
+            return counters.get("hedges_sent", 0) + 1 <= self.max_ratio * counters.get("requests", 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {task_type: dict(counters) for task_type, counters in self._counters.items()}
+        for task_type in stats:
+            stats[task_type]["hedge_delay"] = self.hedge_delay(task_type)
+        return stats
@@ -13,26 +13,25 @@ class AmbiguityIntervention:
     suggestions: Optional[List[str]] = None
 
 class InterventionService:
-    def __init__(self, llm_manager):
+    def __init__(self, llm_manager, context_id: str = None):
         self.llm = llm_manager
 
-        # Load ambiguity types
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        ambiguity_type_path = os.path.join(current_dir, 'ambiguity_types.json')
-        with open(ambiguity_type_path, 'r') as f:
-            self.ambiguity_types = json.load(f)
+        # Load ambiguity types (parsed once, shared across sessions)
+        self.ambiguity_types = context_store.load_ambiguity_types()
         # Load questions and system context from the store
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
         self.interpretation_prompt = self._build_interpretation_prompt()
         
-    async def reset_state(self):
+    async def reset_state(self, context_id: str = None):
         """Reset all session-specific state"""
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id or self.context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
         self.interpretation_prompt = self._build_interpretation_prompt()
         logging.info (f"Questions: {self.questions}, System Context: {self.system_context}")
         logging.info (f"interpretation_prompt: {self.interpretation_prompt}")
 
-    async def generate_ambiguity_intervention(self, text: str, intervention_type: str, analysis_prompt: str) -> AmbiguityIntervention:
+    async def generate_ambiguity_intervention(self, text: str, intervention_type: str, analysis_prompt: str, cancel_token=None) -> AmbiguityIntervention:
         
         interp_result = await self.llm.submit_request_async(
                     messages=[
@@ -41,6 +40,7 @@ class InterventionService:
                     ],
                     task_type="analysis",
                     model="gpt-4",
+                    cancel_token=cancel_token,
                     max_tokens=200,
                     temperature=0.7
                 )
@@ -0,0 +1,218 @@
+from typing import Any, Dict, List, Optional
+from openai.types.chat import ChatCompletion, ChatCompletionMessage, ChatCompletionTokenLogprob
+from openai.types.chat.chat_completion import Choice, ChoiceLogprobs
+from openai.types import CompletionUsage
+import itertools
+import hashlib
+import asyncio
+import logging
+import random
+import httpx
+import json
+import math
+import time
+import re
+import openai
+
+class OpenAIBackend:
+    """Chat completions on the OpenAI API (the production backend)"""
+    name = 'openai'
+
+    def __init__(self, config, **kwargs):
+        self.api_key = config.openai_api_key
+        self._async_client = None
+        self._async_loop = None
+
+    def create(self, **params):
+        return openai.chat.completions.create(**params)
+
+    async def acreate(self, **params):
+        # The async client's connection pool belongs to the loop it was created on
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key)
+            self._async_loop = loop
+        return await self._async_client.chat.completions.create(**params)
+
+class MockLLMBackend:
+    """
+    Local stand-in for the OpenAI API, for load tests, benchmarks and offline runs.
+
+    Responses are real ChatCompletion objects (content, logprobs when requested,
+    usage), so every service code path runs unchanged. Content is rule-based and
+    deterministic per prompt:
+    - max_tokens=1 (ambiguity detection): "Yes" with probability ambiguity_rate, else "No"
+    - interpretation prompts: the {"interpretations": [...], "trigger_phrase": ...} JSON object
+    - requirement prompts: one requirement per "Segment n (UUID: ...)" in the prompt
+    - canned responses from responses_path ([{"match": regex, "content": str}]) take precedence
+
+    Latency is sampled from latency ("fixed:s", "uniform:lo,hi" or
+    "lognormal:median,sigma") plus token_latency_ms per completion token. A
+    fraction of calls fail with an API connection error (error_rate) or a 429
+    with a retry-after header (rate_limit_rate).
+    """
+    name = 'mock'
+
+    def __init__(self, config, **kwargs):
+        self.latency = self._parse_latency(config.mock_llm_latency)
+        self.token_latency = config.mock_llm_token_latency_ms / 1000
+        self.error_rate = config.mock_llm_error_rate
+        self.rate_limit_rate = config.mock_llm_rate_limit_rate
+        self.retry_after = config.mock_llm_retry_after
+        self.ambiguity_rate = config.mock_llm_ambiguity_rate
+        self.canned = []
+        if config.mock_llm_responses_path:
+            with open(config.mock_llm_responses_path, 'r') as f:
+                self.canned = [(re.compile(entry['match'], re.S), entry['content']) for entry in json.load(f)]
+        self.rng = random.Random(config.mock_llm_seed)
+        self._ids = itertools.count(1)
+
+        self.calls = 0
+        self.injected_errors = 0
+        self.injected_rate_limits = 0
+
+    def create(self, **params):
+        delay, error, response = self._prepare(params)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return response
+
+    async def acreate(self, **params):
+        delay, error, response = self._prepare(params)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return response
+
+    def get_stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "injected_errors": self.injected_errors,
+            "injected_rate_limits": self.injected_rate_limits
+        }
+
+    def _prepare(self, params: Dict[str, Any]):
+        """Decide the latency and outcome of one call"""
+        self.calls += 1
+        delay = self._sample_latency()
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.injected_rate_limits += 1
+            return delay, self._rate_limit_error(), None
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.injected_errors += 1
+            return delay, openai.APIConnectionError(request=self._http_request()), None
+
+        response = self._build_response(params)
+        delay += self.token_latency * response.usage.completion_tokens
+        return delay, None, response
+
+    def _sample_latency(self) -> float:
+        kind, args = self.latency
+        if kind == 'fixed':
+            return args[0]
+        if kind == 'uniform':
+            return self.rng.uniform(args[0], args[1])
+        return args[0] * math.exp(self.rng.gauss(0, args[1]))  # lognormal around the median
+
+    @staticmethod
+    def _parse_latency(spec: str):
+        kind, _, values = spec.partition(':')
+        args = [float(v) for v in values.split(',') if v.strip()]
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if kind not in expected or len(args) != expected[kind]:
+            raise ValueError(f"Invalid mock LLM latency '{spec}'. Use fixed:s, uniform:lo,hi or lognormal:median,sigma")
+        return kind, args
+
+    def _build_response(self, params: Dict[str, Any]) -> ChatCompletion:
+        messages = params.get('messages', [])
+        prompt = "\n".join(str(m.get('content', '')) for m in messages)
+        # Content is a function of the prompt so repeated requests agree (and cache like the real API)
+        rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+        content, logprob = self._content(messages, params, rng)
+
+        logprobs = None
+        if params.get('logprobs'):
+            logprobs = ChoiceLogprobs(content=[
+                ChatCompletionTokenLogprob(token=content.split()[0] if content.split() else content,
+                                           logprob=logprob, bytes=None, top_logprobs=[])
+            ])
+        prompt_tokens = len(prompt) // 4 + 4 * len(messages)
+        completion_tokens = max(1, len(content) // 4)
+        if params.get('max_tokens'):
+            completion_tokens = min(completion_tokens, params['max_tokens'])
+        return ChatCompletion(
+            id=f"mock-{next(self._ids)}",
+            object='chat.completion',
+            created=int(time.time()),
+            model=params.get('model', 'mock'),
+            choices=[Choice(
+                index=0,
+                finish_reason='stop',
+                message=ChatCompletionMessage(role='assistant', content=content),
+                logprobs=logprobs
+            )],
+            usage=CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens
+            )
+        )
+
+    def _content(self, messages: List[Dict[str, Any]], params: Dict[str, Any], rng: random.Random):
+        """Return (content, logprob of the first token)"""
+        system = next((str(m['content']) for m in messages if m.get('role') == 'system'), '')
+        user = next((str(m['content']) for m in reversed(messages) if m.get('role') == 'user'), '')
+        confidence = rng.uniform(0.5, 0.99)
+
+        for pattern, content in self.canned:
+            if pattern.search(user) or pattern.search(system):
+                return content, math.log(confidence)
+
+        if params.get('max_tokens') == 1:
+            return ("Yes" if rng.random() < self.ambiguity_rate else "No"), math.log(confidence)
+
+        if '"interpretations"' in system:
+            response = user.split('Response to analyze:', 1)[-1].strip()
+            words = response.split()
+            start = rng.randrange(len(words)) if words else 0
+            trigger_phrase = " ".join(words[start:start + 2]) or response
+            return json.dumps({
+                "interpretations": [f"{trigger_phrase} (interpretation {i})" for i in range(1, 4)],
+                "trigger_phrase": trigger_phrase
+            }), math.log(confidence)
+
+        segments = re.findall(r"Segment \d+ \(UUID: ([^)]+)\):\n(.*?)(?=\nSegment \d+ \(UUID:|\Z)", user, re.S)
+        if segments:
+            requirements = []
+            for uuid, text in segments:
+                text = text.strip().rstrip('.')
+                requirements.append({"requirement": f"The system shall {text[:1].lower()}{text[1:]}.", "segments": [uuid]})
+            return json.dumps(requirements), math.log(confidence)
+
+        return "This is a mock response.", math.log(confidence)
+
+    def _rate_limit_error(self) -> openai.RateLimitError:
+        response = httpx.Response(
+            429,
+            headers={"retry-after": str(self.retry_after)},
+            request=self._http_request()
+        )
+        return openai.RateLimitError("Mock rate limit exceeded", response=response, body=None)
+
+    @staticmethod
+    def _http_request() -> httpx.Request:
+        return httpx.Request("POST", "https://mock.invalid/v1/chat/completions")
+
+LLM_BACKENDS = {
+    backend.name: backend
+    for backend in (OpenAIBackend, MockLLMBackend)
+}
+
+def load_llm_backend(name: str, config, **kwargs):
+    """Instantiate the LLM backend registered under name"""
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available: {sorted(LLM_BACKENDS)}")
+    logging.info(f"🤖 [LLMManager] Using '{name}' LLM backend")
+    return LLM_BACKENDS[name](config, **kwargs)
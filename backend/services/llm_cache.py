@@ -0,0 +1,139 @@
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+from openai.types import CompletionUsage
+from openai.types.chat.chat_completion import Choice
+import threading
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import json
+import time
+import os
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM responses.
+
+    The first tier is a bounded in-memory LRU with a TTL. The optional second tier
+    is a SQLite file that survives restarts, for offline runs and session replays.
+    Responses keep their OpenAI response objects (including logprobs) in memory and
+    are stored as their JSON dump on disk. On the event loop use aget() and aput(),
+    which keep the SQLite I/O off the loop.
+    """
+    def __init__(self, max_entries: int, ttl: float, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds, 0 = never expire
+        self._entries = OrderedDict()  # {key: (stored_at, result)}
+        self._lock = threading.Lock()
+
+        self.db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL, payload TEXT)"
+            )
+            self.db.commit()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(api_params: Dict[str, Any]) -> str:
+        """Hash of model, messages and every request parameter that affects the output"""
+        relevant = {k: v for k, v in api_params.items() if k != 'timeout'}
+        return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if not self._expired(stored_at, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT stored_at, payload FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    result = self._deserialize(row[1])
+                    self._remember(key, row[0], result)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, result)
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO responses (key, stored_at, payload) VALUES (?, ?, ?)",
+                        (key, now, self._serialize(result))
+                    )
+                    self.db.commit()
+                except Exception as e:
+                    logging.error(f"❌ [LLMCache] Failed to persist response: {e}")
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() for the event loop: runs on a worker thread when there is a disk tier"""
+        if self.db is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, result: Dict[str, Any]):
+        """put() for the event loop: runs on a worker thread when there is a disk tier"""
+        if self.db is None:
+            return self.put(key, result)
+        await asyncio.to_thread(self.put, key, result)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def _remember(self, key: str, stored_at: float, result: Dict[str, Any]):
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _serialize(result: Dict[str, Any]) -> str:
+        return json.dumps({
+            "choices": [choice.model_dump() for choice in result["choices"]],
+            "usage": result["usage"].model_dump() if result.get("usage") is not None else None
+        })
+
+    @staticmethod
+    def _deserialize(payload: str) -> Dict[str, Any]:
+        data = json.loads(payload)
+        return {
+            "choices": [Choice.model_validate(choice) for choice in data["choices"]],
+            "usage": CompletionUsage.model_validate(data["usage"]) if data["usage"] is not None else None
+        }
@@ -2,16 +2,49 @@ import os
 import time
 import queue
 import threading
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, Future
+import itertools
+import random
+import heapq
 import uuid
 import openai
 import asyncio
 
 from .api_config import APIConfig, ModelConfig
+from .llm_cache import LLMResponseCache
+from .rate_limiter import ModelWaitQueues, RateLimiter, retry_after_seconds
+from .cancellation import CancellationToken
+from .hedging import HedgingPolicy
+from .llm_backends import load_llm_backend
+from .metrics import REGISTRY
 import logging
 
+# Instrumentation, exposed in Prometheus text format through /metrics
+QUEUE_WAIT = REGISTRY.histogram(
+    'llm_queue_wait_seconds', 'Time a request waited in the queue before an attempt started',
+    ['model', 'task_type']
+)
+ATTEMPT_DURATION = REGISTRY.histogram(
+    'llm_attempt_duration_seconds', 'Duration of a single API call', ['model', 'task_type', 'outcome']
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    'llm_request_duration_seconds', 'Time from submission to result, including queueing and retries',
+    ['model', 'task_type']
+)
+REQUESTS = REGISTRY.counter('llm_requests_total', 'Requests resolved, by outcome', ['model', 'task_type', 'outcome'])
+RETRIES = REGISTRY.counter('llm_retries_total', 'Attempts scheduled for a retry', ['model', 'task_type'])
+ERRORS = REGISTRY.counter('llm_errors_total', 'Failed attempts, by error class', ['model', 'task_type', 'error'])
+CACHE_HITS = REGISTRY.counter('llm_cache_hits_total', 'Requests answered from the response cache', ['model', 'task_type'])
+PROMPT_TOKENS = REGISTRY.counter('llm_prompt_tokens_total', 'Prompt tokens reported by the API', ['model', 'task_type'])
+COMPLETION_TOKENS = REGISTRY.counter(
+    'llm_completion_tokens_total', 'Completion tokens reported by the API', ['model', 'task_type']
+)
+QUEUE_DEPTH = REGISTRY.gauge('llm_queue_depth', 'Requests waiting for admission', ['path'])
+RETRY_PENDING = REGISTRY.gauge('llm_retry_pending', 'Requests waiting out a retry delay', ['path'])
+ACTIVE_REQUESTS = REGISTRY.gauge('llm_active_requests', 'Requests admitted and not yet resolved', ['path'])
+
 @dataclass
 class LLMRequest:
     request_id: str
@@ -20,6 +53,10 @@ class LLMRequest:
     timestamp: float
     task_type: str  # 'analysis', 'chat', 'intervention'
     kwargs: Dict[str, Any]
+    estimated_tokens: int = 0  # Prompt + max_tokens estimate charged to the rate limiter
+    queued_at: float = 0.0  # When the request last entered the queue
+    attempt: int = 0  # Attempts started so far
+    attempts: List[Dict[str, Any]] = field(default_factory=list)  # Per-attempt latency and outcome
 
 
 class LLMManager:
@@ -28,6 +65,9 @@ class LLMManager:
         self.config = APIConfig()
         openai.api_key = self.config.openai_api_key
 
+        # Where chat completion calls go (the OpenAI API or a local mock)
+        self.backend = load_llm_backend(self.config.llm_backend, self.config)
+
         # Initialize request queue with priority
         self.request_queue = queue.PriorityQueue()
 
@@ -43,16 +83,65 @@ class LLMManager:
         self.completion_count = 0
         self.total_tokens_used = 0
 
+        # Response cache for deterministic requests of opted-in task types
+        self.response_cache = LLMResponseCache(
+            max_entries=self.config.llm_cache_max_entries,
+            ttl=self.config.llm_cache_ttl,
+            db_path=self.config.llm_cache_db_path or None
+        )
+
+        # Per-model RPM/TPM admission control
+        self.rate_limiter = RateLimiter({
+            model: {"rpm": model_config.rpm, "tpm": model_config.tpm}
+            for model, model_config in self.config.model_configs.items()
+        })
+        # Requests waiting for their model's budget, so they don't hold up other models
+        self.throttled_requests = ModelWaitQueues()
+
+        # Duplicate slow interactive requests and keep the first answer
+        self.hedging = HedgingPolicy(
+            task_types=self.config.llm_hedge_task_types,
+            percentile=self.config.llm_hedge_percentile,
+            min_samples=self.config.llm_hedge_min_samples,
+            min_delay=self.config.llm_hedge_min_delay,
+            max_ratio=self.config.llm_hedge_max_ratio
+        )
+
+        # Delay queue of requests waiting to be retried by the background thread
+        # heap of (due_time, sequence, queue_item)
+        self.retry_heap = []
+        self.retry_sequence = itertools.count()
+        self.retry_count = 0
+
         # Lock for thread-safe operations on active_requests
         self.lock = threading.Lock()
 
-        # Start background thread to process the queue
+        # Start background thread to process the queue (until shutdown() sets _stopping)
+        self._stopping = threading.Event()
         self.background_thread = threading.Thread(
             target=self._process_queue,
             daemon=True
         )
         self.background_thread.start()
 
+        # Native asyncio execution path, bound lazily to the running event loop
+        self._async_loop = None
+        self._async_queue = None  # asyncio.PriorityQueue of (priority, timestamp, seq, request, future)
+        self._async_slots = None  # asyncio.Semaphore limiting concurrent requests
+        self._async_dispatcher = None
+        self._async_throttled = ModelWaitQueues()
+        self._async_throttle_timer = None
+        self._async_sequence = itertools.count()
+        self._async_tasks: Dict[str, asyncio.Task] = {}  # request_id -> in-flight execution task
+
+        # Work saved by cancelling superseded requests
+        self.cancelled_queued = 0
+        self.cancelled_in_flight = 0
+        self.estimated_tokens_saved = 0
+        self.async_retry_pending = 0
+
+        REGISTRY.add_collector('llm_manager', self._collect_metrics)
+
     def submit_request(
         self,
         messages: List[Dict[str, Any]],
@@ -64,19 +153,46 @@ class LLMManager:
         Submit a new LLM request and return a unique request ID.
         The request is enqueued based on its priority.
         """
+        request = self._build_request(messages, task_type, model, kwargs)
+        priority = self.config.priorities.get(task_type, 10)  # Default low priority
+        # Registered now, so the request can be cancelled while it is queued or throttled
+        future = Future()
+        with self.lock:
+            self.active_requests[request.request_id] = future
+
+        # Cached responses are returned without queueing, so they spend no rate-limit budget
+        cache_key = self._cache_key(request, self._build_api_params(request))
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                CACHE_HITS.inc(model=request.model, task_type=request.task_type)
+                self._finish_request(request, "success")
+                future.set_result(cached)
+                return request.request_id
+
+        # Add a unique counter to break timestamp ties
+        self.request_queue.put((priority, request.timestamp, id(request), request))
+        return request.request_id
+
+    def _build_request(self, messages: List[Dict[str, Any]], task_type: str, model: str, kwargs: Dict[str, Any]) -> LLMRequest:
         request_id = f"{int(time.time() * 1000)}_{task_type}_{uuid.uuid4().hex}"
-        request = LLMRequest(
+        max_tokens = kwargs.get("max_tokens", self._model_config(model).max_tokens)
+        return LLMRequest(
             request_id=request_id,
             messages=messages,
             model=model,
             timestamp=time.time(),
             task_type=task_type,
-            kwargs=kwargs
+            kwargs=kwargs,
+            estimated_tokens=self.rate_limiter.estimate_tokens(messages, max_tokens),
+            queued_at=time.time()
+        )
+
+    def _model_config(self, model: str) -> ModelConfig:
+        return self.config.model_configs.get(
+            model,
+            ModelConfig(max_tokens=500, temperature=0.3, timeout=30)
         )
-        priority = self.config.priorities.get(task_type, 10)  # Default low priority
-        # Add a unique counter to break timestamp ties
-        self.request_queue.put((priority, request.timestamp, id(request), request))
-        return request_id
 
     def get_request_result(self, request_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -98,7 +214,7 @@ class LLMManager:
         return None
 
     def cancel_request(self, request_id: str) -> bool:
-        """Cancel a pending request."""
+        """Cancel a request that is queued, throttled or handed to a worker but not yet started."""
         with self.lock:
             future = self.active_requests.get(request_id)
             if future and not future.done():
@@ -111,27 +227,204 @@ class LLMManager:
     def _process_queue(self):
         """
         Continuously process requests from the queue and submit them to the thread pool.
+        Requests waiting for a retry sit in retry_heap and are re-queued here once due,
+        so no worker is held during backoff.
         """
-        while True:
+        while not self._stopping.is_set():
             try:
-                priority, _, _, request = self.request_queue.get(timeout=1)  # Updated to unpack 4 items
-                future = self.thread_pool.submit(self._execute_request, request)
+                self._release_due_retries()
+                for item in self.throttled_requests.release_due():
+                    self.request_queue.put(item)
+                item = self.request_queue.get(timeout=self._next_wakeup())
+                priority, _, _, request = item
                 with self.lock:
-                    self.active_requests[request.request_id] = future
+                    future = self.active_requests.get(request.request_id)
+                if future is None or future.cancelled():
+                    # Cancelled while queued or throttled: drop it without spending budget
+                    self._record_cancellation(request, in_flight=False)
+                    continue
+                if self.throttled_requests.holds(request.model):
+                    # Wait behind the model's throttled requests
+                    self.throttled_requests.park(request.model, item)
+                    continue
+                wait = self.rate_limiter.try_acquire(request.model, request.estimated_tokens)
+                if wait > 0:
+                    # Out of budget: park it until the model's budget refills; other models keep going
+                    self.throttled_requests.park(request.model, item, wait)
+                    continue
+                attempt_future = self.thread_pool.submit(self._start_attempt, request, future)
+                attempt_future.add_done_callback(
+                    lambda f, item=item, future=future: self._on_attempt_done(item, future, f)
+                )
             except queue.Empty:
                 continue
             except Exception as e:
                 print(f"Error in processing queue: {e}")
 
+    def _release_due_retries(self):
+        now = time.time()
+        with self.lock:
+            while self.retry_heap and self.retry_heap[0][0] <= now:
+                _, _, item = heapq.heappop(self.retry_heap)
+                item[3].queued_at = now
+                self.request_queue.put(item)
+
+    def _next_wakeup(self) -> float:
+        """Seconds until a retry or a throttled request is due, at most 1"""
+        wait = 1.0
+        throttled_due = self.throttled_requests.next_due()
+        if throttled_due is not None:
+            wait = min(wait, throttled_due)
+        with self.lock:
+            if self.retry_heap:
+                wait = min(wait, max(0.0, self.retry_heap[0][0] - time.time()))
+        return wait
+
+    def _start_attempt(self, request: LLMRequest, future: Future) -> Optional[Dict[str, Any]]:
+        """Worker entry point; the request can still be cancelled until its first attempt starts here"""
+        # Retries find the future already running, also when an earlier attempt failed before calling the API
+        if not future.running() and not future.set_running_or_notify_cancel():
+            return None
+        return self._execute_request(request)
+
+    def _on_attempt_done(self, item, future: Future, attempt_future: Future):
+        """Resolve the request, or put it on the delay queue for another attempt"""
+        request = item[3]
+        if future.cancelled():
+            # Cancelled after it was handed to a worker; cancel_request() only succeeds before the
+            # first attempt starts, so no API call was made
+            self._record_cancellation(request, in_flight=False)
+            return
+        error = attempt_future.exception()
+        if error is None:
+            self._finish_request(request, "success")
+            future.set_result(attempt_future.result())
+            return
+        delay = self._retry_delay(request, error)
+        if delay is None:
+            self._finish_request(request, "error")
+            future.set_result({"error": f"Failed to process request {request.request_id} after {self.config.max_retries} attempts."})
+            return
+        with self.lock:
+            heapq.heappush(self.retry_heap, (time.time() + delay, next(self.retry_sequence), item))
+
     def _execute_request(self, request: LLMRequest) -> Dict[str, Any]:
         """
-        Execute an individual LLM request with retry logic.
-        Returns the response from OpenAI or an error message.
+        Execute one attempt of an LLM request.
+        Returns the response from OpenAI; raises on failure so the scheduler can retry.
         """
-        model_config: ModelConfig = self.config.model_configs.get(
+        api_params = self._build_api_params(request)
+        cache_key = self._cache_key(request, api_params)
+        if cache_key is not None:
+            # Answered by an identical request that finished while this one was queued
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                CACHE_HITS.inc(model=request.model, task_type=request.task_type)
+                return cached
+
+        request.attempt += 1
+        QUEUE_WAIT.observe(time.time() - request.queued_at, model=request.model, task_type=request.task_type)
+        started = time.perf_counter()
+        try:
+            response = self.backend.create(**api_params)
+        except Exception as e:
+            self._record_attempt(request, started, e)
+            raise
+        self._record_attempt(request, started, None)
+        result = self._handle_response(request, response)
+
+        if cache_key is not None:
+            self.response_cache.put(cache_key, result)
+        return result
+
+    def _handle_response(self, request: LLMRequest, response) -> Dict[str, Any]:
+        result = {
+            "choices": response.choices,
+            "usage": response.usage
+        }
+        self.rate_limiter.record_usage(
             request.model,
-            ModelConfig(max_tokens=500, temperature=0.3, timeout=30)
+            request.estimated_tokens,
+            getattr(response.usage, "total_tokens", None)
         )
+
+        # Update usage statistics
+        with self.lock:
+            self.completion_count += 1
+            if response.usage is not None:
+                self.total_tokens_used += response.usage.total_tokens
+        if response.usage is not None:
+            PROMPT_TOKENS.inc(response.usage.prompt_tokens, model=request.model, task_type=request.task_type)
+            COMPLETION_TOKENS.inc(response.usage.completion_tokens, model=request.model, task_type=request.task_type)
+        return result
+
+    def _record_attempt(self, request: LLMRequest, started: float, error: Optional[BaseException], hedge: bool = False):
+        """Record the latency and outcome of a single attempt"""
+        latency = time.perf_counter() - started
+        request.attempts.append({
+            "attempt": request.attempt,
+            "latency": latency,
+            "error": type(error).__name__ if error is not None else None,
+            "hedge": hedge
+        })
+        if error is None:
+            self.hedging.record_latency(request.task_type, latency)
+        if not isinstance(error, asyncio.CancelledError):  # Cancelled calls are counted as cancellations, not errors
+            ATTEMPT_DURATION.observe(
+                latency, model=request.model, task_type=request.task_type,
+                outcome="success" if error is None else "error"
+            )
+            if error is not None:
+                ERRORS.inc(model=request.model, task_type=request.task_type, error=type(error).__name__)
+        logging.debug(f"[LLMManager] Attempt {request.attempt} of {request.request_id} took {latency:.2f}s")
+
+    def _retry_delay(self, request: LLMRequest, error: Exception) -> Optional[float]:
+        """
+        Log a failed attempt and return how long to wait before the next one,
+        or None if the request has used all its attempts.
+        """
+        retry_after = None
+        if isinstance(error, openai.RateLimitError):
+            print(f"Rate limit error on attempt {request.attempt} for request {request.request_id}: {error}")
+            retry_after = retry_after_seconds(error)
+            if retry_after is not None:
+                self.rate_limiter.block(request.model, retry_after)
+        elif isinstance(error, openai.APIError):
+            print(f"OpenAI error on attempt {request.attempt} for request {request.request_id}: {error}")
+        else:
+            print(f"Unexpected error on attempt {request.attempt} for request {request.request_id}: {error}")
+
+        if request.attempt >= self.config.max_retries:
+            return None
+
+        # Exponential backoff with jitter, or longer if the API asked for it
+        delay = self.config.retry_delay * (2 ** (request.attempt - 1)) * random.uniform(0.5, 1.5)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        with self.lock:
+            self.retry_count += 1
+        RETRIES.inc(model=request.model, task_type=request.task_type)
+        return delay
+
+    def _finish_request(self, request: LLMRequest, outcome: str):
+        """Record the end-to-end result of a request"""
+        REQUESTS.inc(model=request.model, task_type=request.task_type, outcome=outcome)
+        REQUEST_DURATION.observe(time.time() - request.timestamp, model=request.model, task_type=request.task_type)
+
+    def _collect_metrics(self):
+        """Refresh the gauges read from live state before /metrics is rendered"""
+        with self.lock:
+            QUEUE_DEPTH.set(self.request_queue.qsize() + len(self.throttled_requests), path="thread")
+            RETRY_PENDING.set(len(self.retry_heap), path="thread")
+            ACTIVE_REQUESTS.set(sum(1 for f in self.active_requests.values() if not f.done()), path="thread")
+        QUEUE_DEPTH.set(
+            (self._async_queue.qsize() if self._async_queue is not None else 0) + len(self._async_throttled), path="async"
+        )
+        RETRY_PENDING.set(self.async_retry_pending, path="async")
+        ACTIVE_REQUESTS.set(len(self._async_tasks), path="async")
+
+    def _build_api_params(self, request: LLMRequest) -> Dict[str, Any]:
+        model_config = self._model_config(request.model)
         
         # Create base params from model config
         api_params = {
@@ -144,53 +437,254 @@ class LLMManager:
 
         # Update with any overrides from request kwargs
         api_params.update(request.kwargs)
+        return api_params
 
-        for attempt in range(1, self.config.max_retries + 1):
-            try:
-                response = openai.chat.completions.create(**api_params)
+    def _cache_key(self, request: LLMRequest, api_params: Dict[str, Any]) -> Optional[str]:
+        """Cache key for the request, or None if its task type has not opted in or it is not deterministic"""
+        if request.task_type not in self.config.llm_cache_task_types:
+            return None
+        if api_params.get("temperature") != 0:
+            return None
+        return self.response_cache.make_key(api_params)
 
-                result = {
-                    "choices": response.choices,
-                    "usage": response.usage
-                }
+    async def submit_request_async(
+        self,
+        messages: List[Dict[str, Any]],
+        task_type: str,
+        model: str,
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Submit a request on the native asyncio path and await its result.
+        Requests are admitted in priority order by an async scheduler and run on the
+        async OpenAI client, so no thread or polling loop is tied up per request.
 
-                # Update usage statistics
-                with self.lock:
-                    self.completion_count += 1
+        Cancelling cancel_token drops the request if it is still queued, or aborts the
+        in-flight HTTP call; either way the result is {"error": "Cancelled", "cancelled": True}.
+        """
+        self._ensure_async_scheduler()
+        request = self._build_request(messages, task_type, model, kwargs)
+        if cancel_token is not None and cancel_token.cancelled:
+            return {"error": "Cancelled", "cancelled": True}
 
-                return result
+        # Cached responses are returned without queueing, so they spend no rate-limit budget
+        api_params = self._build_api_params(request)
+        cache_key = self._cache_key(request, api_params)
+        if cache_key is not None:
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                CACHE_HITS.inc(model=request.model, task_type=request.task_type)
+                self._finish_request(request, "success")
+                return cached
 
-            except openai.RateLimitError as e:
-                print(f"Rate limit error on attempt {attempt} for request {request.request_id}: {e}")
-            except openai.APIError as e:
-                print(f"OpenAI error on attempt {attempt} for request {request.request_id}: {e}")
-            except Exception as e:
-                print(f"Unexpected error on attempt {attempt} for request {request.request_id}: {e}")
+        priority = self.config.priorities.get(task_type, 10)  # Default low priority
+        future = self._async_loop.create_future()
+        self._async_queue.put_nowait((priority, request.timestamp, next(self._async_sequence), request, future))
 
-            # Exponential backoff before retrying
-            sleep_time = self.config.retry_delay * (2 ** (attempt - 1))
-            time.sleep(sleep_time)
+        def on_cancel():
+            self._cancel_async_request(request, future)
 
-        return {"error": f"Failed to process request {request.request_id} after {self.config.max_retries} attempts."}
+        if cancel_token is not None:
+            cancel_token.add_callback(on_cancel)
+        try:
+            result = await future
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(on_cancel)
 
-    async def submit_request_async(self, *args, **kwargs) -> Dict:
-        """Async wrapper around request submission and waiting"""
-        request_id = self.submit_request(*args, **kwargs)
-        return await self._wait_for_completion(request_id)
-        
-    async def _wait_for_completion(self, request_id: str, timeout: int = 30) -> Dict:
-        """Async wait for request completion"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            result = self.get_request_result(request_id)
-            if result:
-                return result
-            await asyncio.sleep(0.1)
-        return {"error": "Timeout"}
+        if cache_key is not None and "error" not in result:
+            await self.response_cache.aput(cache_key, result)
+        return result
+
+    def _cancel_async_request(self, request: LLMRequest, future: asyncio.Future):
+        """Resolve a cancelled request and abort its HTTP call if it is already running"""
+        if future.done():
+            return
+        future.set_result({"error": "Cancelled", "cancelled": True})
+        task = self._async_tasks.get(request.request_id)
+        if task is not None:
+            task.cancel()
+        # Still queued if there is no task; the dispatcher then drops it without calling the API
+        self._record_cancellation(request, in_flight=task is not None)
+
+    def _record_cancellation(self, request: LLMRequest, in_flight: bool):
+        """Count a cancelled request (on either execution path) and the work it saved"""
+        self._finish_request(request, "cancelled")
+        with self.lock:
+            if in_flight:
+                self.cancelled_in_flight += 1
+                self.estimated_tokens_saved += self._build_api_params(request).get("max_tokens", 0)
+            else:
+                self.cancelled_queued += 1
+                self.estimated_tokens_saved += request.estimated_tokens
+        if in_flight:
+            logging.info(f"🛑 [LLMManager] Aborted in-flight request {request.request_id}")
+        else:
+            logging.info(f"🛑 [LLMManager] Dropped queued request {request.request_id}")
+
+    def get_cancellation_stats(self) -> Dict[str, int]:
+        """Calls and (estimated) tokens saved by cancelling superseded requests"""
+        return {
+            "cancelled_queued": self.cancelled_queued,
+            "cancelled_in_flight": self.cancelled_in_flight,
+            "calls_saved": self.cancelled_queued + self.cancelled_in_flight,
+            "estimated_tokens_saved": self.estimated_tokens_saved
+        }
+
+    def _ensure_async_scheduler(self):
+        """Create the async queue and dispatcher on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is loop and self._async_dispatcher is not None and not self._async_dispatcher.done():
+            return
+        self._async_loop = loop
+        self._async_queue = asyncio.PriorityQueue()
+        self._async_throttled = ModelWaitQueues()
+        self._async_throttle_timer = None
+        self._async_slots = asyncio.Semaphore(self.config.max_concurrent_requests)
+        self._async_dispatcher = loop.create_task(self._dispatch_async())
+
+    async def _dispatch_async(self):
+        """Admit queued requests, highest priority first, as concurrency slots free up"""
+        while True:
+            await self._async_slots.acquire()
+            item = await self._async_queue.get()
+            _, _, _, request, future = item
+            if future.done():  # Caller went away while queued
+                self._async_slots.release()
+                continue
+            if self._async_throttled.holds(request.model):
+                # Wait behind the model's throttled requests
+                self._async_throttled.park(request.model, item)
+                self._async_slots.release()
+                continue
+            wait = self.rate_limiter.try_acquire(request.model, request.estimated_tokens)
+            if wait > 0:
+                # Out of budget: park it until the model's budget refills; other models keep going
+                self._async_throttled.park(request.model, item, wait)
+                self._schedule_throttled_release()
+                self._async_slots.release()
+                continue
+            self._async_tasks[request.request_id] = asyncio.create_task(self._run_async(item))
+
+    async def _run_async(self, item):
+        """Run one attempt; on failure the request goes on a timer back into the queue, freeing its slot"""
+        _, _, _, request, future = item
+        try:
+            result = await self._execute_request_async(request)
+        except asyncio.CancelledError:
+            return  # Aborted through the request's cancellation token
+        except Exception as e:
+            delay = self._retry_delay(request, e)
+            if delay is not None:
+                self.async_retry_pending += 1
+                self._async_loop.call_later(delay, self._requeue_async, item)
+                return
+            result = {"error": f"Failed to process request {request.request_id} after {self.config.max_retries} attempts."}
+        finally:
+            self._async_tasks.pop(request.request_id, None)
+            self._async_slots.release()
+        if not future.done():
+            self._finish_request(request, "error" if "error" in result else "success")
+            future.set_result(result)
+
+    def _schedule_throttled_release(self):
+        """(Re)arm the timer that releases the next model's throttled requests"""
+        if self._async_throttle_timer is not None:
+            self._async_throttle_timer.cancel()
+            self._async_throttle_timer = None
+        next_due = self._async_throttled.next_due()
+        if next_due is not None:  # At least 10ms, as timers can fire marginally early
+            self._async_throttle_timer = self._async_loop.call_later(max(next_due, 0.01), self._release_throttled_async)
+
+    def _release_throttled_async(self):
+        """Return requests whose model budget should have refilled to the queue"""
+        self._async_throttle_timer = None
+        for item in self._async_throttled.release_due():
+            self._async_queue.put_nowait(item)
+        self._schedule_throttled_release()
+
+    def _requeue_async(self, item):
+        """Re-admit a request whose retry delay has passed"""
+        future = item[4]
+        self.async_retry_pending -= 1
+        if not future.done():
+            item[3].queued_at = time.time()
+            self._async_queue.put_nowait(item)
+
+    async def _execute_request_async(self, request: LLMRequest) -> Dict[str, Any]:
+        """
+        Execute one attempt of an LLM request on the async client, hedged if the
+        hedging policy covers its task type.
+        Returns the response from OpenAI; raises on failure so the scheduler can retry.
+        """
+        if not self.hedging.applies_to(request.task_type):
+            return await self._attempt_async(request)
+
+        self.hedging.count(request.task_type, "requests")
+        hedge_delay = self.hedging.hedge_delay(request.task_type)
+        primary_started = time.perf_counter()
+        primary = asyncio.create_task(self._attempt_async(request))
+        tasks = {primary}
+        try:
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    if not self.hedging.budget_allows(request.task_type):
+                        self.hedging.count(request.task_type, "suppressed_by_budget")
+                    elif self.rate_limiter.try_acquire(request.model, request.estimated_tokens) > 0:
+                        self.hedging.count(request.task_type, "suppressed_by_budget")
+                    else:
+                        logging.info(f"🔀 [LLMManager] Hedging {request.request_id} after {hedge_delay:.2f}s")
+                        self.hedging.count(request.task_type, "hedges_sent")
+                        tasks.add(asyncio.create_task(self._attempt_async(request, hedge=True)))
+
+            # First successful answer wins; the loser is cancelled below
+            error = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedging.count(request.task_type, "hedge_wins")
+                            # The primary is cancelled, so record the time it had already run (a lower bound on
+                            # its latency); keeping only the winners' latencies would pull the hedge delay down
+                            self.hedging.record_latency(request.task_type, time.perf_counter() - primary_started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt_async(self, request: LLMRequest, hedge: bool = False) -> Dict[str, Any]:
+        api_params = self._build_api_params(request)
+        if not hedge:
+            request.attempt += 1
+            QUEUE_WAIT.observe(time.time() - request.queued_at, model=request.model, task_type=request.task_type)
+        started = time.perf_counter()
+        try:
+            response = await self.backend.acreate(**api_params)
+        except BaseException as e:  # Includes cancellation of the in-flight call
+            self._record_attempt(request, started, e, hedge)
+            raise
+        self._record_attempt(request, started, None, hedge)
+        return self._handle_response(request, response)
+
+    def get_hedging_stats(self) -> Dict[str, Dict]:
+        """Per task type: requests, hedges sent, hedges that won, hedges suppressed by budget"""
+        return self.hedging.stats()
 
     def shutdown(self):
         """
         Shutdown the thread pool and background thread gracefully.
         """
+        self._stopping.set()
+        self.background_thread.join(timeout=5)
         self.thread_pool.shutdown(wait=True)
-        # Background thread is daemonized; it will exit when the main program exits.
\ No newline at end of file
+        if self._async_dispatcher is not None:
+            self._async_dispatcher.cancel()
+        self.response_cache.close()
+        REGISTRY.remove_collector('llm_manager', self._collect_metrics)
\ No newline at end of file
@@ -1,13 +1,104 @@
-import shutil
 import logging
+import threading
+import asyncio
+import queue
 import json
+import time
 import os
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Set
+
+from .api_config import APIConfig
+from .metrics import REGISTRY
+from .archiver import SessionArchiver
+
+EVENTS_FILE = "events.jsonl"
+
+# Legacy per-file groupings, now derived from the event store at read time
+UUID_EVENT_TYPES = ["segment_timing", "segment_edit", "intervention_response"]
+LIST_EVENT_TYPES = ["session_start", "activity_timeline", "ambiguity_analysis", "consistency_analysis", "intervention_mode_change", "display_mode_change"]
+QUESTION_EVENT_TYPES = ["segment_similarity", "stability_check", "requirement_generation", "requirement_rating", "baseline_requirement_generation"]
+
+FLUSH_POLICIES = ("always", "interval", "never")
+
+MAX_OPEN_FILES = 16
+
+EVENTS_LOGGED = REGISTRY.counter('log_events_total', 'Events written to session event logs')
+EVENTS_DROPPED = REGISTRY.counter('log_events_dropped_total', 'Events dropped because the log queue was full or the logger closed')
+BACKPRESSURE = REGISTRY.counter('log_backpressure_total', 'log() calls that found the log queue full and fell back to dropping the event')
+QUEUE_DEPTH = REGISTRY.gauge('log_queue_depth', 'Events waiting for the log writer')
+BATCH_SIZE = REGISTRY.histogram(
+    'log_write_batch_size', 'Events written per writer batch', buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+def read_events(session_dir: str, event_types: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the events of a session directory in the order they were logged.
+    A torn last line (e.g. after a crash) is skipped.
+    """
+    path = os.path.join(session_dir, EVENTS_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                event = json.loads(line)["event"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                logging.warning(f"⚠️ [Logger] Skipping unreadable line in {path}")
+                continue
+            if event_types is None or event.get("type") in event_types:
+                yield event
+
+def view_by_uuid(session_dir: str, event_type: str) -> Dict[str, List[Dict]]:
+    """{uuid: [events]}, as in the legacy <event_type>s.json files"""
+    view = {}
+    for event in read_events(session_dir, {event_type}):
+        view.setdefault(event["uuid"], []).append(event)
+    return view
+
+def view_by_question(session_dir: str, event_type: str) -> Dict[str, List[Dict]]:
+    """{question_idx: [events]}, as in the legacy <event_type>.json files"""
+    view = {}
+    for event in read_events(session_dir, {event_type}):
+        view.setdefault(str(event.get("question_idx")), []).append(event)
+    return view
+
+def view_list(session_dir: str, event_type: str) -> List[Dict]:
+    """[events], as in the legacy <event_type>.json files"""
+    return list(read_events(session_dir, {event_type}))
+
 
 class Logger:
-    def __init__(self, log_dir):
-        self.base_log_dir = log_dir  
+    """
+    Per-session, append-only event store.
+
+    Every event is appended as one line of {"logged_at", "event"} JSON to the
+    session's events.jsonl, so logging costs the same however long the session
+    runs. The per-uuid, per-question and list groupings of the old per-type JSON
+    files are views built when the log is read (view_by_uuid, view_by_question,
+    view_list).
+
+    log() only serializes the event and queues it, so it never blocks the event
+    loop; a background writer thread drains the queue in batches of up to
+    batch_size events or batch_interval seconds, writing all lines for the same
+    file in one call. An event logged while queue_size events are already
+    waiting is dropped; this backpressure is counted in log_backpressure_total
+    and every lost event in log_events_dropped_total.
+
+    flush_policy and fsync_policy ('always', 'interval' or 'never') decide when
+    written batches are handed to the OS and when they are forced to disk; with
+    'interval' this happens every sync_interval seconds, also when no further
+    events arrive. Both always happen on flush(), archive_session() and close().
+    flush() and read_events() wait for the writer; on the event loop use
+    aflush() and aread_events() instead.
+
+    archive_session() zips a session on the SessionArchiver's executor once
+    everything logged before it is on disk, without blocking the caller.
+    """
+    def __init__(self, log_dir, flush_policy: str = None, fsync_policy: str = None, sync_interval: float = None):
+        self.base_log_dir = log_dir
         self.log_dir = log_dir
         os.makedirs(log_dir, exist_ok=True)
         logging.basicConfig(
@@ -17,6 +108,34 @@ class Logger:
         )
         self.logger = logging.getLogger(__name__)
 
+        config = APIConfig()
+        self.flush_policy = flush_policy or config.log_flush_policy
+        self.fsync_policy = fsync_policy or config.log_fsync_policy
+        self.sync_interval = sync_interval if sync_interval is not None else config.log_sync_interval
+        for policy in (self.flush_policy, self.fsync_policy):
+            if policy not in FLUSH_POLICIES:
+                raise ValueError(f"Unknown log flush policy '{policy}'. Available: {list(FLUSH_POLICIES)}")
+        self.batch_size = max(1, config.log_batch_size)
+        self.batch_interval = config.log_batch_interval
+        self.queue_size = config.log_queue_size
+        # How long the idle writer waits before applying due 'interval' syncs
+        self._idle_timeout = self.sync_interval if "interval" in (self.flush_policy, self.fsync_policy) else None
+
+        # Owned by the writer thread: {path: open file}, least recently written first
+        self._files = OrderedDict()
+        self._last_flush: Dict[str, float] = {}
+        self._last_fsync: Dict[str, float] = {}
+
+        self.dropped = 0
+        self.backpressure = 0
+        self._closed = False
+        # Unbounded so flush/archive/stop requests never block; log() bounds the events in it
+        self._queue = queue.Queue()
+        self.archiver = SessionArchiver()
+        self._writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self._writer.start()
+        REGISTRY.add_collector('logger', lambda: QUEUE_DEPTH.set(self._queue.qsize()))
+
     def create_session_directory(self, session_id):
         """Creates a new session directory and updates current log path"""
         self.current_session = session_id
@@ -24,100 +143,247 @@ class Logger:
         os.makedirs(self.log_dir, exist_ok=True)
         self.logger.info(f"Created session directory: {self.log_dir}")
 
-    def log(self, data: dict):
+    def session(self) -> "SessionLogger":
+        """A handle with its own session directory that shares this logger's writer"""
+        return SessionLogger(self)
+
+    def log(self, data: dict, log_dir: str = None):
         # Add debug logging at start of method
-        logging.debug(f"Logger received data: {json.dumps(data)}")
-        
-        # Handle all UUID-based logs
-        if data["type"] in ["segment_timing", "segment_edit", "intervention_response"]:
-            logging.debug(f"Processing UUID-based log for type: {data['type']}")
-            filename = f"{data['type']}s.json"  
-            filepath = os.path.join(self.log_dir, filename)
-            self._log_to_file_by_uuid(filepath, data)
-        elif data["type"] in["session_start", "activity_timeline", "ambiguity_analysis", "consistency_analysis", "intervention_mode_change", "display_mode_change"]:
-            logging.debug(f"Processing standard log for type: {data['type']}")
-            filename = f"{data['type']}.json"  
-            filepath = os.path.join(self.log_dir, filename)
-            self._log_to_file(filepath, data)
-        # Handle requirement-related logs by question_id
-        elif data["type"] in ["segment_similarity", "stability_check", "requirement_generation", "requirement_rating", "baseline_requirement_generation"]:
-            logging.debug(f"Processing question_id based log for type: {data['type']}")
-            # Get question_id (could be either question_id or question_idx)
-            question_id = data.get("question_idx")
-            filename = f"{data['type']}.json"
-            filepath = os.path.join(self.log_dir, filename)
-            logging.debug(f"Writing to file: {filepath}")
-            self._log_to_file_by_question_id(filepath, data, question_id)
-            logging.info(f"Logged {data['type']} data for question_id: {question_id}")
-            
-        elif data["type"] == "survey_submission":
-            # Create a new file for final survey state
-            submission_file = os.path.join(self.log_dir, "survey_submission.json")
-            self._log_to_file(submission_file, data)
-            # Create zip file of all logs
-            shutil.make_archive(self.log_dir, 'zip', self.log_dir)
-            # Log completion in main log
-            self.logger.info(f"Survey completed and stored: {data.get('timestamp')}")
-
-    def _log_to_file_by_uuid(self, filepath: str, data: dict):
+        logging.debug(f"Logger received data: {data.get('type')}")
+
+        if self._closed:
+            self._drop(data)
+            return
         try:
-            # Initialize or load existing data
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    segments_data = json.load(f)
+            # Serialized now, so later changes to data don't leak into the log
+            line = json.dumps({"logged_at": datetime.now().isoformat(), "event": data}, default=str) + "\n"
+        except (TypeError, ValueError) as e:
+            self.logger.error(f"Error serializing {data.get('type')} event: {str(e)}")
+            return
+
+        if self._queue.qsize() >= self.queue_size:
+            self.backpressure += 1
+            BACKPRESSURE.inc()
+            self._drop(data)
+            return
+        self._queue.put_nowait(("event", log_dir or self.log_dir, line, data.get("type")))
+
+    def read_events(self, event_types: Optional[Set[str]] = None, log_dir: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream the current session's events (after writing what has been logged so far); blocks"""
+        self.flush()
+        return read_events(log_dir or self.log_dir, event_types)
+
+    async def aread_events(self, event_types: Optional[Set[str]] = None, log_dir: str = None) -> List[Dict[str, Any]]:
+        """read_events() for the event loop: flushes and reads on a worker thread"""
+        log_dir = log_dir or self.log_dir
+        await self.aflush()
+        return await asyncio.to_thread(lambda: list(read_events(log_dir, event_types)))
+
+    def archive_session(self, log_dir: str = None) -> Future:
+        """
+        Zip a session directory (the current one by default) in the background,
+        after every event logged so far has been written and synced. The returned
+        Future resolves to the archiver's result or raises its error.
+        """
+        done = Future()
+        if self._closed:
+            done.set_exception(RuntimeError("Logger is closed"))
+            return done
+        self._queue.put_nowait(("archive", log_dir or self.log_dir, done))
+        return done
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every event logged so far is written and synced to disk"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put_nowait(("flush", done))
+        return done.wait(timeout)
+
+    async def aflush(self, timeout: float = 10.0) -> bool:
+        """flush() for the event loop: waits on a worker thread"""
+        return await asyncio.to_thread(self.flush, timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Write out the queue, sync and close all files, stop the writer and finish pending archives"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(("stop", None))
+        self._writer.join(timeout)
+        self.archiver.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "dropped": self.dropped,
+            "backpressure": self.backpressure,
+            "archives": self.archiver.get_status()
+        }
+
+    def _drop(self, data: dict):
+        self.dropped += 1
+        EVENTS_DROPPED.inc()
+        self.logger.warning(f"⚠️ [Logger] Dropped {data.get('type')} event (log queue full or closed)")
+
+    def _write_loop(self):
+        """Writer thread: collect a batch (size or time bound) and write it"""
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self._idle_timeout)]
+            except queue.Empty:
+                self._sync_idle()
+                continue
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.batch_size and batch[-1][0] == "event":
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if not self._write_batch(batch):
+                    return
+            except Exception as e:
+                self.logger.error(f"Error writing log batch: {str(e)}")
+
+    def _write_batch(self, batch) -> bool:
+        """Write a batch, coalescing lines per file; returns False once told to stop"""
+        pending = OrderedDict()  # {path: [lines]}
+        events = 0
+        for item in batch:
+            kind = item[0]
+            if kind == "event":
+                _, log_dir, line, _ = item
+                pending.setdefault(os.path.join(log_dir, EVENTS_FILE), []).append(line)
+                events += 1
+                continue
+
+            self._write_pending(pending, force=True)
+            if kind == "flush":
+                item[1].set()
+            elif kind == "archive":
+                self._submit_archive(item[1], item[2])
+            elif kind == "stop":
+                self._close_files()
+                return False
+
+        self._write_pending(pending)
+        if events:
+            EVENTS_LOGGED.inc(events)
+            BATCH_SIZE.observe(events)
+        return True
+
+    def _sync_idle(self):
+        """Apply 'interval' syncs that came due while no events arrived"""
+        for path in list(self._files):
+            try:
+                self._sync(path)
+            except Exception as e:
+                self.logger.error(f"Error syncing log file {path}: {str(e)}")
+
+    def _write_pending(self, pending: Dict[str, List[str]], force: bool = False):
+        for path, lines in pending.items():
+            try:
+                f = self._open(path)
+                f.write("".join(lines))
+            except Exception as e:
+                self.logger.error(f"Error logging to file {path}: {str(e)}")
+        # Files written earlier in the batch get synced too on a forced sync
+        for path in (self._files if force else pending):
+            self._sync(path, force)
+        pending.clear()
+
+    def _submit_archive(self, log_dir: str, done: Future):
+        """Hand a synced session to the archiver; done follows the archive job"""
+        def relay(job: Future):
+            if job.exception() is not None:
+                done.set_exception(job.exception())
             else:
-                segments_data = {}
-            
-            # Get the UUID and add new timing data to its list
-            uuid = data["uuid"]
-            if uuid not in segments_data:
-                segments_data[uuid] = []
-            
-            segments_data[uuid].append(data)
-            
-            # Write back to file
-            with open(filepath, 'w') as f:
-                json.dump(segments_data, f, indent=2)
-                
-        except Exception as e:
-            self.logger.error(f"Error logging to file {filepath}: {str(e)}")
-    
-    def _log_to_file_by_question_id(self, filepath: str, data: dict, question_id):
+                done.set_result(job.result())
         try:
-            logging.debug(f"Starting _log_to_file_by_question_id for {filepath}")
-            # Initialize or load existing data
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    file_data = json.load(f)
-                   
-            else:
-                file_data = {}
-                logging.debug("Created new empty data structure")
-            
-            question_id_str = str(question_id)
-            if question_id_str not in file_data:
-                file_data[question_id_str] = []
-            
-            file_data[question_id_str].append(data)
-            
-            with open(filepath, 'w') as f:
-                json.dump(file_data, f, indent=2)
-                
+            self.archiver.submit(log_dir).add_done_callback(relay)
         except Exception as e:
-            self.logger.error(f"Error logging to file by question_id {filepath}: {str(e)}")
+            done.set_exception(e)
 
-    def _log_to_file(self, filepath: str, data: dict):
-        try:
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    existing_data = json.load(f)
-            else:
-                existing_data = []
-            
-            existing_data.append(data)
-            
-            with open(filepath, 'w') as f:
-                json.dump(existing_data, f, indent=2)
-                
-        except Exception as e:
-            self.logger.error(f"Error logging to file {filepath}: {str(e)}")
\ No newline at end of file
+    def _open(self, path: str):
+        f = self._files.get(path)
+        if f is not None:
+            self._files.move_to_end(path)
+            return f
+        f = open(path, 'a')
+        if f.tell() > 0 and not self._ends_with_newline(path):
+            f.write("\n")  # Don't glue new events onto a torn last line
+        self._files[path] = f
+        self._last_flush[path] = self._last_fsync[path] = time.monotonic()
+        while len(self._files) > MAX_OPEN_FILES:
+            oldest = next(iter(self._files))
+            self._sync(oldest, force=True)
+            self._files.pop(oldest).close()
+        return f
+
+    def _sync(self, path: str, force: bool = False):
+        """Apply the flush and fsync policies to a file after a write"""
+        f = self._files.get(path)
+        if f is None:
+            return
+        now = time.monotonic()
+        due = lambda policy, last: force or policy == "always" or (policy == "interval" and now - last >= self.sync_interval)
+        fsync = due(self.fsync_policy, self._last_fsync[path])
+        if fsync or due(self.flush_policy, self._last_flush[path]):
+            f.flush()
+            self._last_flush[path] = now
+        if fsync:
+            os.fsync(f.fileno())
+            self._last_fsync[path] = now
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _close_files(self):
+        for path in list(self._files):
+            self._sync(path, force=True)
+            self._files.pop(path).close()
+
+
+class SessionLogger:
+    """
+    One connection's view of a Logger.
+
+    Has the same create_session_directory/log/archive_session/read_events calls,
+    but keeps its own session directory, so concurrent sessions never switch
+    each other's log target. Events still go through the shared writer thread.
+    """
+    def __init__(self, logger: Logger):
+        self.logger = logger
+        self.log_dir = logger.base_log_dir
+        self.current_session = None
+
+    def create_session_directory(self, session_id):
+        """Creates a new session directory for this connection"""
+        self.current_session = session_id
+        self.log_dir = os.path.join(self.logger.base_log_dir, session_id)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.logger.logger.info(f"Created session directory: {self.log_dir}")
+
+    def log(self, data: dict):
+        self.logger.log(data, log_dir=self.log_dir)
+
+    def archive_session(self) -> Future:
+        return self.logger.archive_session(self.log_dir)
+
+    def read_events(self, event_types: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+        return self.logger.read_events(event_types, log_dir=self.log_dir)
+
+    async def aread_events(self, event_types: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        return await self.logger.aread_events(event_types, log_dir=self.log_dir)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        return self.logger.flush(timeout)
+
+    async def aflush(self, timeout: float = 10.0) -> bool:
+        return await self.logger.aflush(timeout)
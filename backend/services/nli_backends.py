@@ -0,0 +1,97 @@
+from transformers import AutoModelForSequenceClassification
+import numpy as np
+import torch
+import logging
+import os
+
+class TorchNLIBackend:
+    """fp32 PyTorch inference (the reference backend)"""
+    name = 'torch'
+    tensor_type = 'pt'  # Tokenizer output format this backend consumes
+
+    def __init__(self, model_name: str, **kwargs):
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+
+    def logits(self, inputs) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(**inputs).logits.float().numpy()
+
+class QuantizedTorchNLIBackend(TorchNLIBackend):
+    """PyTorch inference with dynamic int8 quantization of the Linear layers"""
+    name = 'torch-int8'
+
+    def __init__(self, model_name: str, **kwargs):
+        super().__init__(model_name)
+        self.model = torch.ao.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.model.eval()
+
+class OnnxNLIBackend:
+    """ONNX Runtime inference on an exported graph of the model.
+
+    The graph is exported from the PyTorch model on first use and reused from
+    onnx_path afterwards.
+    """
+    name = 'onnx'
+    tensor_type = 'np'
+
+    def __init__(self, model_name: str, onnx_path: str, num_threads: int = 0, **kwargs):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' NLI backend requires the onnxruntime package") from e
+
+        if not os.path.exists(onnx_path):
+            self._export(model_name, onnx_path)
+
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs) -> np.ndarray:
+        feed = {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names}
+        return self.session.run(None, feed)[0]
+
+    @staticmethod
+    def _export(model_name: str, onnx_path: str):
+        logging.info(f"📦 [NLI] Exporting {model_name} to ONNX at {onnx_path}")
+        os.makedirs(os.path.dirname(onnx_path) or '.', exist_ok=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        input_names = ['input_ids', 'attention_mask']
+        if getattr(model.config, 'type_vocab_size', 0) > 0:
+            # Segment IDs change the logits only when the model has token type embeddings
+            input_names.append('token_type_ids')
+        dummy = tuple(torch.ones((2, 8), dtype=torch.long) for _ in input_names)
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['logits'] = {0: 'batch'}
+        torch.onnx.export(
+            model,
+            dummy,
+            onnx_path,
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=17
+        )
+
+NLI_BACKENDS = {
+    backend.name: backend
+    for backend in (TorchNLIBackend, QuantizedTorchNLIBackend, OnnxNLIBackend)
+}
+
+def load_nli_backend(name: str, model_name: str, **kwargs):
+    """Instantiate the NLI inference backend registered under name"""
+    if name not in NLI_BACKENDS:
+        raise ValueError(f"Unknown NLI backend '{name}'. Available: {sorted(NLI_BACKENDS)}")
+    logging.info(f"🧠 [NLI] Loading {model_name} with '{name}' backend")
+    return NLI_BACKENDS[name](model_name, **kwargs)
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -0,0 +1,196 @@
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from transformers import AutoTokenizer
+import torch
+import threading
+import hashlib
+import logging
+
+from .api_config import APIConfig
+from .nli_backends import load_nli_backend, softmax
+from .nli_scheduler import NLIBatchScheduler, ContextText
+
+NLI_MODEL_NAME = 'cross-encoder/nli-deberta-v3-small'
+
+# Texts the fast tokenizer must encode exactly like the slow one before it is used
+TOKENIZER_PROBES = [
+    "In a requirement elicitation survey about the System, when asked 'What do you need?', the stakeholder responded: I'd like to log in quickly.",
+    "Users   shouldn't need to re-enter data (e.g. names, e-mails) more than once!",
+    "The café's booking system – über fast, 24/7, ≤2s response time… right?",
+    "",
+]
+
+def pad_pairs(tokenizer, pairs: List[Tuple[List[int], List[int]]], return_tensors: str = None):
+    """Model inputs for pairs of token IDs (without special tokens), truncated and padded to one batch"""
+    encodings = [tokenizer.prepare_for_model(premise, hypothesis, truncation=True) for premise, hypothesis in pairs]
+    return tokenizer.pad(encodings, padding=True, return_tensors=return_tensors)
+
+def encode_pairs(tokenizer, pairs: List[Tuple[str, str]]) -> Dict:
+    """Padded model inputs for text pairs, encoded the way NLIModel.score_pairs_sync encodes them"""
+    ids = {text: tokenizer.encode(text, add_special_tokens=False) for pair in pairs for text in pair}
+    return dict(pad_pairs(tokenizer, [(ids[premise], ids[hypothesis]) for premise, hypothesis in pairs]))
+
+class TokenCache:
+    """Thread-safe LRU of token IDs (without special tokens) keyed by (question_idx, text hash)"""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(item: ContextText) -> Tuple[int, bytes]:
+        question_idx, text = item
+        return question_idx, hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get(self, key) -> List[int]:
+        with self._lock:
+            ids = self._ids.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self._ids.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def put(self, key, ids: List[int]):
+        with self._lock:
+            self._ids[key] = ids
+            self._ids.move_to_end(key)
+            while len(self._ids) > self.max_entries:
+                self._ids.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._ids), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+class NLIModel:
+    """
+    Process-wide owner of the NLI cross-encoder.
+
+    Inference runs in a dedicated thread pool so the forward pass never blocks the
+    asyncio event loop. A single inference lock is shared by every caller and is the
+    one serialization point for the model. The inference backend (fp32 PyTorch, int8
+    PyTorch or ONNX Runtime) is selected by APIConfig.nli_backend.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        config = APIConfig()
+        self.batch_size = max(1, config.nli_batch_size)
+        self.torch_threads = config.nli_torch_threads
+
+        self.backend = load_nli_backend(
+            config.nli_backend,
+            NLI_MODEL_NAME,
+            onnx_path=config.nli_onnx_path,
+            num_threads=self.torch_threads
+        )
+        self.tokenizer = self._load_tokenizer()
+        self.token_cache = TokenCache(config.nli_token_cache_size)
+
+        # Shared serialization point for the model
+        self.inference_lock = threading.Lock()
+
+        # Dedicated worker pool for inference, separate from the LLM thread pool
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, config.nli_workers),
+            thread_name_prefix="nli-inference",
+            initializer=self._init_worker
+        )
+
+        # Pairs from all sessions are collected into shared batches
+        self.scheduler = NLIBatchScheduler(
+            score_fn=self.score_pairs_sync,
+            executor=self.executor,
+            window_ms=config.nli_batch_window_ms,
+            max_batch_size=self.batch_size
+        )
+
+        self._initialized = True
+
+    def _load_tokenizer(self):
+        """Use the Rust fast tokenizer if it encodes exactly like the slow one, else the slow one"""
+        slow = AutoTokenizer.from_pretrained(NLI_MODEL_NAME, use_fast=False)
+        try:
+            fast = AutoTokenizer.from_pretrained(NLI_MODEL_NAME, use_fast=True)
+        except Exception as e:
+            logging.warning(f"⚠️ [NLI] Fast tokenizer unavailable, using slow tokenizer: {e}")
+            return slow
+        # Compared through the inference path (encode, prepare_for_model, pad), including truncation
+        probes = TOKENIZER_PROBES + [" ".join(["requirement"] * (min(slow.model_max_length, 4096) + 8))]
+        pairs = [(premise, hypothesis) for premise in probes for hypothesis in probes]
+        if encode_pairs(fast, pairs) != encode_pairs(slow, pairs):
+            logging.warning("⚠️ [NLI] Fast tokenizer encodings differ from slow tokenizer, using slow tokenizer")
+            return slow
+        logging.info("⚡ [NLI] Using fast tokenizer")
+        return fast
+
+    def _init_worker(self):
+        """Apply torch thread settings in each inference worker"""
+        if self.torch_threads > 0:
+            torch.set_num_threads(self.torch_threads)
+        logging.info(f"🧵 [NLI] Inference worker started with {torch.get_num_threads()} torch threads")
+
+    async def score_pairs(self, premises: List[ContextText], hypotheses: List[ContextText]) -> List[float]:
+        """Awaitable scoring of (premise, hypothesis) pairs off the event loop.
+
+        Pairs are micro-batched with concurrent requests from other sessions.
+        Returns the contradiction probability for each pair, in input order.
+        """
+        return await self.scheduler.score(premises, hypotheses)
+
+    def get_stats(self) -> Dict:
+        """Queue depth, batch size and tokenization cache statistics"""
+        return {
+            "backend": self.backend.name,
+            "tokenizer": type(self.tokenizer).__name__,
+            "token_cache": self.token_cache.stats(),
+            **self.scheduler.get_stats()
+        }
+
+    def _token_ids(self, item: ContextText) -> List[int]:
+        """Token IDs of a context-wrapped segment, tokenized once and then cached"""
+        key = self.token_cache.make_key(item)
+        ids = self.token_cache.get(key)
+        if ids is None:
+            ids = self.tokenizer.encode(item[1], add_special_tokens=False)
+            self.token_cache.put(key, ids)
+        return ids
+
+    def score_pairs_sync(self, premises: List[ContextText], hypotheses: List[ContextText]) -> List[float]:
+        """Score pairs in padded batches of at most batch_size pairs (blocking).
+
+        Pairs are assembled from cached token IDs rather than re-tokenizing raw strings.
+        """
+        scores = []
+        with self.inference_lock:
+            for start in range(0, len(premises), self.batch_size):
+                inputs = pad_pairs(
+                    self.tokenizer,
+                    [
+                        (self._token_ids(premise), self._token_ids(hypothesis))
+                        for premise, hypothesis in zip(
+                            premises[start:start + self.batch_size],
+                            hypotheses[start:start + self.batch_size]
+                        )
+                    ],
+                    return_tensors=self.backend.tensor_type
+                )
+                probs = softmax(self.backend.logits(inputs))
+                scores.extend(probs[:, 0].tolist())  # Score for 'contradiction'
+        return scores
+
+    def shutdown(self):
+        """Stop the inference worker pool."""
+        self.executor.shutdown(wait=True)
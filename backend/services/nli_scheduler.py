@@ -0,0 +1,142 @@
+from typing import Callable, Dict, List, Tuple
+from concurrent.futures import Executor
+import asyncio
+import logging
+import time
+
+# A context-wrapped segment: (question_idx, text as produced by ConsistencyService._add_context)
+ContextText = Tuple[int, str]
+
+class NLIBatchScheduler:
+    """
+    Dynamic micro-batching of pair-scoring requests across all sessions.
+
+    Callers enqueue (premise, hypothesis) pairs and await one future per pair.
+    A single dispatcher collects pairs until max_batch_size is reached or
+    window_ms has passed since the first pair of the batch arrived, scores the
+    whole batch in one padded forward pass on the executor, then resolves
+    every caller's future. If a shared batch fails, each caller's pairs are
+    scored again on their own so only the failing request sees the error.
+    """
+    def __init__(self, score_fn: Callable[[List[ContextText], List[ContextText]], List[float]], executor: Executor,
+                 window_ms: float, max_batch_size: int):
+        self.score_fn = score_fn
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._loop = None
+        self._queue = None
+        self._dispatcher = None
+
+        # Statistics
+        self.batches = 0
+        self.pairs_scored = 0
+        self.batches_failed = 0
+        self.pairs_failed = 0
+        self.largest_batch = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+
+    async def score(self, premises: List[ContextText], hypotheses: List[ContextText]) -> List[float]:
+        """Enqueue pairs and wait for their contradiction scores, in input order."""
+        if not premises:
+            return []
+        self._ensure_dispatcher()
+        loop = asyncio.get_running_loop()
+        request = object()  # Identifies this caller's pairs within a shared batch
+        futures = []
+        for premise, hypothesis in zip(premises, hypotheses):
+            future = loop.create_future()
+            self._queue.put_nowait((premise, hypothesis, future, time.perf_counter(), request))
+            futures.append(future)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return list(await asyncio.gather(*futures))
+
+    def get_stats(self) -> Dict:
+        dispatched = self.pairs_scored + self.pairs_failed
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "pairs_scored": self.pairs_scored,
+            "batches_failed": self.batches_failed,
+            "pairs_failed": self.pairs_failed,
+            "mean_batch_size": self.pairs_scored / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "mean_wait_ms": self.total_wait / dispatched * 1000 if dispatched else 0.0
+        }
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            # (Re)bind to the running event loop
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that went away no longer need their pairs scored
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, _, enqueued, _ in batch:
+                self.total_wait += started - enqueued
+            try:
+                await self._score_batch(batch)
+            except Exception as e:
+                if len({item[4] for item in batch}) == 1:
+                    self._fail(batch, e)
+                    continue
+                logging.warning(f"⚠️ [NLI] Batch of {len(batch)} pairs failed ({e}), scoring each request on its own")
+                requests = {}
+                for item in batch:
+                    requests.setdefault(item[4], []).append(item)
+                for items in requests.values():
+                    try:
+                        await self._score_batch(items)
+                    except Exception as e:
+                        self._fail(items, e)
+
+    async def _score_batch(self, batch: List):
+        """Score a batch in one forward pass on the executor and resolve its futures"""
+        scores = await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            self.score_fn,
+            [premise for premise, _, _, _, _ in batch],
+            [hypothesis for _, hypothesis, _, _, _ in batch]
+        )
+        self.batches += 1
+        self.pairs_scored += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for (_, _, future, _, _), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+    def _fail(self, batch: List, error: Exception):
+        logging.error(f"❌ [NLI] Batch of {len(batch)} pairs failed: {error}")
+        self.batches_failed += 1
+        self.pairs_failed += len(batch)
+        for _, _, future, _, _ in batch:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Optional
+import threading
+import logging
+import time
+
+class TokenBucket:
+    """Continuously refilling bucket; capacity is the per-minute budget"""
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (requests larger than the bucket wait for a full bucket)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_rate
+
+    def consume(self, amount: float):
+        self.level -= amount
+
+class RateLimiter:
+    """
+    Proactive per-model admission control with requests-per-minute and
+    tokens-per-minute token buckets.
+
+    Token cost is estimated from the prompt plus max_tokens when a request is
+    admitted, then corrected from the usage the API reports. A retry-after hint
+    from a rate limit error blocks the model until it has passed.
+    """
+    def __init__(self, limits: Dict[str, Dict[str, int]]):
+        # {model: {"rpm": int, "tpm": int}}, 0 or missing = unlimited
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        for model, limit in limits.items():
+            buckets = {}
+            if limit.get("rpm"):
+                buckets["requests"] = TokenBucket(limit["rpm"])
+            if limit.get("tpm"):
+                buckets["tokens"] = TokenBucket(limit["tpm"])
+            self._buckets[model] = buckets
+        self._blocked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self.throttled = 0  # Admission attempts that had to wait
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+        """Rough token cost: ~4 characters per prompt token plus per-message overhead plus max_tokens"""
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        return prompt_chars // 4 + 4 * len(messages) + (max_tokens or 0)
+
+    def try_acquire(self, model: str, tokens: int) -> float:
+        """Consume budget for one request and return 0, or return the seconds to wait before retrying"""
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self._blocked_until.get(model, 0.0) - now)
+            buckets = self._buckets.get(model, {})
+            if "requests" in buckets:
+                wait = max(wait, buckets["requests"].wait_time(1, now))
+            if "tokens" in buckets:
+                wait = max(wait, buckets["tokens"].wait_time(tokens, now))
+            if wait > 0:
+                self.throttled += 1
+                return wait
+            if "requests" in buckets:
+                buckets["requests"].consume(1)
+            if "tokens" in buckets:
+                buckets["tokens"].consume(tokens)
+            return 0.0
+
+    def record_usage(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket with the usage the API actually reported"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            bucket = self._buckets.get(model, {}).get("tokens")
+            if bucket is not None:
+                bucket.consume(actual_tokens - estimated_tokens)
+
+    def block(self, model: str, seconds: float):
+        """Stop admitting requests for a model, e.g. on a retry-after hint"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._blocked_until[model] = max(self._blocked_until.get(model, 0.0), until)
+        logging.warning(f"⏳ [RateLimiter] Blocking {model} for {seconds:.1f}s")
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            for model, buckets in self._buckets.items():
+                for name, bucket in buckets.items():
+                    bucket._refill(now)
+                    levels[f"{model}:{name}"] = bucket.level
+            return {"throttled": self.throttled, "bucket_levels": levels}
+
+class ModelWaitQueues:
+    """
+    Requests turned away by the rate limiter, held per model until its budget refills.
+
+    A throttled request is parked here instead of staying at the head of the
+    shared priority queue, so requests for other models keep being admitted.
+    Requests for a model that already has parked requests join the back of its
+    queue, keeping that model's order. Used by a single dispatcher, so not locked.
+    """
+    def __init__(self):
+        self._queues: Dict[str, List[Any]] = {}
+        self._ready_at: Dict[str, float] = {}
+        self._size = 0  # Kept separately so len() is safe to read from a metrics collector
+
+    def holds(self, model: str) -> bool:
+        return model in self._queues
+
+    def park(self, model: str, item: Any, wait: float = 0.0):
+        """Hold item until model's budget is expected back (wait seconds from now at the earliest)"""
+        self._queues.setdefault(model, []).append(item)
+        self._size += 1
+        ready_at = time.monotonic() + wait
+        self._ready_at[model] = max(self._ready_at.get(model, 0.0), ready_at)
+
+    def release_due(self) -> List[Any]:
+        """Remove and return the requests of every model whose wait has passed"""
+        now = time.monotonic()
+        released = []
+        for model in [m for m, ready_at in self._ready_at.items() if ready_at <= now]:
+            del self._ready_at[model]
+            released.extend(self._queues.pop(model))
+        self._size -= len(released)
+        return released
+
+    def next_due(self) -> Optional[float]:
+        """Seconds until the next model's wait passes, or None if nothing is parked"""
+        if not self._ready_at:
+            return None
+        return max(0.0, min(self._ready_at.values()) - time.monotonic())
+
+    def __len__(self) -> int:
+        return self._size
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the retry-after hint from an OpenAI error response, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
@@ -1,6 +1,7 @@
 from typing import Dict, List, Optional, Tuple
 import logging
 from services.llm_manager import LLMManager
+from services.cancellation import CancellationToken
 from . import context_store
 import numpy as np
 import json
@@ -13,7 +14,7 @@ class RequirementService:
     """
     Service for analyzing segment stability and generating requirements.
     """
-    def __init__(self, llm_manager: LLMManager, logger, websocket_handler):
+    def __init__(self, llm_manager: LLMManager, logger, websocket_handler, context_id: str = None):
         self.llm_manager = llm_manager
         self.logger = logger
         self.ws = websocket_handler
@@ -30,6 +31,10 @@ class RequirementService:
         # {question_id: { "timestamp": timestamp}, "discarded": True/False,  "segments": [s["uuid"] for s in segments],}
         self.requirements_state = {}
 
+        # Cancellation tokens for in-progress generations
+        # {question_id: CancellationToken}
+        self.generation_tokens = {}
+
         # Store initial segment texts for baseline requirements
         self.initial_segment_texts = {}
         
@@ -40,19 +45,50 @@ class RequirementService:
         self.known_segment_uuids = set()
 
         # Load questions and system context from the store
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
     
-    async def reset_state(self):
+    async def reset_state(self, context_id: str = None):
         """Reset all session-specific state"""
         self.segment_similarity_history.clear()
         self.latest_segment_texts.clear()
         self.requirements_state.clear()
+        for token in self.generation_tokens.values():
+            token.cancel()
+        self.generation_tokens.clear()
         self.initial_segment_texts.clear()
         self.baseline_requirements.clear()
         self.known_segment_uuids.clear()
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id or self.context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
         logging.info (f"Questions: {self.questions}, System Context: {self.system_context}")
 
+    def export_state(self) -> Dict:
+        """Session state needed to resume the session on another worker"""
+        return {
+            "segment_similarity_history": self.segment_similarity_history,
+            "latest_segment_texts": self.latest_segment_texts,
+            "requirements_state": self.requirements_state,
+            "initial_segment_texts": self.initial_segment_texts,
+            "baseline_requirements": self.baseline_requirements,
+            "known_segment_uuids": self.known_segment_uuids
+        }
+
+    def restore_state(self, state: Dict):
+        """Resume from export_state() output"""
+        self.segment_similarity_history = state.get("segment_similarity_history", {})
+        self.latest_segment_texts = state.get("latest_segment_texts", {})
+        self.requirements_state = state.get("requirements_state", {})
+        self.initial_segment_texts = state.get("initial_segment_texts", {})
+        self.baseline_requirements = state.get("baseline_requirements", {})
+        self.known_segment_uuids = set(state.get("known_segment_uuids", set()))
+
+    async def close(self):
+        """Stop work for a closed session: cancel in-progress requirement generations"""
+        for token in self.generation_tokens.values():
+            token.cancel()
+        self.generation_tokens.clear()
+
     async def handle_segment_update(self, uuid: str, text: str, question_idx: int, segment_idx: int):
         """
         Handle a segment update - compare with previous version and calculate similarity.
@@ -259,6 +295,13 @@ class RequirementService:
         # Extract segment IDs for state tracking from valid segments only
         segment_ids = [segment["uuid"] for segment in valid_segments]
         
+        # A new generation supersedes any in-progress one for this question
+        if question_id in self.generation_tokens:
+            logging.info(f"🛑 [RequirementService] Cancelling superseded generation for question {question_id}")
+            self.generation_tokens[question_id].cancel()
+        cancel_token = CancellationToken()
+        self.generation_tokens[question_id] = cancel_token
+
         # Mark this question as having pending generation
         self.requirements_state[question_id] = {
             "timestamp": time.time(),
@@ -281,7 +324,7 @@ class RequirementService:
                 return
             
             # Generate requirements through LLM
-            requirements = await self._generate_requirements_with_llm(question_id, question_text, segment_texts)
+            requirements = await self._generate_requirements_with_llm(question_id, question_text, segment_texts, cancel_token=cancel_token)
             
             # Check if generation has been discarded before sending
             if question_id in self.requirements_state and self.requirements_state[question_id]["discarded"]:
@@ -326,7 +369,14 @@ class RequirementService:
                         del self.latest_segment_texts[uuid]
                         
         except Exception as e:
-            logging.error(f"❌ [RequirementService] Error generating requirements: {e}")
+            if cancel_token.cancelled:
+                logging.info(f"🛑 [RequirementService] Generation for question {question_id} was cancelled")
+            else:
+                logging.error(f"❌ [RequirementService] Error generating requirements: {e}")
+
+        finally:
+            if self.generation_tokens.get(question_id) is cancel_token:
+                del self.generation_tokens[question_id]
 
 
     async def handle_discard_request(self, question_id: int):
@@ -337,12 +387,14 @@ class RequirementService:
         
         # Check if we have active generation for this question
         if question_id in self.requirements_state:
-            # Mark as discarded
+            # Mark as discarded and stop its LLM call
             self.requirements_state[question_id]["discarded"] = True
+            if question_id in self.generation_tokens:
+                self.generation_tokens[question_id].cancel()
         else:
             logging.warning(f"⚠️ [RequirementService] No active generation found for question {question_id}")
 
-    async def _generate_requirements_with_llm(self, question_id: int, question_text: str, segment_texts: Dict[str, str],  target: str = "main"):
+    async def _generate_requirements_with_llm(self, question_id: int, question_text: str, segment_texts: Dict[str, str],  target: str = "main", cancel_token: Optional[CancellationToken] = None):
         """
         Generate requirements using LLM.
         
@@ -383,10 +435,14 @@ class RequirementService:
             ],
             task_type="requirement",
             model="gpt-4",
+            cancel_token=cancel_token,
             temperature=0.3,
             max_tokens=2000
         )
         
+        if response.get('cancelled'):
+            raise Exception("LLM generation cancelled")
+
         if 'error' in response:
             logging.error(f"❌ [RequirementService] LLM error: {response['error']}")
             raise Exception(f"LLM generation failed: {response['error']}")
@@ -0,0 +1,237 @@
+from typing import Dict, Iterator, Optional
+import logging
+import asyncio
+import time
+import uuid
+
+from . import context_store
+from .api_config import APIConfig
+from .logger import Logger, SessionLogger
+from .metrics import REGISTRY
+from .session_store import encode_state, decode_state, load_session_store
+from .analysis_service import AnalysisService
+from .consistency_service import ConsistencyService, ContradictionScoreCache, build_candidate_filter
+from .intervention_service import InterventionService
+from .requirement_service import RequirementService
+
+SESSIONS_OPENED = REGISTRY.counter('sessions_opened_total', 'Websocket sessions opened')
+ACTIVE_SESSIONS = REGISTRY.gauge('sessions_active', 'Websocket sessions currently connected')
+SENDS_DROPPED = REGISTRY.counter('session_sends_dropped_total', 'Messages not sent because the session had closed')
+STATE_SAVES = REGISTRY.counter('session_state_saves_total', 'Session snapshots written to the session-state store', ['outcome'])
+STATE_RESUMES = REGISTRY.counter('session_state_resumes_total', 'Reconnects that looked for a stored snapshot', ['outcome'])
+
+class SessionChannel:
+    """
+    Outbound channel of one connection.
+
+    Serializes sends from the session's concurrent tasks (analysis queue,
+    requirement generation, ...) and drops messages once the connection is gone
+    instead of raising into those tasks.
+    """
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.closed = False
+        self._lock = asyncio.Lock()
+
+    async def send_json(self, message: Dict):
+        if self.closed:
+            SENDS_DROPPED.inc()
+            logging.debug(f"Dropping {message.get('type')} message for a closed session")
+            return
+        async with self._lock:
+            try:
+                await self.websocket.send_json(message)
+            except Exception as e:
+                self.closed = True
+                SENDS_DROPPED.inc()
+                logging.warning(f"⚠️ [Session] Send failed, closing channel: {e}")
+
+    def close(self):
+        self.closed = True
+
+class Session:
+    """
+    State and services of one websocket connection.
+
+    With a session-state store, a snapshot of the session (connection state,
+    context and the services' export_state()) is saved at most every
+    save_interval seconds and on disconnect, so a reconnect to any worker can
+    resume() it. start() and resume() claim the session for this connection;
+    once another connection has claimed it, this one's saves are rejected by the
+    store and it stops saving.
+    """
+    def __init__(self, connection_id: str, channel: SessionChannel, logger: SessionLogger,
+                 intervention_service: InterventionService, requirement_service: RequirementService,
+                 analysis_service: AnalysisService, store=None, save_interval: float = 1.0):
+        self.connection_id = connection_id
+        self.channel = channel
+        self.logger = logger
+        self.intervention_service = intervention_service
+        self.requirement_service = requirement_service
+        self.analysis_service = analysis_service
+        self.state = {"segments": {}, "analysisStatus": {}}
+        self.session_id: Optional[str] = None
+        self.context_id = "context1"
+        self.opened_at = time.time()
+        self.store = store
+        self.save_interval = save_interval
+        self._last_saved = 0.0
+        self._version = 0  # Saves by this connection, so the store can ignore out-of-order ones
+        self._persist = True
+
+    async def start(self, session_id: str, context_id: str, segments: Dict = None):
+        """Begin a participant session: new log directory, fresh state, selected context"""
+        self.session_id = session_id
+        self.context_id = context_store.resolve_context_id(context_id)
+        self.logger.create_session_directory(session_id)
+        self.state["segments"] = segments or {}
+        if self.store is not None:
+            await asyncio.to_thread(self.store.claim, session_id, self.connection_id)
+        logging.info(f"Setting context to: {self.context_id}")
+
+        await self.requirement_service.reset_state(self.context_id)
+        await self.intervention_service.reset_state(self.context_id)
+        await self.analysis_service.reset_state(self.context_id)
+
+    async def resume(self, session_id: str) -> bool:
+        """Rejoin a session after a reconnect, restoring its stored snapshot if there is one"""
+        self.session_id = session_id
+        self.logger.create_session_directory(session_id)
+        payload = await asyncio.to_thread(self.store.claim, session_id, self.connection_id) if self.store is not None else None
+        if payload is None:
+            STATE_RESUMES.inc(outcome="not_found")
+            logging.warning(f"⚠️ [Session] No stored state for session {session_id}, continuing with fresh state")
+            return False
+
+        try:
+            snapshot = decode_state(payload)
+        except ValueError as e:
+            STATE_RESUMES.inc(outcome="unreadable")
+            logging.warning(f"⚠️ [Session] Stored state for session {session_id} is unreadable ({e}), continuing with fresh state")
+            return False
+        self.context_id = context_store.resolve_context_id(snapshot.get("context_id"))
+        await self.requirement_service.reset_state(self.context_id)
+        await self.intervention_service.reset_state(self.context_id)
+        await self.analysis_service.reset_state(self.context_id)
+        self.requirement_service.restore_state(snapshot.get("requirements", {}))
+        self.analysis_service.restore_state(snapshot.get("analysis", {}))
+        self.state.update(snapshot.get("state", {}))
+        STATE_RESUMES.inc(outcome="restored")
+        logging.info(f"♻️ [Session] Restored session {session_id} on connection {self.connection_id}")
+        return True
+
+    def snapshot(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "context_id": self.context_id,
+            "state": self.state,
+            "requirements": self.requirement_service.export_state(),
+            "analysis": self.analysis_service.export_state()
+        }
+
+    async def save(self, force: bool = False):
+        """Write a snapshot to the store (throttled to save_interval unless forced)"""
+        if self.store is None or self.session_id is None or not self._persist:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_saved < self.save_interval:
+            return
+        self._last_saved = now
+        self._version += 1
+        try:
+            # Encoded here, on the loop, so the services can't change the state mid-encode
+            payload = encode_state(self.snapshot())
+            saved = await asyncio.to_thread(self.store.save, self.session_id, payload, self.connection_id, self._version)
+            if not saved:
+                self._persist = False
+                STATE_SAVES.inc(outcome="superseded")
+                logging.info(f"♻️ [Session] Session {self.session_id} was resumed by another connection; "
+                             f"connection {self.connection_id} stops saving it")
+                return
+            STATE_SAVES.inc(outcome="saved")
+        except Exception as e:
+            STATE_SAVES.inc(outcome="failed")
+            logging.error(f"❌ [Session] Failed to save state of session {self.session_id}: {e}")
+
+    async def forget(self):
+        """Remove the stored snapshot once the session is finished (e.g. survey submitted)"""
+        self._persist = False
+        if self.store is not None and self.session_id is not None:
+            await asyncio.to_thread(self.store.delete, self.session_id)
+
+    async def close(self):
+        await self.save(force=True)
+        self.channel.close()
+        await self.analysis_service.close()
+        await self.requirement_service.close()
+
+class SessionRegistry:
+    """
+    Creates isolated per-connection sessions on top of shared resources.
+
+    Each connection gets its own services, state, log directory and outbound
+    channel. The expensive parts are created once and shared: LLMManager, the
+    Logger's writer thread, the NLI model (a singleton), the contradiction score
+    cache, the pre-filter bi-encoder and the parsed ambiguity types.
+
+    Session snapshots go to the session-state store selected by SESSION_STORE
+    ('memory' for a single worker, 'sqlite' for workers on one host, 'redis'
+    across hosts), or to store if given.
+    """
+    def __init__(self, llm_manager, logger: Logger, store=None):
+        self.llm_manager = llm_manager
+        self.logger = logger
+        config = APIConfig()
+        self.store = store if store is not None else load_session_store(config.session_store, config)
+        self.save_interval = config.session_state_save_interval
+        # Built once so every session's ConsistencyService reuses the cache and pre-filter model
+        self.score_cache = ContradictionScoreCache(config.nli_score_cache_size)
+        self.candidate_filter = build_candidate_filter(config)
+        context_store.load_ambiguity_types()
+
+        self._sessions: Dict[str, Session] = {}
+        REGISTRY.add_collector('sessions', lambda: ACTIVE_SESSIONS.set(len(self._sessions)))
+
+    def open(self, websocket) -> Session:
+        connection_id = uuid.uuid4().hex
+        channel = SessionChannel(websocket)
+        session_logger = self.logger.session()
+        intervention_service = InterventionService(llm_manager=self.llm_manager)
+        consistency_service = ConsistencyService(score_cache=self.score_cache, candidate_filter=self.candidate_filter)
+        session = Session(
+            connection_id=connection_id,
+            channel=channel,
+            logger=session_logger,
+            intervention_service=intervention_service,
+            requirement_service=RequirementService(
+                llm_manager=self.llm_manager, logger=session_logger, websocket_handler=channel
+            ),
+            analysis_service=AnalysisService(
+                llm_manager=self.llm_manager, websocket_handler=channel, intervention_service=intervention_service,
+                logger=session_logger, consistency_service=consistency_service
+            ),
+            store=self.store,
+            save_interval=self.save_interval
+        )
+        self._sessions[connection_id] = session
+        SESSIONS_OPENED.inc()
+        logging.info(f"🔌 [Session] Opened connection {connection_id} ({len(self._sessions)} active)")
+        return session
+
+    async def close(self, session: Session):
+        if self._sessions.pop(session.connection_id, None) is None:
+            return
+        await session.close()
+        logging.info(f"🔌 [Session] Closed connection {session.connection_id} ({len(self._sessions)} active)")
+
+    def get(self, connection_id: str) -> Optional[Session]:
+        return self._sessions.get(connection_id)
+
+    def sessions(self) -> Iterator[Session]:
+        return iter(list(self._sessions.values()))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def close_store(self):
+        self.store.close()
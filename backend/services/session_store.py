@@ -0,0 +1,285 @@
+from typing import Any, Dict, Optional
+import threading
+import logging
+import sqlite3
+import json
+import time
+import sys
+import os
+
+try:
+    import redis
+    from redis.exceptions import WatchError
+except ImportError:
+    redis = None
+
+    class WatchError(Exception):
+        """Stand-in for redis.exceptions.WatchError when the redis package is missing"""
+
+STATE_FORMAT = 2
+TYPE_KEY = "__state_type__"
+JSON_SCALARS = (str, int, float, bool, type(None))
+
+def encode_state(state: Dict[str, Any]) -> str:
+    """
+    JSON for a session snapshot that round-trips what the services keep in memory.
+
+    Dicts with non-string keys (e.g. question ids), sets and tuples become
+    {TYPE_KEY: 'map' | 'set' | 'tuple', 'items': [...]}; a dict that itself has a
+    TYPE_KEY key is encoded as a 'map' too, so real data never reads back as a tag.
+    numpy values become plain numbers or lists. Anything else raises TypeError
+    instead of being saved as something restore_state() can't use.
+    """
+    return json.dumps({"format": STATE_FORMAT, "state": _tag(state)})
+
+def decode_state(payload) -> Dict[str, Any]:
+    """Inverse of encode_state; raises ValueError for a payload in another format"""
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    document = json.loads(payload)
+    if not isinstance(document, dict) or document.get("format") != STATE_FORMAT:
+        raise ValueError(f"Unsupported session state format (expected {STATE_FORMAT})")
+    return _untag(document["state"])
+
+def _tag(value):
+    if isinstance(value, JSON_SCALARS):
+        return value
+    if isinstance(value, dict):
+        if TYPE_KEY not in value and all(isinstance(key, str) for key in value):
+            return {key: _tag(item) for key, item in value.items()}
+        return {TYPE_KEY: "map", "items": [[_tag(key), _tag(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [_tag(item) for item in value]
+    if isinstance(value, tuple):
+        return {TYPE_KEY: "tuple", "items": [_tag(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {TYPE_KEY: "set", "items": [_tag(item) for item in value]}
+    if type(value).__module__ == 'numpy' and hasattr(value, 'tolist'):
+        return value.tolist()  # numpy scalars and arrays (e.g. similarity scores)
+    raise TypeError(f"Cannot store {type(value).__name__} values in session state")
+
+def _untag(value):
+    if isinstance(value, list):
+        return [_untag(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if TYPE_KEY not in value:
+        return {key: _untag(item) for key, item in value.items()}
+    kind, items = value[TYPE_KEY], value["items"]
+    if kind == "map":
+        return {_untag(key): _untag(item) for key, item in items}
+    if kind == "tuple":
+        return tuple(_untag(item) for item in items)
+    if kind == "set":
+        return {_untag(item) for item in items}
+    raise ValueError(f"Unknown session state type '{kind}'")
+
+# Stores keep encoded snapshots (see encode_state) together with the connection
+# that owns the session and that owner's save counter:
+#   claim(session_id, owner) makes owner the only connection allowed to save the
+#     session (resetting the counter) and returns the stored payload or None;
+#   save(session_id, payload, owner, version) writes only if owner still owns the
+#     session and version is newer than the stored one, and returns whether it did,
+#     so a stale, half-open connection can't overwrite a newer snapshot;
+#   load(session_id) returns the payload or None without claiming.
+# Callers encode on the event loop, where the state is consistent, and can run
+# the store's blocking I/O in a thread.
+
+class InMemorySessionStore:
+    """Session snapshots in this process only (the default; a single worker)"""
+    name = 'memory'
+
+    def __init__(self, config=None, ttl: float = None):
+        self.ttl = ttl if ttl is not None else (config.session_state_ttl if config else 0)
+        self._states: Dict[str, list] = {}  # {session_id: [saved_at, owner, version, payload]}
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id: str) -> Optional[list]:
+        entry = self._states.get(session_id)
+        if entry is not None and self.ttl > 0 and time.time() - entry[0] > self.ttl:
+            del self._states[session_id]
+            return None
+        return entry
+
+    def load(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entry(session_id)
+        return entry[3] if entry is not None else None
+
+    def claim(self, session_id: str, owner: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry is None:
+                self._states[session_id] = [time.time(), owner, 0, None]
+                return None
+            entry[1], entry[2] = owner, 0
+            return entry[3]
+
+    def save(self, session_id: str, payload: str, owner: str, version: int) -> bool:
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry is not None and (entry[1] not in (None, owner) or entry[2] >= version):
+                return False
+            self._states[session_id] = [time.time(), owner, version, payload]
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._states.pop(session_id, None)
+
+    def close(self):
+        pass
+
+class SQLiteSessionStore:
+    """
+    Session snapshots in a SQLite file, shared by every worker process on the host.
+    Uses WAL mode so readers don't block the writer; saves are a conditional upsert.
+    """
+    name = 'sqlite'
+
+    def __init__(self, config=None, path: str = None, ttl: float = None):
+        self.path = path or config.session_store_path
+        self.ttl = ttl if ttl is not None else (config.session_state_ttl if config else 0)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS session_state "
+            "(session_id TEXT PRIMARY KEY, saved_at REAL, owner TEXT, version INTEGER NOT NULL DEFAULT 0, state TEXT)"
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(session_state)")}
+        if "owner" not in columns:  # Table created before saves were owned
+            self.db.execute("ALTER TABLE session_state ADD COLUMN owner TEXT")
+            self.db.execute("ALTER TABLE session_state ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if self.ttl > 0:
+            self.db.execute("DELETE FROM session_state WHERE saved_at < ?", (time.time() - self.ttl,))
+        self.db.commit()
+
+    def _load(self, session_id: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT saved_at, state FROM session_state WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or (self.ttl > 0 and time.time() - row[0] > self.ttl):
+            return None
+        return row[1]
+
+    def load(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            return self._load(session_id)
+
+    def claim(self, session_id: str, owner: str) -> Optional[str]:
+        with self._lock, self.db:
+            payload = self._load(session_id)
+            if payload is None:
+                # Also replaces an expired snapshot, so it can't be resumed later
+                self.db.execute(
+                    "INSERT OR REPLACE INTO session_state (session_id, saved_at, owner, version, state) "
+                    "VALUES (?, ?, ?, 0, NULL)",
+                    (session_id, time.time(), owner)
+                )
+            else:
+                self.db.execute(
+                    "UPDATE session_state SET owner = ?, version = 0 WHERE session_id = ?", (owner, session_id)
+                )
+            return payload
+
+    def save(self, session_id: str, payload: str, owner: str, version: int) -> bool:
+        with self._lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO session_state (session_id, saved_at, owner, version, state) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET "
+                "saved_at = excluded.saved_at, owner = excluded.owner, version = excluded.version, state = excluded.state "
+                "WHERE (session_state.owner IS NULL OR session_state.owner = excluded.owner) "
+                "AND session_state.version < excluded.version",
+                (session_id, time.time(), owner, version, payload)
+            )
+            return cursor.rowcount > 0
+
+    def delete(self, session_id: str):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+class RedisSessionStore:
+    """
+    Session snapshots in Redis (or any server speaking its protocol), shared by
+    workers on every node. Each session is a hash of owner, version and state;
+    saves check the owner inside a WATCH/MULTI transaction. Expiry is left to the
+    server (EXPIRE ttl).
+
+    Pass client to use an already configured client, e.g. fakeredis.FakeRedis()
+    as a local stand-in; otherwise the redis package connects to url.
+    """
+    name = 'redis'
+
+    def __init__(self, config=None, url: str = None, ttl: float = None, client=None, prefix: str = 'mire:session:'):
+        self.ttl = ttl if ttl is not None else (config.session_state_ttl if config else 0)
+        self.prefix = prefix
+        if client is None:
+            if redis is None:
+                raise ImportError("The redis session store requires the redis package (pip install redis)")
+            client = redis.Redis.from_url(url or config.session_store_url)
+        self.client = client
+        # An injected client raises the WatchError of its own library
+        client_package = sys.modules.get(type(client).__module__.split('.')[0])
+        self._watch_error = getattr(client_package, 'WatchError', WatchError)
+
+    @staticmethod
+    def _text(value) -> Optional[str]:
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def load(self, session_id: str) -> Optional[str]:
+        return self._text(self.client.hget(self.prefix + session_id, 'state'))
+
+    def claim(self, session_id: str, owner: str) -> Optional[str]:
+        key = self.prefix + session_id
+        with self.client.pipeline() as pipe:
+            pipe.hget(key, 'state')
+            pipe.hset(key, mapping={'owner': owner, 'version': 0})
+            if self.ttl > 0:
+                pipe.expire(key, int(self.ttl))
+            payload, _, *_ = pipe.execute()
+        return self._text(payload)
+
+    def save(self, session_id: str, payload: str, owner: str, version: int) -> bool:
+        key = self.prefix + session_id
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    stored_owner, stored_version = pipe.hmget(key, 'owner', 'version')
+                    if self._text(stored_owner) not in (None, owner) or int(stored_version or 0) >= version:
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.hset(key, mapping={'owner': owner, 'version': version, 'state': payload})
+                    if self.ttl > 0:
+                        pipe.expire(key, int(self.ttl))
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue  # Changed between WATCH and EXEC (e.g. claimed); check again
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+    def close(self):
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            close()
+
+SESSION_STORES = {
+    store.name: store
+    for store in (InMemorySessionStore, SQLiteSessionStore, RedisSessionStore)
+}
+
+def load_session_store(name: str, config, **kwargs):
+    """Instantiate the session-state store registered under name"""
+    if name not in SESSION_STORES:
+        raise ValueError(f"Unknown session store '{name}'. Available: {sorted(SESSION_STORES)}")
+    logging.info(f"🗄️ [Session] Using '{name}' session-state store")
+    return SESSION_STORES[name](config, **kwargs)
@@ -18,20 +18,17 @@ class AmbiguityResult:
     intervention_type: Optional[str] = None  # 'multiple_choice' or 'clarification'
 
 class DetectorService:
-    def __init__(self, llm_manager, intervention_service):
+    def __init__(self, llm_manager, intervention_service, context_id: str = None):
         """Initialize with LLMManager for request coordination"""
         self.llm = llm_manager
         self.intervention_service = intervention_service
         
-        # Load ambiguity types
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        ambiguity_type_path = os.path.join(current_dir, 'ambiguity_types.json')
-
-        with open(ambiguity_type_path, 'r') as f:
-            self.ambiguity_types = json.load(f)
+        # Load ambiguity types (parsed once, shared across sessions)
+        self.ambiguity_types = context_store.load_ambiguity_types()
         
         # Load questions and system context from the store
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
 
         # Build system prompts
         self.detection_prompt = self._build_detection_prompt()
@@ -40,14 +37,15 @@ class DetectorService:
         self.HIGH_CONFIDENCE = 0.7
         self.MEDIUM_CONFIDENCE = 0.5
 
-    async def reset_state(self):
+    async def reset_state(self, context_id: str = None):
         """Reset all session-specific state"""
-        self.questions, self.system_context = context_store.load_context()
+        self.context_id = context_id or self.context_id
+        self.questions, self.system_context = context_store.load_context(self.context_id)
         self.detection_prompt = self._build_detection_prompt()
         logging.info (f"Questions: {self.questions}, System Context: {self.system_context}")
         logging.info (f"detection_prompt: {self.detection_prompt}")
 
-    async def detect_ambiguity(self, text: str, question_idx:int) -> AmbiguityResult:
+    async def detect_ambiguity(self, text: str, question_idx:int, cancel_token=None) -> AmbiguityResult:
         """Detect ambiguity using logprobs analysis"""
         try:
             logging.info(f"🔍 Starting ambiguity detection for: {text[:50]}...")
@@ -62,12 +60,17 @@ class DetectorService:
                 ],
                 task_type="analysis",
                 model="gpt-4",
+                cancel_token=cancel_token,
                 logprobs=True,
                 top_logprobs=1,
                 max_tokens=1,
                 temperature=0
             )
 
+            if result.get('cancelled'):
+                logging.info(f"🛑 Ambiguity detection cancelled for: {text[:50]}...")
+                return AmbiguityResult(detected=False, confidence=0.0)
+
             if 'error' in result:
                 raise Exception(result['error'])
                 
@@ -91,7 +94,8 @@ class DetectorService:
                 intervention = await self.intervention_service.generate_ambiguity_intervention(
                     text=text,
                     intervention_type = intervention_type,
-                    analysis_prompt=analysis_prompt
+                    analysis_prompt=analysis_prompt,
+                    cancel_token=cancel_token
                 )
 
                 return AmbiguityResult(
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Tests run from backend/ or the repository root and import modules the way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LLM_BACKEND', 'mock')
+
+from services.api_config import APIConfig
+
+@pytest.fixture
+def config(monkeypatch):
+    """
+    A fresh APIConfig for one test, restored afterwards. Change it with
+    monkeypatch.setattr(config, ...) before building the objects that read it.
+    """
+    monkeypatch.setattr(APIConfig, "_instance", None)
+    return APIConfig()
+
+@pytest.fixture
+def make_llm_manager(config, monkeypatch):
+    """Build LLMManagers on the test's config (overrides as keyword arguments); all are shut down afterwards"""
+    from services.llm_manager import LLMManager
+    managers = []
+
+    def make(**overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(config, name, value)
+        manager = LLMManager()
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.shutdown()
+
+@pytest.fixture
+def llm_manager(make_llm_manager):
+    return make_llm_manager(mock_llm_latency="fixed:0.01")
@@ -0,0 +1,124 @@
+import multiprocessing
+import json
+import os
+
+import pytest
+
+from utils.answerlog import HEADER, AnswerLogger, CorruptRecordError
+
+RECORDS = [{"participant": i, "answer": "x" * 40} for i in range(10)]
+
+def open_store(tmp_path, **kwargs):
+    return AnswerLogger(str(tmp_path / "answer_log.json"), **kwargs)
+
+def append_records(path, records, segment_size):
+    """Runs in a separate process"""
+    store = AnswerLogger(path, segment_size=segment_size)
+    for record in records:
+        store.log(record)
+    store.close()
+
+def segment_files(store):
+    return sorted(name for name in os.listdir(store.store_dir) if name.endswith(".seg"))
+
+def test_records_roll_over_into_segments(tmp_path):
+    store = open_store(tmp_path, segment_size=200)
+    for record in RECORDS:
+        store.log(record)
+
+    assert len(segment_files(store)) > 1
+    assert list(store.records()) == RECORDS
+    assert list(store.records(7)) == RECORDS[7:]
+    assert store.get(3) == RECORDS[3] and store.get(-1) == RECORDS[-1]
+    assert list(open_store(tmp_path, segment_size=200).records()) == RECORDS
+
+def test_torn_tail_is_truncated_on_reopen(tmp_path):
+    store = open_store(tmp_path)
+    for record in RECORDS[:3]:
+        store.log(record)
+    segment = os.path.join(store.store_dir, segment_files(store)[-1])
+    with open(segment, 'ab') as f:
+        f.write(HEADER.pack(100, 0) + b'{"torn": ')
+
+    reopened = open_store(tmp_path)
+    assert list(reopened.records()) == RECORDS[:3]
+    reopened.log(RECORDS[3])
+    assert list(open_store(tmp_path).records()) == RECORDS[:4]
+
+def test_torn_first_record_of_a_new_segment(tmp_path):
+    store = open_store(tmp_path, segment_size=200)
+    for record in RECORDS:
+        store.log(record)
+    # Crash while rolling over: the new segment holds only part of its first record
+    with open(store._path(len(store), ".seg"), 'wb') as f:
+        f.write(HEADER.pack(100, 0) + b'{"par')
+
+    reopened = open_store(tmp_path, segment_size=200)
+    assert len(reopened) == len(RECORDS)
+    assert list(reopened.records()) == RECORDS
+    assert reopened.get(-1) == RECORDS[-1]
+    export = str(tmp_path / "export.json")
+    reopened.export_json(export)
+    with open(export) as f:
+        assert json.load(f) == RECORDS
+
+    reopened.log({"participant": 10})
+    assert list(open_store(tmp_path, segment_size=200).records(10)) == [{"participant": 10}]
+
+def test_index_is_rebuilt_for_records_missing_from_it(tmp_path):
+    store = open_store(tmp_path)
+    for record in RECORDS[:3]:
+        store.log(record)
+    index = os.path.join(store.store_dir, segment_files(store)[-1][:-4] + ".idx")
+    with open(index, 'r+b') as f:
+        f.truncate(8)  # Crash between writing records and their index entries
+
+    assert list(open_store(tmp_path).records()) == RECORDS[:3]
+
+def test_corrupt_record_is_reported(tmp_path):
+    store = open_store(tmp_path)
+    store.log(RECORDS[0])
+    store.log(RECORDS[1])
+    segment = os.path.join(store.store_dir, segment_files(store)[-1])
+    with open(segment, 'r+b') as f:
+        f.seek(HEADER.size + 2)
+        f.write(b"X")
+
+    with pytest.raises(CorruptRecordError):
+        store.get(0)
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "answer_log.json"
+    legacy.write_text(json.dumps(RECORDS[:2]))
+
+    store = open_store(tmp_path)
+    assert list(store.records()) == RECORDS[:2]
+    assert not legacy.exists() and (tmp_path / "answer_log.json.migrated").exists()
+
+def test_readers_see_records_appended_by_another_process(tmp_path):
+    reader = open_store(tmp_path, segment_size=200)
+    reader.log(RECORDS[0])
+    assert len(reader) == 1
+
+    writer = multiprocessing.get_context("fork").Process(
+        target=append_records, args=(reader.log_file, RECORDS[1:], 200)
+    )
+    writer.start()
+    writer.join(timeout=10)
+    assert writer.exitcode == 0
+
+    assert len(reader) == len(RECORDS)
+    assert reader.get(-1) == RECORDS[-1]
+    assert list(reader.records(5)) == RECORDS[5:]
+    reader.log({"participant": 10})
+    assert list(open_store(tmp_path, segment_size=200).records()) == RECORDS + [{"participant": 10}]
+
+def test_two_writers_in_one_process_share_the_store(tmp_path):
+    first = open_store(tmp_path, segment_size=200)
+    second = open_store(tmp_path, segment_size=200)
+    for i, record in enumerate(RECORDS):
+        (first if i % 2 else second).log(record)
+
+    assert list(first.records()) == RECORDS
+    assert second.get(3) == RECORDS[3]
+    assert len(second) == len(RECORDS)
@@ -0,0 +1,52 @@
+import threading
+import zipfile
+
+import pytest
+
+from services.archiver import SessionArchiver
+
+@pytest.fixture
+def archiver():
+    archiver = SessionArchiver(workers=2)
+    yield archiver
+    archiver.shutdown()
+
+def archived_names(result):
+    with zipfile.ZipFile(result["path"]) as archive:
+        return sorted(archive.namelist())
+
+def test_unchanged_session_is_not_zipped_again(tmp_path, archiver):
+    (tmp_path / "s1").mkdir()
+    (tmp_path / "s1" / "events.jsonl").write_text("{}\n")
+
+    assert archiver.submit(str(tmp_path / "s1")).result(5)["status"] == "completed"
+    assert archiver.submit(str(tmp_path / "s1")).result(5)["status"] == "up_to_date"
+
+def test_submit_during_a_running_job_archives_again_afterwards(tmp_path, archiver, monkeypatch):
+    session_dir = tmp_path / "s1"
+    session_dir.mkdir()
+    (session_dir / "events.jsonl").write_text("{}\n")
+
+    listed, release = threading.Event(), threading.Event()
+    list_files = SessionArchiver._list_files
+    def slow_list_files(path):
+        files = list_files(path)
+        listed.set()
+        release.wait(5)
+        return files
+    monkeypatch.setattr(archiver, "_list_files", slow_list_files)
+
+    first = archiver.submit(str(session_dir))
+    assert listed.wait(5)
+    # Written after the running job listed the files
+    (session_dir / "survey_submission.json").write_text("{}")
+    follow_up = archiver.submit(str(session_dir))
+    assert follow_up is not first
+    assert archiver.submit(str(session_dir)) is follow_up
+    release.set()
+
+    assert archived_names(first.result(5)) == ["events.jsonl"]
+    result = follow_up.result(5)
+    assert result["status"] == "completed"
+    assert archived_names(result) == ["events.jsonl", "survey_submission.json"]
+    assert archiver.get_status(str(session_dir))["status"] == "completed"
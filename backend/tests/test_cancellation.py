@@ -0,0 +1,110 @@
+import threading
+import asyncio
+import time
+
+from services.cancellation import CancellationToken
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+class BlockingBackend:
+    """Holds every call until released"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.release = threading.Event()
+
+    def create(self, **params):
+        self.release.wait(5)
+        return self.backend.create(**params)
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_thread_path_counts_cancelled_requests(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0.01", max_concurrent_requests=1)
+    manager.backend = BlockingBackend(manager.backend)
+    try:
+        running = manager.submit_request(MESSAGES, "analysis", "gpt-4")
+        queued = manager.submit_request(MESSAGES, "analysis", "gpt-4")
+        # The second request is handed to the pool but can't start while the first holds its only worker
+        assert wait_for(lambda: queued in manager.active_requests)
+
+        assert manager.cancel_request(queued)
+        manager.backend.release.set()
+        assert wait_for(lambda: manager.get_request_result(running) is not None)
+        assert wait_for(lambda: manager.get_cancellation_stats()["cancelled_queued"] == 1)
+        assert manager.get_cancellation_stats()["estimated_tokens_saved"] > 0
+    finally:
+        manager.backend.release.set()
+
+def test_thread_path_drops_a_cancelled_throttled_request(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0.01")
+    manager.rate_limiter.block("gpt-4", 0.5)
+
+    throttled = manager.submit_request(MESSAGES, "analysis", "gpt-4")
+    assert wait_for(lambda: len(manager.throttled_requests) == 1)
+    assert manager.cancel_request(throttled)
+
+    # Released once the block has passed, then dropped without an API call
+    assert wait_for(lambda: manager.get_cancellation_stats()["cancelled_queued"] == 1)
+    assert len(manager.throttled_requests) == 0
+    assert manager.backend.get_stats()["calls"] == 0
+    assert manager.get_request_result(throttled) is None
+
+class AsyncBlockingBackend:
+    """Holds every async call until released, and records how calls ended"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.started = 0
+        self.aborted = 0
+        self.release = None
+
+    async def acreate(self, **params):
+        self.started += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.aborted += 1
+            raise
+        return await self.backend.acreate(**params)
+
+def test_async_path_aborts_in_flight_and_drops_queued_requests(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0", max_concurrent_requests=1)
+    backend = manager.backend = AsyncBlockingBackend(manager.backend)
+
+    async def run():
+        backend.release = asyncio.Event()
+        in_flight_token, queued_token = CancellationToken(), CancellationToken()
+        in_flight = asyncio.ensure_future(manager.submit_request_async(MESSAGES, "analysis", "gpt-4", cancel_token=in_flight_token))
+        queued = asyncio.ensure_future(manager.submit_request_async(MESSAGES, "analysis", "gpt-4", cancel_token=queued_token))
+        while backend.started == 0:
+            await asyncio.sleep(0.01)
+
+        queued_token.cancel()
+        in_flight_token.cancel()
+        results = await asyncio.gather(in_flight, queued)
+        # Let the dispatcher pop the dropped request
+        backend.release.set()
+        after = await manager.submit_request_async(MESSAGES, "analysis", "gpt-4")
+        return results, after
+
+    (in_flight, queued), after = asyncio.run(run())
+
+    assert in_flight == queued == {"error": "Cancelled", "cancelled": True}
+    assert "error" not in after
+    assert backend.aborted == 1
+    assert backend.started == 2  # The cancelled queued request never reached the backend
+    stats = manager.get_cancellation_stats()
+    assert stats["cancelled_in_flight"] == 1 and stats["cancelled_queued"] == 1
+
+def test_already_cancelled_token_returns_without_queueing(llm_manager):
+    token = CancellationToken()
+    token.cancel()
+    result = asyncio.run(llm_manager.submit_request_async(MESSAGES, "analysis", "gpt-4", cancel_token=token))
+
+    assert result == {"error": "Cancelled", "cancelled": True}
+    assert llm_manager.backend.get_stats()["calls"] == 0
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+import services.consistency_service as consistency_service
+from models.data_models import AnalysisRequest
+from services.analysis_service import AnalysisService
+from services.consistency_service import ConsistencyService, ContradictionScoreCache
+
+SCORES = {"It is raining.": 0.95, "It is sunny.": 0.1, "It is cloudy.": 0.5}
+
+class StubNLI:
+    """score_pairs stand-in that scores a pair by the previous segment's text"""
+    def __init__(self):
+        self.calls = []
+
+    async def score_pairs(self, premises, hypotheses):
+        self.calls.append(list(premises))
+        return [next(score for text, score in SCORES.items() if premise.endswith(text)) for _, premise in premises]
+
+class StubFilter:
+    """Pre-filter that shortlists previous segments whose text is in keep"""
+    def __init__(self, keep):
+        self.keep = keep
+        self.calls = []
+
+    async def shortlist(self, current_segment, previous_segments):
+        self.calls.append([s['uuid'] for s in previous_segments])
+        return [i for i, s in enumerate(previous_segments) if s['text'] in self.keep]
+
+class EventSink:
+    def log(self, data):
+        pass
+
+@pytest.fixture
+def service(config, monkeypatch):
+    nli = StubNLI()
+    monkeypatch.setattr(consistency_service, "NLIModel", lambda: nli)
+    return ConsistencyService(score_cache=ContradictionScoreCache(100))
+
+def segment(uuid, text):
+    return {"uuid": uuid, "text": text, "question_idx": 1}
+
+def test_check_scores_every_previous_segment_and_flags_contradictions(service):
+    previous = [segment("a", "It is sunny."), segment("b", "It is raining."), segment("c", "It is cloudy.")]
+
+    result = asyncio.run(service.check_consistency(segment("d", "It is dry."), previous))
+
+    assert result.scores == {"a": 0.1, "b": 0.95, "c": 0.5}
+    assert result.detected
+    assert [c["previous_segment"]["uuid"] for c in result.contradictions] == ["b"]
+    assert len(service.nli.calls) == 1
+    assert [text for _, text in service.nli.calls[0]] == [service._add_context(s["text"], 1) for s in previous]
+
+def test_cached_pairs_are_not_scored_again(service):
+    current = segment("d", "It is dry.")
+    asyncio.run(service.check_consistency(current, [segment("a", "It is sunny.")]))
+
+    result = asyncio.run(service.check_consistency(current, [segment("a", "It is sunny."), segment("b", "It is raining.")]))
+
+    assert result.scores == {"a": 0.1, "b": 0.95}
+    assert [len(call) for call in service.nli.calls] == [1, 1]
+    assert service.get_cache_stats()["hits"] == 1
+
+def test_pairs_the_prefilter_skips_are_not_sent_again(config, monkeypatch):
+    monkeypatch.setattr(consistency_service, "NLIModel", StubNLI)
+    monkeypatch.setattr(config, "nli_prefilter_mode", "on")
+    candidate_filter = StubFilter(keep={"It is raining."})
+    service = ConsistencyService(score_cache=ContradictionScoreCache(100), candidate_filter=candidate_filter)
+    analysis = AnalysisService(
+        llm_manager=None, websocket_handler=None, intervention_service=None,
+        logger=EventSink(), consistency_service=service
+    )
+    previous = [segment("a", "It is sunny."), segment("b", "It is raining.")]
+    all_segments = {s["uuid"]: s for s in previous}
+
+    def check(text="It is dry."):
+        request = AnalysisRequest(uuid="d", text=text, question_idx=1, segment_idx=2, all_segments=all_segments)
+        return asyncio.run(analysis._check_consistency_incremental(request, previous))
+
+    first = check()
+    assert first.scores == {"b": 0.95}
+    assert first.pairs_skipped == 1
+    assert analysis.contradiction_matrix.is_skipped("d", "a")
+
+    second = check()
+    assert second.scores == {"b": 0.95}
+    assert candidate_filter.calls == [["a", "b"]]
+    assert len(service.nli.calls) == 1
+
+    # Editing the skipped segment gives its pair another chance
+    all_segments["a"] = previous[0] = segment("a", "It is cloudy.")
+    check()
+    assert candidate_filter.calls[-1] == ["a"]
+    assert analysis.contradiction_matrix.is_skipped("d", "a")
+
+def test_score_cache_counts_hits_and_misses():
+    cache = ContradictionScoreCache(max_entries=10)
+    key = cache.make_key("premise", "hypothesis")
+
+    assert cache.get(key) is None
+    cache.put(key, 0.3)
+    assert cache.get(key) == 0.3
+    assert cache.stats() == {"entries": 1, "max_entries": 10, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_score_cache_keys_on_both_texts():
+    cache = ContradictionScoreCache(max_entries=10)
+    cache.put(cache.make_key("a", "b"), 0.3)
+    assert cache.get(cache.make_key("b", "a")) is None
+
+def test_score_cache_evicts_the_least_recently_used():
+    cache = ContradictionScoreCache(max_entries=2)
+    first, second, third = (cache.make_key(text, "h") for text in ("1", "2", "3"))
+    cache.put(first, 0.1)
+    cache.put(second, 0.2)
+    cache.get(first)
+    cache.put(third, 0.3)
+
+    assert cache.get(second) is None
+    assert cache.get(first) == 0.1
+    assert cache.get(third) == 0.3
+    assert cache.stats()["entries"] == 2
+
+def test_score_cache_of_size_zero_stores_nothing():
+    cache = ContradictionScoreCache(max_entries=0)
+    key = cache.make_key("a", "b")
+    cache.put(key, 0.5)
+    assert cache.get(key) is None
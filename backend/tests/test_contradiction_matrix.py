@@ -0,0 +1,71 @@
+from services.contradiction_matrix import ContradictionMatrix
+
+def segments(**texts):
+    return {uuid: {"uuid": uuid, "text": text} for uuid, text in texts.items()}
+
+def test_scores_are_directional():
+    matrix = ContradictionMatrix(threshold=0.5)
+    matrix.update("b", segments(a="It is raining.", b="It is sunny."), {"a": 0.9})
+
+    assert matrix.row("b") == {"a": 0.9}
+    assert matrix.row("a") == {}
+    assert matrix.missing_pairs("b", ["a"]) == []
+    assert matrix.missing_pairs("a", ["b"]) == ["b"]
+
+def test_both_directions_report_one_pair_with_the_higher_score():
+    matrix = ContradictionMatrix(threshold=0.5)
+    current = segments(a="It is raining.", b="It is sunny.")
+    matrix.update("b", current, {"a": 0.6})
+    matrix.update("a", current, {"b": 0.8})
+
+    assert matrix.active_contradictions() == [{"segment_uuids": ["b", "a"], "contradiction_score": 0.8}]
+
+def test_below_threshold_is_not_active():
+    matrix = ContradictionMatrix(threshold=0.5)
+    matrix.update("b", segments(a="x", b="y"), {"a": 0.4})
+    assert matrix.active_contradictions() == []
+
+def test_update_with_changed_text_drops_stale_scores():
+    matrix = ContradictionMatrix(threshold=0.5)
+    matrix.update("b", segments(a="old", b="y"), {"a": 0.9})
+    matrix.update("c", segments(a="old", c="z"), {"a": 0.7})
+
+    matrix.update("d", segments(a="new", d="w"), {"a": 0.2})
+
+    assert matrix.texts["a"] == "new"
+    assert matrix.row("b") == {}
+    assert matrix.row("c") == {}
+    assert matrix.row("d") == {"a": 0.2}
+
+def test_sync_invalidates_changed_and_removed_segments():
+    matrix = ContradictionMatrix(threshold=0.5)
+    matrix.update("b", segments(a="x", b="y"), {"a": 0.9})
+    matrix.update("c", segments(a="x", c="z"), {"a": 0.8})
+
+    matrix.sync(segments(a="x", b="y changed"))
+
+    assert "b" not in matrix.texts and "c" not in matrix.texts
+    assert matrix.missing_pairs("b", ["a"]) == ["a"]
+    assert matrix.active_contradictions() == []
+
+def test_skipped_pairs_are_stored_until_a_segment_changes():
+    matrix = ContradictionMatrix(threshold=0.0)
+    matrix.update("c", segments(a="x", b="y", c="z"), {"a": 0.9}, skipped=["b"])
+
+    assert matrix.row("c") == {"a": 0.9, "b": 0.0}
+    assert matrix.is_skipped("c", "b") and not matrix.is_skipped("c", "a")
+    assert matrix.missing_pairs("c", ["a", "b"]) == []
+    # Skipped pairs are never reported, whatever the threshold
+    assert [c["segment_uuids"] for c in matrix.active_contradictions()] == [["a", "c"]]
+
+    matrix.sync(segments(a="x", b="y changed", c="z"))
+    assert matrix.missing_pairs("c", ["a", "b"]) == ["b"]
+    assert not matrix.is_skipped("c", "b")
+
+def test_scoring_a_skipped_pair_clears_the_marker():
+    matrix = ContradictionMatrix(threshold=0.5)
+    matrix.update("c", segments(a="x", c="z"), {}, skipped=["a"])
+    matrix.update("c", segments(a="x", c="z"), {"a": 0.7})
+
+    assert not matrix.is_skipped("c", "a")
+    assert matrix.active_contradictions() == [{"segment_uuids": ["a", "c"], "contradiction_score": 0.7}]
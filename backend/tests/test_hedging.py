@@ -0,0 +1,31 @@
+import asyncio
+
+from services.hedging import HedgingPolicy
+
+class SlowThenFastBackend:
+    """Wraps a backend so the first call takes delay seconds and later calls answer at once"""
+    def __init__(self, backend, delay: float):
+        self.backend = backend
+        self.delay = delay
+        self.calls = 0
+
+    async def acreate(self, **params):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(self.delay)
+        params["max_tokens"] = 1
+        return await self.backend.acreate(**params)
+
+def test_hedge_win_records_the_primary_latency(llm_manager):
+    manager = llm_manager
+    manager.hedging = HedgingPolicy({"analysis"}, percentile=50, min_samples=1, min_delay=0.05, max_ratio=1.0)
+    manager.hedging.record_latency("analysis", 0.05)
+    manager.backend = SlowThenFastBackend(manager.backend, delay=5.0)
+    result = asyncio.run(manager.submit_request_async([{"role": "user", "content": "Hi"}], "analysis", "gpt-4"))
+
+    assert "error" not in result
+    assert manager.get_hedging_stats()["analysis"]["hedge_wins"] == 1
+    latencies = sorted(manager.hedging._latencies["analysis"])
+    # Seed, the hedge that won and the abandoned primary, which had run past the hedge delay
+    assert len(latencies) == 3
+    assert latencies[-1] >= 0.05
@@ -0,0 +1,82 @@
+import asyncio
+
+import openai
+import pytest
+
+from services.llm_backends import MockLLMBackend, load_llm_backend
+from services.rate_limiter import retry_after_seconds
+
+MESSAGES = [{"role": "user", "content": "Which requirements are missing?"}]
+
+@pytest.fixture
+def make_backend(config, monkeypatch):
+    def make(**overrides):
+        settings = {"mock_llm_latency": "fixed:0", "mock_llm_seed": 1, **overrides}
+        for name, value in settings.items():
+            monkeypatch.setattr(config, name, value)
+        return load_llm_backend("mock", config)
+    return make
+
+def test_unknown_backend_is_rejected(config):
+    with pytest.raises(ValueError, match="Available"):
+        load_llm_backend("nope", config)
+
+@pytest.mark.parametrize("spec, low, high", [
+    ("fixed:0.25", 0.25, 0.25),
+    ("uniform:0.1,0.3", 0.1, 0.3),
+    ("lognormal:0.2,0.5", 0.0, float("inf")),
+])
+def test_latency_is_sampled_from_the_configured_distribution(make_backend, spec, low, high):
+    backend = make_backend(mock_llm_latency=spec)
+    delays = [backend._prepare({"messages": MESSAGES})[0] for _ in range(50)]
+    assert all(low <= delay <= high for delay in delays)
+
+def test_invalid_latency_spec_is_rejected(make_backend):
+    with pytest.raises(ValueError, match="Invalid mock LLM latency"):
+        make_backend(mock_llm_latency="normal:1")
+
+def test_token_latency_is_added_per_completion_token(make_backend):
+    backend = make_backend(mock_llm_token_latency_ms=10)
+    delay, _, response = backend._prepare({"messages": MESSAGES})
+    assert delay == pytest.approx(0.01 * response.usage.completion_tokens)
+
+def test_injected_errors(make_backend):
+    backend = make_backend(mock_llm_error_rate=1.0)
+    with pytest.raises(openai.APIConnectionError):
+        backend.create(messages=MESSAGES)
+    assert backend.get_stats() == {"calls": 1, "injected_errors": 1, "injected_rate_limits": 0}
+
+def test_injected_rate_limits_carry_retry_after(make_backend):
+    backend = make_backend(mock_llm_rate_limit_rate=1.0, mock_llm_retry_after=2.5)
+    with pytest.raises(openai.RateLimitError) as raised:
+        asyncio.run(backend.acreate(messages=MESSAGES))
+    assert retry_after_seconds(raised.value) == 2.5
+    assert backend.get_stats() == {"calls": 1, "injected_errors": 0, "injected_rate_limits": 1}
+
+def test_injection_rates_are_reproducible_with_a_seed(make_backend):
+    def outcomes():
+        backend = make_backend(mock_llm_error_rate=0.3, mock_llm_rate_limit_rate=0.2, mock_llm_seed=7)
+        return [type(backend._prepare({"messages": MESSAGES})[1]).__name__ for _ in range(200)], backend.get_stats()
+
+    first, stats = outcomes()
+    assert first == outcomes()[0]
+    assert 20 < stats["injected_errors"] < 100 and 10 < stats["injected_rate_limits"] < 70
+
+def test_responses_are_deterministic_per_prompt_with_logprobs(make_backend):
+    backend = make_backend()
+    first = backend.create(model="gpt-4", messages=MESSAGES, logprobs=True)
+    second = asyncio.run(backend.acreate(model="gpt-4", messages=MESSAGES, logprobs=True))
+
+    assert first.choices[0].message.content == second.choices[0].message.content
+    assert first.choices[0].logprobs.content[0].logprob == second.choices[0].logprobs.content[0].logprob
+    assert first.usage.total_tokens == first.usage.prompt_tokens + first.usage.completion_tokens
+    assert backend.create(messages=MESSAGES).choices[0].logprobs is None
+
+def test_single_token_prompts_answer_yes_or_no(make_backend):
+    backend = make_backend(mock_llm_ambiguity_rate=0.5)
+    answers = {
+        backend.create(messages=[{"role": "user", "content": f"Is statement {i} ambiguous?"}], max_tokens=1)
+        .choices[0].message.content
+        for i in range(40)
+    }
+    assert answers == {"Yes", "No"}
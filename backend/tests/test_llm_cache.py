@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from services.llm_backends import load_llm_backend
+from services.llm_cache import LLMResponseCache
+
+MESSAGES = [{"role": "user", "content": "Is this ambiguous?"}]
+
+@pytest.fixture
+def response(config, monkeypatch):
+    monkeypatch.setattr(config, "mock_llm_latency", "fixed:0")
+    completion = load_llm_backend("mock", config).create(model="gpt-4", messages=MESSAGES, max_tokens=1, logprobs=True)
+    return {"choices": completion.choices, "usage": completion.usage}
+
+def test_make_key_ignores_the_timeout_only():
+    params = {"model": "gpt-4", "messages": MESSAGES, "temperature": 0, "timeout": 30}
+    assert LLMResponseCache.make_key(params) == LLMResponseCache.make_key({**params, "timeout": 5})
+    assert LLMResponseCache.make_key(params) != LLMResponseCache.make_key({**params, "max_tokens": 1})
+
+def test_memory_tier_evicts_the_least_recently_used(response):
+    cache = LLMResponseCache(max_entries=2, ttl=0)
+    cache.put("a", response)
+    cache.put("b", response)
+    cache.get("a")
+    cache.put("c", response)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is response and cache.get("c") is response
+    assert cache.stats()["entries"] == 2
+
+def test_entries_expire_after_the_ttl(response):
+    cache = LLMResponseCache(max_entries=10, ttl=0.05)
+    cache.put("a", response)
+    assert cache.get("a") is response
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_disk_tier_round_trips_choices_usage_and_logprobs(response, tmp_path):
+    db_path = str(tmp_path / "cache" / "responses.db")
+    cache = LLMResponseCache(max_entries=10, ttl=0, db_path=db_path)
+    cache.put("a", response)
+    cache.close()
+
+    reopened = LLMResponseCache(max_entries=10, ttl=0, db_path=db_path)
+    restored = reopened.get("a")
+
+    assert [c.model_dump() for c in restored["choices"]] == [c.model_dump() for c in response["choices"]]
+    assert restored["choices"][0].logprobs.content[0].logprob == response["choices"][0].logprobs.content[0].logprob
+    assert restored["usage"] == response["usage"]
+    assert reopened.stats()["disk_hits"] == 1
+    # Promoted to the memory tier
+    assert reopened.get("a") is restored
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+def test_async_access_to_the_disk_tier(response, tmp_path):
+    cache = LLMResponseCache(max_entries=1, ttl=0, db_path=str(tmp_path / "responses.db"))
+
+    async def run():
+        await cache.aput("a", response)
+        await cache.aput("b", response)  # Evicts "a" from memory; it is still on disk
+        return await cache.aget("a"), await cache.aget("missing")
+
+    restored, missing = asyncio.run(run())
+    assert restored["usage"] == response["usage"]
+    assert missing is None
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
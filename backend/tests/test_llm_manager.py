@@ -0,0 +1,167 @@
+import threading
+import asyncio
+import time
+
+import httpx
+import openai
+
+from services.metrics import REGISTRY
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+def wait_for_result(manager, request_id, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = manager.get_request_result(request_id)
+        if result is not None:
+            return result
+        time.sleep(0.01)
+    return None
+
+def test_shutdown_stops_the_dispatcher_and_unregisters_metrics(make_llm_manager):
+    manager = make_llm_manager()
+    assert REGISTRY._collectors["llm_manager"] == manager._collect_metrics
+
+    manager.shutdown()
+
+    assert not manager.background_thread.is_alive()
+    assert "llm_manager" not in REGISTRY._collectors
+
+def test_request_is_retried_after_an_attempt_that_failed_before_the_api_call(make_llm_manager, monkeypatch):
+    manager = make_llm_manager(mock_llm_latency="fixed:0", retry_delay=0.01)
+    build_api_params = manager._build_api_params
+    failures = []
+
+    def flaky_build_api_params(request):
+        # The first attempt fails on its worker (submit_request also builds the parameters, for the cache key)
+        if not failures and threading.current_thread() is not threading.main_thread():
+            failures.append(request.request_id)
+            raise ValueError("bad parameters")
+        return build_api_params(request)
+
+    monkeypatch.setattr(manager, "_build_api_params", flaky_build_api_params)
+    request_id = manager.submit_request(MESSAGES, "analysis", "gpt-4")
+
+    result = wait_for_result(manager, request_id)
+    assert failures == [request_id]
+    assert result is not None and "error" not in result
+
+def test_cache_hits_spend_no_rate_limit_budget(make_llm_manager, tmp_path):
+    manager = make_llm_manager(
+        mock_llm_latency="fixed:0", llm_cache_task_types={"analysis"}, llm_cache_db_path=str(tmp_path / "cache.db")
+    )
+    first = wait_for_result(manager, manager.submit_request(MESSAGES, "analysis", "gpt-4", temperature=0))
+    assert first is not None and "error" not in first
+    # With the model blocked, only a request answered from the cache can finish
+    manager.rate_limiter.block("gpt-4", 60)
+    throttled_before = manager.rate_limiter.stats()["throttled"]
+
+    cached = wait_for_result(manager, manager.submit_request(MESSAGES, "analysis", "gpt-4", temperature=0), timeout=1)
+    cached_async = asyncio.run(manager.submit_request_async(MESSAGES, "analysis", "gpt-4", temperature=0))
+
+    assert cached is first and cached_async is first
+    assert manager.backend.get_stats()["calls"] == 1
+    assert manager.rate_limiter.stats()["throttled"] == throttled_before
+    assert manager.response_cache.stats()["hits"] == 2
+
+class FailFirstBackend:
+    """Fails the first call for each prompt, then answers from the wrapped backend"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.seen = set()
+        self.finished = []
+
+    def _fail_first(self, params):
+        prompt = params["messages"][-1]["content"]
+        if prompt not in self.seen:
+            self.seen.add(prompt)
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://mock.invalid"))
+        self.finished.append(prompt)
+
+    def create(self, **params):
+        self._fail_first(params)
+        return self.backend.create(**params)
+
+    async def acreate(self, **params):
+        self._fail_first(params)
+        return await self.backend.acreate(**params)
+
+def test_async_path_runs_requests_concurrently_in_priority_order(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0.05", max_concurrent_requests=4)
+
+    async def run():
+        started = time.monotonic()
+        results = await asyncio.gather(*[
+            manager.submit_request_async([{"role": "user", "content": f"Prompt {i}"}], "analysis", "gpt-4")
+            for i in range(8)
+        ])
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(run())
+
+    assert all("error" not in result for result in results)
+    assert manager.backend.get_stats()["calls"] == 8
+    assert elapsed < 0.4  # Two rounds of four, not eight calls in a row
+    assert not manager._async_tasks
+
+def test_retry_delay_is_exponential_with_jitter(llm_manager, monkeypatch):
+    manager = llm_manager
+    monkeypatch.setattr(manager.config, "retry_delay", 1.0)
+    monkeypatch.setattr(manager.config, "max_retries", 4)
+    request = manager._build_request(MESSAGES, "analysis", "gpt-4", {})
+    error = openai.APIConnectionError(request=httpx.Request("POST", "https://mock.invalid"))
+
+    for attempt, base in ((1, 1.0), (2, 2.0), (3, 4.0)):
+        request.attempt = attempt
+        delays = {manager._retry_delay(request, error) for _ in range(20)}
+        assert all(0.5 * base <= delay <= 1.5 * base for delay in delays)
+        assert len(delays) > 1  # Jittered
+    request.attempt = 4
+    assert manager._retry_delay(request, error) is None
+
+def test_rate_limit_retry_waits_at_least_retry_after(llm_manager, monkeypatch):
+    manager = llm_manager
+    monkeypatch.setattr(manager.config, "retry_delay", 0.01)
+    monkeypatch.setattr(manager.backend, "rate_limit_rate", 1.0)
+    monkeypatch.setattr(manager.backend, "retry_after", 3.0)
+    request = manager._build_request(MESSAGES, "analysis", "gpt-4", {})
+    request.attempt = 1
+    try:
+        manager.backend.create(messages=MESSAGES)
+    except openai.RateLimitError as error:
+        assert manager._retry_delay(request, error) >= 3.0
+    assert manager.rate_limiter.try_acquire("gpt-4", 0) > 2.0  # The model is blocked meanwhile
+
+def test_backoff_does_not_hold_a_worker(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0", max_concurrent_requests=1, retry_delay=0.5)
+    backend = manager.backend = FailFirstBackend(manager.backend)
+
+    retried = manager.submit_request([{"role": "user", "content": "retried"}], "analysis", "gpt-4")
+    assert wait_for_result(manager, retried, timeout=0.2) is None
+    backend.seen.add("direct")  # Succeeds on its first attempt
+    direct = manager.submit_request([{"role": "user", "content": "direct"}], "analysis", "gpt-4")
+
+    assert "error" not in wait_for_result(manager, direct)
+    assert "error" not in wait_for_result(manager, retried)
+    # The only worker served the other request while the first one waited in the retry heap
+    assert backend.finished == ["direct", "retried"]
+    assert manager.retry_count == 1 and not manager.retry_heap
+
+def test_async_path_retries_failed_attempts(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0", retry_delay=0.01)
+    manager.backend = FailFirstBackend(manager.backend)
+
+    result = asyncio.run(manager.submit_request_async(MESSAGES, "analysis", "gpt-4"))
+
+    assert "error" not in result
+    assert manager.retry_count == 1 and manager.async_retry_pending == 0
+
+def test_requests_fail_after_max_retries(make_llm_manager):
+    manager = make_llm_manager(mock_llm_latency="fixed:0", mock_llm_error_rate=1.0, retry_delay=0.01, max_retries=3)
+
+    thread_result = wait_for_result(manager, manager.submit_request(MESSAGES, "analysis", "gpt-4"))
+    async_result = asyncio.run(manager.submit_request_async(MESSAGES, "analysis", "gpt-4"))
+
+    assert "after 3 attempts" in thread_result["error"]
+    assert "after 3 attempts" in async_result["error"]
+    assert manager.backend.get_stats()["injected_errors"] == 6
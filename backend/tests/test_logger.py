@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from services.logger import (
+    BACKPRESSURE, EVENTS_DROPPED, EVENTS_FILE, Logger, read_events, view_by_question, view_by_uuid, view_list
+)
+
+@pytest.fixture
+def logger(tmp_path):
+    logger = Logger(str(tmp_path), flush_policy="interval", fsync_policy="interval", sync_interval=0.1)
+    logger.create_session_directory("session")
+    yield logger
+    logger.close()
+
+def logged_types(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line)["event"]["type"] for line in f]
+
+def test_interval_sync_happens_without_further_events(logger):
+    logger.log({"type": "session_start"})
+    path = os.path.join(logger.log_dir, EVENTS_FILE)
+
+    deadline = time.monotonic() + 2
+    while not logged_types(path) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert logged_types(path) == ["session_start"]
+
+def test_full_queue_drops_instead_of_waiting(logger):
+    backpressure, dropped = BACKPRESSURE.value(), EVENTS_DROPPED.value()
+    logger.queue_size = 0
+    started = time.monotonic()
+    logger.log({"type": "segment_edit"})
+    assert time.monotonic() - started < 0.05
+    assert logger.get_stats()["dropped"] == 1
+    assert logger.get_stats()["backpressure"] == 1
+    assert BACKPRESSURE.value() == backpressure + 1
+    assert EVENTS_DROPPED.value() == dropped + 1
+
+def test_events_after_close_are_dropped_without_backpressure(logger):
+    logger.close()
+    logger.log({"type": "segment_edit"})
+    assert logger.get_stats()["dropped"] == 1
+    assert logger.get_stats()["backpressure"] == 0
+
+def test_aread_events_from_the_event_loop(logger):
+    session = logger.session()
+    session.create_session_directory("other")
+    session.log({"type": "segment_edit", "uuid": "a"})
+    session.log({"type": "stability_check"})
+
+    events = asyncio.run(session.aread_events({"segment_edit"}))
+    assert events == [{"type": "segment_edit", "uuid": "a"}]
+
+EVENTS = [
+    {"type": "session_start", "sessionId": "s1"},
+    {"type": "segment_edit", "uuid": "a", "text": "first"},
+    {"type": "stability_check", "question_idx": 1},
+    {"type": "segment_edit", "uuid": "b", "text": "second"},
+    {"type": "stability_check"},
+    {"type": "segment_edit", "uuid": "a", "text": "first, edited"},
+    {"type": "stability_check", "question_idx": 0},
+]
+
+@pytest.fixture
+def session_dir(logger):
+    for event in EVENTS:
+        logger.log(event)
+    assert logger.flush()
+    return logger.log_dir
+
+def test_read_events_streams_in_log_order(session_dir):
+    assert list(read_events(session_dir)) == EVENTS
+    assert list(read_events(session_dir, {"session_start", "stability_check"})) == [EVENTS[0], EVENTS[2], EVENTS[4], EVENTS[6]]
+
+def test_views_group_events_like_the_legacy_files(session_dir):
+    assert view_by_uuid(session_dir, "segment_edit") == {"a": [EVENTS[1], EVENTS[5]], "b": [EVENTS[3]]}
+    by_question = view_by_question(session_dir, "stability_check")
+    assert by_question == {"1": [EVENTS[2]], "None": [EVENTS[4]], "0": [EVENTS[6]]}
+    assert list(by_question) == ["1", "None", "0"]
+    assert view_list(session_dir, "session_start") == [EVENTS[0]]
+    assert view_list(session_dir, "intervention_mode_change") == []
+
+def test_views_skip_a_torn_last_line(session_dir):
+    with open(os.path.join(session_dir, EVENTS_FILE), 'a') as f:
+        f.write('{"logged_at": "2024-01-01T00:00:00", "event": {"type": "segment_ed')
+
+    assert list(read_events(session_dir)) == EVENTS
+    assert view_by_uuid(session_dir, "segment_edit")["a"] == [EVENTS[1], EVENTS[5]]
+
+def test_views_of_a_session_without_events_are_empty(tmp_path):
+    assert list(read_events(str(tmp_path))) == []
+    assert view_by_uuid(str(tmp_path), "segment_edit") == {}
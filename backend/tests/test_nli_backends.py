@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from benchmarks.nli_backends import STATEMENTS, TOLERANCES
+from services.nli_backends import load_nli_backend, softmax
+from services.nli_model import NLI_MODEL_NAME
+
+try:
+    from huggingface_hub import try_to_load_from_cache
+    MODEL_CACHED = isinstance(try_to_load_from_cache(NLI_MODEL_NAME, "config.json"), str)
+except ImportError:
+    MODEL_CACHED = False
+
+pytestmark = pytest.mark.skipif(not MODEL_CACHED, reason=f"{NLI_MODEL_NAME} is not in the local model cache")
+
+PAIRS = [(STATEMENTS[i], STATEMENTS[i + 1]) for i in range(0, len(STATEMENTS), 2)] + [(STATEMENTS[0], STATEMENTS[2])]
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(NLI_MODEL_NAME, use_fast=False)
+
+def contradiction_scores(backend, tokenizer) -> np.ndarray:
+    inputs = tokenizer(
+        [premise for premise, _ in PAIRS], [hypothesis for _, hypothesis in PAIRS],
+        padding=True, truncation=True, return_tensors=backend.tensor_type
+    )
+    return softmax(backend.logits(inputs))[:, 0]
+
+@pytest.fixture(scope="module")
+def reference(tokenizer):
+    return contradiction_scores(load_nli_backend('torch', NLI_MODEL_NAME), tokenizer)
+
+def test_int8_backend_matches_fp32(tokenizer, reference):
+    scores = contradiction_scores(load_nli_backend('torch-int8', NLI_MODEL_NAME), tokenizer)
+    assert np.abs(scores - reference).max() <= TOLERANCES['torch-int8']
+
+def test_onnx_backend_matches_fp32(tokenizer, reference, tmp_path):
+    pytest.importorskip("onnxruntime")
+    backend = load_nli_backend('onnx', NLI_MODEL_NAME, onnx_path=str(tmp_path / "nli.onnx"))
+    scores = contradiction_scores(backend, tokenizer)
+    assert np.abs(scores - reference).max() <= TOLERANCES['onnx']
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import math
+import threading
+
+import numpy as np
+import pytest
+
+import services.nli_model as nli_model
+from services.nli_model import NLIModel, TokenCache
+
+SCORES = {"It is raining.": 0.9, "It is sunny.": 0.1, "It is cloudy.": 0.4, "It is snowing.": 0.7, "It is windy.": 0.2}
+
+class StubTokenizer:
+    """One token per text, so the backend can tell which premise each row holds"""
+    def __init__(self):
+        self.vocab = {}
+        self.texts = {}
+        self.encoded = []
+
+    def encode(self, text, add_special_tokens=True):
+        self.encoded.append(text)
+        token = self.vocab.setdefault(text, len(self.vocab) + 10)
+        self.texts[token] = text
+        return [token]
+
+    def prepare_for_model(self, ids, pair_ids, truncation=False):
+        return {"input_ids": [1] + ids + [2] + pair_ids + [2]}
+
+    def pad(self, encodings, padding=True, return_tensors=None):
+        return {"input_ids": np.array([encoding["input_ids"] for encoding in encodings])}
+
+class StubBackend:
+    """Contradiction logit from SCORES; records the thread and lock state of every forward pass"""
+    name = 'stub'
+    tensor_type = 'np'
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.model = None
+        self.passes = []
+
+    def logits(self, inputs):
+        self.passes.append((threading.current_thread().name, self.model.inference_lock.locked(), len(inputs["input_ids"])))
+        scores = [SCORES[self.tokenizer.texts[row[1]]] for row in inputs["input_ids"]]
+        return np.array([[math.log(score), math.log(1 - score)] for score in scores])
+
+@pytest.fixture
+def nli(config, monkeypatch):
+    tokenizer = StubTokenizer()
+    backend = StubBackend(tokenizer)
+    monkeypatch.setattr(config, "nli_batch_size", 2)
+    monkeypatch.setattr(nli_model, "load_nli_backend", lambda *args, **kwargs: backend)
+    monkeypatch.setattr(NLIModel, "_load_tokenizer", lambda self: tokenizer)
+    monkeypatch.setattr(NLIModel, "_instance", None)
+    model = NLIModel()
+    backend.model = model
+    yield model
+    model.shutdown()
+
+def test_scores_are_returned_in_input_order(nli):
+    premises = [(0, text) for text in SCORES]
+
+    scores = nli.score_pairs_sync(premises, [(1, "It is dry.")] * len(premises))
+
+    assert scores == pytest.approx(list(SCORES.values()))
+    # Padded forward passes of at most nli_batch_size pairs
+    assert [size for _, _, size in nli.backend.passes] == [2, 2, 1]
+
+def test_async_scoring_runs_on_the_inference_pool_under_the_lock(nli):
+    premises = [(0, "It is raining."), (0, "It is sunny.")]
+
+    scores = asyncio.run(nli.score_pairs(premises, [(1, "It is dry.")] * 2))
+
+    assert scores == pytest.approx([0.9, 0.1])
+    assert nli.backend.passes
+    for thread_name, locked, _ in nli.backend.passes:
+        assert thread_name.startswith("nli-inference")
+        assert locked
+    assert not nli.inference_lock.locked()
+
+class WordTokenizer:
+    """Word-level tokenizer with the encode / prepare_for_model / pad interface of a HF tokenizer"""
+    model_max_length = 64
+
+    def __init__(self, truncates: bool = True):
+        self.truncates = truncates
+
+    def encode(self, text, add_special_tokens=True):
+        return [len(word) + 10 for word in text.split()]
+
+    def prepare_for_model(self, ids, pair_ids, truncation=False):
+        ids, pair_ids = list(ids), list(pair_ids)
+        while truncation and self.truncates and len(ids) + len(pair_ids) + 3 > self.model_max_length:
+            (ids if len(ids) >= len(pair_ids) else pair_ids).pop()
+        return {"input_ids": [1] + ids + [2] + pair_ids + [2]}
+
+    def pad(self, encodings, padding=True, return_tensors=None):
+        length = max(len(encoding["input_ids"]) for encoding in encodings)
+        return {
+            "input_ids": [e["input_ids"] + [0] * (length - len(e["input_ids"])) for e in encodings],
+            "attention_mask": [[1] * len(e["input_ids"]) + [0] * (length - len(e["input_ids"])) for e in encodings]
+        }
+
+def load_tokenizer(monkeypatch, slow, fast):
+    class AutoTokenizer:
+        @staticmethod
+        def from_pretrained(name, use_fast):
+            return fast if use_fast else slow
+    monkeypatch.setattr(nli_model, "AutoTokenizer", AutoTokenizer)
+    return NLIModel._load_tokenizer(None)
+
+def test_fast_tokenizer_is_used_when_it_encodes_like_the_slow_one(monkeypatch):
+    slow, fast = WordTokenizer(), WordTokenizer()
+    assert load_tokenizer(monkeypatch, slow, fast) is fast
+
+def test_fast_tokenizer_that_truncates_differently_is_not_used(monkeypatch):
+    # Only the probe longer than model_max_length tells these two apart
+    slow, fast = WordTokenizer(), WordTokenizer(truncates=False)
+    assert load_tokenizer(monkeypatch, slow, fast) is slow
+
+def test_token_cache_keys_on_question_and_text_hash():
+    cache = TokenCache(max_entries=10)
+    key = cache.make_key((1, "It is raining."))
+    cache.put(key, [10, 11])
+
+    assert key == (1, hashlib.sha256("It is raining.".encode("utf-8")).digest())
+    assert cache.get(cache.make_key((1, "It is raining."))) == [10, 11]
+    assert cache.get(cache.make_key((2, "It is raining."))) is None
+    assert cache.stats() == {"entries": 1, "max_entries": 10, "hits": 1, "misses": 1}
+
+def test_token_cache_evicts_the_least_recently_used():
+    cache = TokenCache(max_entries=2)
+    first, second, third = (cache.make_key((0, text)) for text in ("a", "b", "c"))
+    cache.put(first, [1])
+    cache.put(second, [2])
+    cache.get(first)
+    cache.put(third, [3])
+
+    assert cache.get(second) is None
+    assert cache.get(first) == [1]
+
+def test_segments_are_tokenized_once(nli):
+    premises = [(0, "It is raining."), (0, "It is sunny.")]
+    hypotheses = [(1, "It is dry.")] * 2
+    nli.score_pairs_sync(premises, hypotheses)
+    nli.score_pairs_sync(premises, hypotheses)
+
+    assert sorted(nli.tokenizer.encoded) == ["It is dry.", "It is raining.", "It is sunny."]
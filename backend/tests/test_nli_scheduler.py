@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+import pytest
+
+from services.nli_scheduler import NLIBatchScheduler
+
+class RecordingScorer:
+    """score_fn that records each batch and scores a pair by the premise's question_idx"""
+    def __init__(self, fail_on: str = None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, premises, hypotheses):
+        self.batches.append(list(premises))
+        if self.fail_on is not None and any(text == self.fail_on for _, text in premises):
+            raise RuntimeError(f"cannot score {self.fail_on}")
+        return [question_idx / 10 for question_idx, _ in premises]
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=True)
+
+def pairs(*question_idxs, text="x"):
+    return [(idx, text) for idx in question_idxs], [(0, "current")] * len(question_idxs)
+
+def test_concurrent_sessions_share_one_batch(executor):
+    scorer = RecordingScorer()
+    scheduler = NLIBatchScheduler(scorer, executor, window_ms=50, max_batch_size=16)
+
+    async def run():
+        return await asyncio.gather(scheduler.score(*pairs(1, 2, 3)), scheduler.score(*pairs(4, 5)))
+
+    first, second = asyncio.run(run())
+
+    assert first == [0.1, 0.2, 0.3]
+    assert second == [0.4, 0.5]
+    assert len(scorer.batches) == 1
+    stats = scheduler.get_stats()
+    assert stats["batches"] == 1
+    assert stats["pairs_scored"] == 5
+    assert stats["largest_batch"] == 5
+
+def test_batches_are_capped_at_max_batch_size(executor):
+    scorer = RecordingScorer()
+    scheduler = NLIBatchScheduler(scorer, executor, window_ms=50, max_batch_size=2)
+
+    scores = asyncio.run(scheduler.score(*pairs(1, 2, 3, 4, 5)))
+
+    assert scores == [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert [len(batch) for batch in scorer.batches] == [2, 2, 1]
+
+def test_a_failing_request_does_not_fail_the_requests_it_was_batched_with(executor):
+    scorer = RecordingScorer(fail_on="bad")
+    scheduler = NLIBatchScheduler(scorer, executor, window_ms=50, max_batch_size=16)
+
+    async def run():
+        return await asyncio.gather(
+            scheduler.score(*pairs(1, 2)),
+            scheduler.score(*pairs(3, text="bad")),
+            return_exceptions=True
+        )
+
+    good, bad = asyncio.run(run())
+
+    assert good == [0.1, 0.2]
+    assert isinstance(bad, RuntimeError)
+    stats = scheduler.get_stats()
+    assert stats["pairs_scored"] == 2
+    assert stats["batches_failed"] == 1
+    assert stats["pairs_failed"] == 1
+    # Waits of pairs in failed batches count too
+    assert stats["mean_wait_ms"] > 0
+
+def test_a_failing_batch_fails_its_only_request(executor):
+    scheduler = NLIBatchScheduler(RecordingScorer(fail_on="bad"), executor, window_ms=1, max_batch_size=16)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.score(*pairs(1, 2, text="bad")))
+    assert scheduler.get_stats()["pairs_failed"] == 2
+    assert scheduler.get_stats()["mean_wait_ms"] > 0
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from services.rate_limiter import ModelWaitQueues, RateLimiter
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+def test_wait_queues_release_a_model_once_its_wait_has_passed():
+    queues = ModelWaitQueues()
+    queues.park("gpt-4", "a", wait=0.05)
+    queues.park("gpt-4", "b")
+    queues.park("gpt-3.5-turbo", "c", wait=0.0)
+
+    assert queues.release_due() == ["c"]
+    assert queues.holds("gpt-4") and len(queues) == 2
+    time.sleep(0.06)
+    assert queues.release_due() == ["a", "b"]
+    assert len(queues) == 0 and queues.next_due() is None
+
+def test_throttled_model_does_not_block_other_models(llm_manager):
+    manager = llm_manager
+    manager.rate_limiter = RateLimiter({"gpt-4": {"rpm": 60}})
+    manager.rate_limiter.block("gpt-4", 1.0)  # As after a 429 with Retry-After: 1
+
+    async def run():
+        throttled = asyncio.ensure_future(manager.submit_request_async(MESSAGES, "analysis", "gpt-4"))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        other = await manager.submit_request_async(MESSAGES, "analysis", "gpt-3.5-turbo")
+        other_latency = time.monotonic() - started
+        return other, other_latency, await throttled
+
+    other, other_latency, throttled = asyncio.run(run())
+
+    assert "error" not in other and "error" not in throttled
+    assert other_latency < 0.5
+    assert manager.rate_limiter.throttled >= 1
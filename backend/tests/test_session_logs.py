@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+from services.logger import EVENTS_FILE, view_by_question, view_by_uuid, view_list
+from utils.session_logs import INDEX_FILE, LogStore, SessionLog, materialize_legacy
+
+EVENTS = [
+    {"type": "session_start", "sessionId": "s1"},
+    {"type": "segment_edit", "uuid": "a", "question_idx": 0, "text": "first"},
+    {"type": "segment_edit", "uuid": "b", "question_idx": 1, "text": "second"},
+    {"type": "analysis_complete", "uuid": "a"},
+    {"type": "stability_check", "question_idx": 1},
+    {"type": "segment_edit", "uuid": "a", "question_idx": 0, "text": "first, edited"},
+]
+
+def append(session_dir, events, torn: str = ""):
+    with open(os.path.join(session_dir, EVENTS_FILE), 'a') as f:
+        for i, event in enumerate(events):
+            f.write(json.dumps({"logged_at": f"2024-01-01T00:00:{i:02d}", "event": event}) + "\n")
+        f.write(torn)
+
+@pytest.fixture
+def session_dir(tmp_path):
+    path = tmp_path / "s1"
+    path.mkdir()
+    append(str(path), EVENTS)
+    return str(path)
+
+def test_index_groups_offsets_by_type_uuid_and_question(session_dir):
+    log = SessionLog(session_dir)
+
+    assert log.count() == len(EVENTS)
+    assert log.count("segment_edit") == 3
+    assert [e["text"] for e in log.events("segment_edit", uuid="a")] == ["first", "first, edited"]
+    assert [e["type"] for e in log.events(question_idx=1)] == ["segment_edit", "stability_check"]
+    assert list(log.events(where=lambda e: e.get("uuid") == "b")) == [EVENTS[2]]
+    assert os.path.exists(os.path.join(session_dir, INDEX_FILE))
+
+def test_index_is_extended_from_where_it_stopped(session_dir, monkeypatch):
+    SessionLog(session_dir).index
+    indexed_size = os.path.getsize(os.path.join(session_dir, EVENTS_FILE))
+    append(session_dir, [{"type": "segment_edit", "uuid": "c", "question_idx": 2, "text": "third"}])
+
+    log = SessionLog(session_dir)
+    scan = log.scan
+    starts = []
+    monkeypatch.setattr(log, "scan", lambda start=0: starts.append(start) or scan(start))
+
+    assert log.count("segment_edit") == 4
+    assert starts == [indexed_size]
+    assert [e["uuid"] for e in log.events("segment_edit")] == ["a", "b", "a", "c"]
+
+def test_torn_last_line_is_skipped_until_complete(session_dir):
+    line = json.dumps({"logged_at": "2024-01-01T00:01:00", "event": {"type": "segment_edit", "uuid": "d"}})
+    append(session_dir, [], torn=line[:20])
+
+    assert SessionLog(session_dir).count() == len(EVENTS)
+
+    with open(os.path.join(session_dir, EVENTS_FILE), 'a') as f:
+        f.write(line[20:] + "\n")
+    assert [e["uuid"] for e in SessionLog(session_dir).events(uuid="d")] == ["d"]
+
+def test_index_is_rebuilt_when_the_log_shrinks(session_dir):
+    SessionLog(session_dir).index
+    os.remove(os.path.join(session_dir, EVENTS_FILE))
+    append(session_dir, EVENTS[:2])
+
+    assert SessionLog(session_dir).count() == 2
+
+def test_materialize_legacy_matches_the_read_time_views(session_dir, tmp_path):
+    out_dir = str(tmp_path / "legacy")
+    written = materialize_legacy(session_dir, out_dir)
+
+    def load(name):
+        with open(os.path.join(out_dir, name)) as f:
+            return json.load(f)
+
+    assert sorted(os.path.basename(path) for path in written) == ["segment_edits.json", "session_start.json", "stability_check.json"]
+    assert load("segment_edits.json") == view_by_uuid(session_dir, "segment_edit")
+    assert load("stability_check.json") == view_by_question(session_dir, "stability_check")
+    assert load("session_start.json") == view_list(session_dir, "session_start")
+
+def test_materialized_question_files_keep_events_without_a_question(session_dir, tmp_path):
+    append(session_dir, [
+        {"type": "requirement_generation", "question_idx": 2, "requirements": []},
+        {"type": "requirement_generation", "requirements": ["unscoped"]},
+        {"type": "requirement_generation", "question_id": 3, "requirements": []},
+    ])
+    out_dir = str(tmp_path / "legacy")
+    materialize_legacy(session_dir, out_dir)
+
+    with open(os.path.join(out_dir, "requirement_generation.json")) as f:
+        materialized = json.load(f)
+    assert list(materialized) == ["2", "None"]
+    assert len(materialized["None"]) == 2
+    assert materialized == view_by_question(session_dir, "requirement_generation")
+
+def test_store_summarizes_sessions_and_pairs_latencies(session_dir, tmp_path):
+    store = LogStore(str(tmp_path))
+
+    summaries = store.build_sessions_index()
+    assert summaries["s1"]["events"] == len(EVENTS)
+    assert summaries["s1"]["questions"] == ["0", "1"]
+    assert store.count_by(lambda e: e.get("uuid"), event_type="segment_edit") == {"a": 2, "b": 1}
+
+    latencies = list(store.latencies("segment_edit", "analysis_complete"))
+    assert [(l["uuid"], l["latency"]) for l in latencies] == [("a", 2.0)]
@@ -0,0 +1,21 @@
+import pytest
+
+from services import session_registry
+from services.session_registry import SessionRegistry
+from services.session_store import InMemorySessionStore
+
+def test_registry_builds_shared_resources_without_a_consistency_service(config, monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("ConsistencyService (and its NLI model) built by the registry")
+    monkeypatch.setattr(session_registry, "ConsistencyService", unexpected)
+    monkeypatch.setattr(config, "nli_prefilter_mode", "off")
+
+    registry = SessionRegistry(llm_manager=None, logger=None, store=InMemorySessionStore(ttl=0))
+
+    assert registry.score_cache.max_entries == config.nli_score_cache_size
+    assert registry.candidate_filter is None
+
+def test_registry_rejects_unknown_prefilter_mode(config, monkeypatch):
+    monkeypatch.setattr(config, "nli_prefilter_mode", "sometimes")
+    with pytest.raises(ValueError, match="pre-filter mode"):
+        SessionRegistry(llm_manager=None, logger=None, store=InMemorySessionStore(ttl=0))
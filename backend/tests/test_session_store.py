@@ -0,0 +1,290 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from services.analysis_service import AnalysisService
+from services.requirement_service import RequirementService
+from services.session_store import (
+    TYPE_KEY, decode_state, encode_state, InMemorySessionStore, SQLiteSessionStore, RedisSessionStore
+)
+
+class WatchError(Exception):
+    """What StubRedis raises on EXEC after a watched key changed (cf. redis.WatchError)"""
+
+class StubRedis:
+    """In-process stand-in for the redis client commands RedisSessionStore uses"""
+    def __init__(self):
+        self.hashes = {}
+        self.writes = {}  # Writes per key, checked on EXEC by watching pipelines
+        self.ttls = {}
+        self.on_multi = None  # Runs once between WATCH and EXEC, to simulate another writer
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hmget(self, key, *fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({field: str(value).encode() for field, value in mapping.items()})
+        self.writes[key] = self.writes.get(key, 0) + 1
+        return len(mapping)
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.writes[key] = self.writes.get(key, 0) + 1
+
+    def pipeline(self):
+        return StubPipeline(self)
+
+class StubPipeline:
+    """Commands run right away while watching, and are queued for EXEC otherwise"""
+    def __init__(self, client):
+        self.client = client
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self.watched = {}
+        self.immediate = False
+        self.commands = []
+
+    def _command(self, name, *args, **kwargs):
+        if self.immediate:
+            return getattr(self.client, name)(*args, **kwargs)
+        self.commands.append((name, args, kwargs))
+        return self
+
+    def hget(self, *args, **kwargs):
+        return self._command('hget', *args, **kwargs)
+
+    def hmget(self, *args, **kwargs):
+        return self._command('hmget', *args, **kwargs)
+
+    def hset(self, *args, **kwargs):
+        return self._command('hset', *args, **kwargs)
+
+    def expire(self, *args, **kwargs):
+        return self._command('expire', *args, **kwargs)
+
+    def watch(self, key):
+        self.watched[key] = self.client.writes.get(key, 0)
+        self.immediate = True
+
+    def unwatch(self):
+        self.watched = {}
+        self.immediate = False
+
+    def multi(self):
+        self.immediate = False
+        on_multi, self.client.on_multi = self.client.on_multi, None
+        if on_multi is not None:
+            on_multi()
+
+    def execute(self):
+        try:
+            if any(self.client.writes.get(key, 0) != writes for key, writes in self.watched.items()):
+                raise WatchError()
+            return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        finally:
+            self.reset()
+
+class EventSink:
+    def log(self, data):
+        pass
+
+class StubConsistency:
+    """Stands in for ConsistencyService, whose NLI model isn't needed to hold state"""
+    contradiction_threshold = 0.9
+
+    async def reset_state(self, context_id=None):
+        pass
+
+def requirement_state():
+    service = RequirementService(llm_manager=None, logger=EventSink(), websocket_handler=None)
+
+    async def edit():
+        await service.handle_segment_update("a", "The app must be fast.", 0, 0)
+        await service.handle_segment_update("a", "The app must be fast and cheap.", 0, 0)
+        await service.handle_segment_update("b", "It should run offline.", 1, 0)
+    asyncio.run(edit())
+    service.requirements_state[2] = {"timestamp": 1.5, "discarded": False, "segments": ["a", "b"], "trigger_mode": "auto"}
+    service.baseline_requirements[2] = [{"id": 1, "text": "Offline mode"}]
+    return service
+
+def analysis_state():
+    service = AnalysisService(
+        llm_manager=None, websocket_handler=None, intervention_service=None,
+        logger=EventSink(), consistency_service=StubConsistency()
+    )
+    segments = {
+        "a": {"uuid": "a", "text": "It must work offline.", "question_idx": 0, "segment_idx": 0},
+        "b": {"uuid": "b", "text": "It needs a network connection.", "question_idx": 1, "segment_idx": 0},
+    }
+    service.segments = segments
+    service.analysis_status = {"a": "completed", "b": "completed"}
+    service.analysis_results = {"b": {"interventions": [{"type": "consistency", "contradiction_score": 0.95}]}}
+    service.contradiction_matrix.update("b", segments, {"a": np.float32(0.95)})
+    return service
+
+def test_requirement_service_state_round_trips():
+    service = requirement_state()
+    state = service.export_state()
+    assert isinstance(state["known_segment_uuids"], set)
+
+    restored = RequirementService(llm_manager=None, logger=EventSink(), websocket_handler=None)
+    restored.restore_state(decode_state(encode_state(state)))
+
+    assert restored.export_state() == state
+    assert 2 in restored.requirements_state and 2 in restored.baseline_requirements
+
+def test_analysis_service_state_round_trips():
+    service = analysis_state()
+    state = service.export_state()
+
+    restored = AnalysisService(
+        llm_manager=None, websocket_handler=None, intervention_service=None,
+        logger=EventSink(), consistency_service=StubConsistency()
+    )
+    restored.restore_state(decode_state(encode_state(state)))
+
+    assert restored.export_state() == state
+    assert restored.contradiction_matrix.row("b") == pytest.approx({"a": 0.95})
+    assert restored.get_active_contradictions(service.segments)[0]["segment_uuids"] == ["a", "b"]
+
+def test_containers_round_trip_without_losing_their_type():
+    state = {
+        "pair": ("a", 1),
+        "pairs": [("a", "b"), ["c", "d"]],
+        "by_question": {0: {"x"}, (1, 2): frozenset({3})},
+        "lookalikes": [{TYPE_KEY: "set", "items": [1]}, {"__set__": [1]}, {"__map__": []}],
+    }
+    decoded = decode_state(encode_state(state))
+
+    assert decoded == state
+    assert isinstance(decoded["pair"], tuple)
+    assert isinstance(decoded["pairs"][0], tuple) and isinstance(decoded["pairs"][1], list)
+    assert decoded["lookalikes"][0] == {TYPE_KEY: "set", "items": [1]}
+
+def test_numpy_values_become_plain_numbers():
+    decoded = decode_state(encode_state({"score": np.float32(0.5), "scores": np.array([1, 2])}))
+    assert decoded == {"score": 0.5, "scores": [1, 2]}
+    assert type(decoded["score"]) is float
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError, match="object"):
+        encode_state({"token": object()})
+
+def test_payload_in_another_format_is_rejected():
+    with pytest.raises(ValueError):
+        decode_state(json.dumps({"__map__": []}))
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: InMemorySessionStore(ttl=0),
+    lambda tmp_path: SQLiteSessionStore(path=str(tmp_path / "state.db"), ttl=0),
+    lambda tmp_path: RedisSessionStore(client=StubRedis(), ttl=0),
+])
+def test_stores_keep_encoded_snapshots(tmp_path, make_store):
+    store = make_store(tmp_path)
+    payload = encode_state({"requirements": requirement_state().export_state()})
+
+    assert store.save("s1", payload, "connection", 1)
+    assert decode_state(store.load("s1")) == decode_state(payload)
+    store.delete("s1")
+    assert store.load("s1") is None
+    store.close()
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: InMemorySessionStore(ttl=0),
+    lambda tmp_path: SQLiteSessionStore(path=str(tmp_path / "state.db"), ttl=0),
+    lambda tmp_path: RedisSessionStore(client=StubRedis(), ttl=0),
+])
+def test_saves_from_a_connection_that_lost_the_session_are_rejected(tmp_path, make_store):
+    store = make_store(tmp_path)
+    assert store.claim("s1", "old") is None
+    assert store.save("s1", "v1", "old", 1)
+    assert not store.save("s1", "v0", "old", 1)  # Out of order
+
+    assert store.claim("s1", "new") == "v1"
+    assert not store.save("s1", "stale", "old", 2)
+    assert store.save("s1", "v2", "new", 1)
+    assert store.load("s1") == "v2"
+    store.close()
+
+def test_redis_save_rechecks_the_owner_after_a_concurrent_claim():
+    client = StubRedis()
+    store = RedisSessionStore(client=client, ttl=60)
+    store.claim("s1", "old")
+    assert store.save("s1", "v1", "old", 1)
+
+    # Another worker claims the session between WATCH and EXEC
+    client.on_multi = lambda: store.claim("s1", "new")
+    assert not store.save("s1", "stale", "old", 2)
+    assert store.load("s1") == "v1"
+    assert store.save("s1", "v2", "new", 1)
+    assert client.ttls == {"mire:session:s1": 60}
+
+def test_redis_save_retries_when_the_watched_key_changes():
+    client = StubRedis()
+    store = RedisSessionStore(client=client, ttl=0)
+    store.claim("s1", "owner")
+
+    # A write that keeps the owner (e.g. the TTL refresh of a claim) only forces a retry
+    client.on_multi = lambda: client.hset("mire:session:s1", mapping={"owner": "owner"})
+    assert store.save("s1", "v1", "owner", 1)
+    assert store.load("s1") == "v1"
+
+class SessionLoggerStub:
+    def create_session_directory(self, session_id):
+        pass
+
+class InterventionStub:
+    async def reset_state(self, context_id=None):
+        pass
+
+def open_session(connection_id, store):
+    from services.session_registry import Session
+    return Session(
+        connection_id=connection_id, channel=None, logger=SessionLoggerStub(),
+        intervention_service=InterventionStub(),
+        requirement_service=RequirementService(llm_manager=None, logger=EventSink(), websocket_handler=None),
+        analysis_service=AnalysisService(
+            llm_manager=None, websocket_handler=None, intervention_service=None,
+            logger=EventSink(), consistency_service=StubConsistency()
+        ),
+        store=store, save_interval=0
+    )
+
+def test_stale_connection_does_not_overwrite_a_resumed_session(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "state.db"), ttl=0)
+
+    async def run():
+        stale = open_session("stale", store)
+        await stale.start("s1", "context1")
+        stale.state["segments"] = {"a": {"text": "first"}}
+        await stale.save(force=True)
+
+        resumed = open_session("resumed", store)
+        assert await resumed.resume("s1")
+        assert resumed.state["segments"] == {"a": {"text": "first"}}
+        resumed.state["segments"]["a"]["text"] = "edited after reconnect"
+        await resumed.save(force=True)
+
+        # The half-open connection finally notices it is gone
+        stale.state["segments"]["a"]["text"] = "stale"
+        await stale.save(force=True)
+
+    asyncio.run(run())
+    assert decode_state(store.load("s1"))["state"]["segments"]["a"]["text"] == "edited after reconnect"
+    store.close()
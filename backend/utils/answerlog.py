@@ -1,17 +1,266 @@
+"""
+Append-only record store for answer logs.
+
+Records are JSON objects framed as <length:u32><crc32:u32><payload> and appended
+to segment files that roll over at segment_size bytes. Each segment has a
+fixed-width index (one u64 byte offset per record), so record n is found with
+one seek into the index and one into the segment. Segments are named after the
+position of their first record:
+
+    answer_log/00000000000000000000.seg
+    answer_log/00000000000000000000.idx
+    answer_log/00000000000000001532.seg
+    ...
+
+Only the last segment is ever written. On open it is checked from its last
+indexed record onwards: index entries the segment doesn't back are dropped,
+complete records missing from the index are re-indexed, and a torn or corrupt
+tail is truncated, so a crash mid-append loses at most the record being written.
+A last segment left without any record (a crash during its first append) is
+removed, making the previous segment the tail again.
+
+Appends take an exclusive file lock (where fcntl is available) and pick up
+records appended by other processes first, so several writers can share a store.
+Reads do the same check (one stat of the tail segment), so they also see records
+appended by other processes.
+"""
+from typing import Any, Iterator, List
+import threading
+import logging
+import struct
+import bisect
 import json
+import mmap
+import zlib
 import os
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; appends are then only serialized within the process
+    fcntl = None
+
+HEADER = struct.Struct('<II')  # payload length, crc32 of payload
+OFFSET = struct.Struct('<Q')
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+LOCK_FILE = 'LOCK'
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+class CorruptRecordError(Exception):
+    """A record that fails its length or checksum check"""
+
 class AnswerLogger:
-    def __init__(self, log_file='answer_log.json'):
+    """
+    Segmented, indexed answer log.
+
+    log(data) appends a record; get(position), len() and records(start) read
+    them back, including records other writers appended (see refresh()), and
+    export_json() writes the whole log as a JSON list (the original
+    answer_log.json format). An existing answer_log.json is imported once on
+    first open and kept as answer_log.json.migrated.
+    """
+    def __init__(self, log_file='answer_log.json', segment_size: int = DEFAULT_SEGMENT_SIZE, fsync: bool = False):
         self.log_file = log_file
-        # Initialize the log file
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w') as f:
-                json.dump([], f)
+        self.store_dir = os.path.splitext(log_file)[0]
+        self.segment_size = segment_size
+        self.fsync = fsync
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(self.store_dir, LOCK_FILE), 'a')
+        self._bases: List[int] = []  # Position of the first record of each segment
+        self._tail_size = 0  # Bytes in the last segment known to hold complete records
+        self._count = 0
+        with self._exclusive():
+            self._load()
+            if self._count == 0 and log_file.endswith('.json') and os.path.isfile(log_file):
+                self._migrate(log_file)
 
     def log(self, data):
-        with open(self.log_file, 'r+') as f:
-            logs = json.load(f)
-            logs.append(data)
-            f.seek(0)
-            json.dump(logs, f, indent=2)
\ No newline at end of file
+        with self._exclusive():
+            self._refresh()
+            self._append(data)
+
+    def refresh(self):
+        """Pick up records appended by other writers since the last read or append"""
+        with self._exclusive():
+            self._refresh()
+
+    def __len__(self) -> int:
+        self.refresh()
+        return self._count
+
+    def get(self, position: int) -> Any:
+        """The record at position (0-based; negative counts from the end)"""
+        self.refresh()
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError(f"Record {position} out of range (0-{self._count - 1})")
+        base = self._bases[bisect.bisect_right(self._bases, position) - 1]
+        with open(self._path(base, INDEX_SUFFIX), 'rb') as index:
+            index.seek((position - base) * OFFSET.size)
+            offset, = OFFSET.unpack(index.read(OFFSET.size))
+        with open(self._path(base, SEGMENT_SUFFIX), 'rb') as segment:
+            segment.seek(offset)
+            header = segment.read(HEADER.size)
+            length, crc = HEADER.unpack(header)
+            return self._decode(segment.read(length), crc, position)
+
+    def records(self, start: int = 0) -> Iterator[Any]:
+        """Stream records in order from position start, reading segments through mmap"""
+        self.refresh()
+        count, bases = self._count, list(self._bases)
+        for i, base in enumerate(bases):
+            end = bases[i + 1] if i + 1 < len(bases) else count
+            if end <= max(start, base):  # Before start, or a segment without records
+                continue
+            with open(self._path(base, INDEX_SUFFIX), 'rb') as index:
+                index.seek(max(0, start - base) * OFFSET.size)
+                offset, = OFFSET.unpack(index.read(OFFSET.size))
+            with open(self._path(base, SEGMENT_SUFFIX), 'rb') as segment, \
+                    mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for position in range(max(start, base), end):
+                    length, crc = HEADER.unpack_from(view, offset)
+                    offset += HEADER.size
+                    yield self._decode(view[offset:offset + length], crc, position)
+                    offset += length
+
+    def export_json(self, path: str):
+        """Write every record as one JSON list, streaming, in the original answer_log.json format"""
+        with open(path, 'w') as f:
+            f.write("[")
+            for i, record in enumerate(self.records()):
+                f.write(("," if i else "") + "\n  " + json.dumps(record, indent=2).replace("\n", "\n  "))
+            f.write("\n]" if self._count else "]")
+
+    def close(self):
+        self._lock_file.close()
+
+    def _append(self, data):
+        payload = json.dumps(data).encode('utf-8')
+        record = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        if not self._bases or (self._tail_size > 0 and self._tail_size + len(record) > self.segment_size):
+            self._bases.append(self._count)
+            self._tail_size = 0
+        base = self._bases[-1]
+        with open(self._path(base, SEGMENT_SUFFIX), 'ab') as segment:
+            segment.write(record)
+            if self.fsync:
+                segment.flush()
+                os.fsync(segment.fileno())
+        # The index is written after the record, so a crash between the two is repaired on open
+        with open(self._path(base, INDEX_SUFFIX), 'ab') as index:
+            index.write(OFFSET.pack(self._tail_size))
+            if self.fsync:
+                index.flush()
+                os.fsync(index.fileno())
+        self._tail_size += len(record)
+        self._count += 1
+
+    def _decode(self, payload: bytes, crc: int, position: int) -> Any:
+        if zlib.crc32(payload) != crc:
+            raise CorruptRecordError(f"Checksum mismatch for record {position} in {self.store_dir}")
+        return json.loads(payload)
+
+    def _path(self, base: int, suffix: str) -> str:
+        return os.path.join(self.store_dir, f"{base:020d}{suffix}")
+
+    def _exclusive(self):
+        return _StoreLock(self._lock, self._lock_file)
+
+    def _refresh(self):
+        """Pick up records or segments appended by another writer since the last load"""
+        if not self._bases:
+            if self._segment_bases():
+                self._load()
+            return
+        tail = self._path(self._bases[-1], SEGMENT_SUFFIX)
+        if os.path.getsize(tail) != self._tail_size or os.path.exists(self._path(self._count, SEGMENT_SUFFIX)):
+            self._load()
+
+    def _segment_bases(self) -> List[int]:
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.store_dir)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def _load(self):
+        self._bases = self._segment_bases()
+        while self._bases:
+            base = self._bases[-1]
+            indexed = self._recover_tail(base)
+            if indexed or len(self._bases) == 1:
+                self._count = base + indexed
+                return
+            # A roll-over torn before its first record was complete: the previous segment is the tail again
+            logging.warning(f"⚠️ [AnswerLogger] Removing empty tail segment {self._path(base, SEGMENT_SUFFIX)}")
+            os.remove(self._path(base, SEGMENT_SUFFIX))
+            os.remove(self._path(base, INDEX_SUFFIX))
+            self._bases.pop()
+        self._count = self._tail_size = 0
+
+    def _recover_tail(self, base: int) -> int:
+        """Make the last segment and its index agree; returns the number of records in it"""
+        segment_path, index_path = self._path(base, SEGMENT_SUFFIX), self._path(base, INDEX_SUFFIX)
+        if not os.path.exists(index_path):
+            open(index_path, 'wb').close()
+        with open(index_path, 'rb') as f:
+            data = f.read()
+        offsets = [o for o, in OFFSET.iter_unpack(data[:len(data) - len(data) % OFFSET.size])]
+        segment_size = os.path.getsize(segment_path)
+
+        # Re-verify from the last indexed record: the index may point past a torn write
+        with open(segment_path, 'rb') as segment:
+            keep = len(offsets)
+            while keep and offsets[keep - 1] >= segment_size:
+                keep -= 1
+            offsets = offsets[:keep]
+            offset = offsets.pop() if offsets else 0
+            while offset + HEADER.size <= segment_size:
+                segment.seek(offset)
+                length, crc = HEADER.unpack(segment.read(HEADER.size))
+                if offset + HEADER.size + length > segment_size:
+                    break
+                if zlib.crc32(segment.read(length)) != crc:
+                    break
+                offsets.append(offset)
+                offset += HEADER.size + length
+        if offset < segment_size:
+            logging.warning(f"⚠️ [AnswerLogger] Truncating {segment_size - offset} bytes of torn tail in {segment_path}")
+            with open(segment_path, 'r+b') as segment:
+                segment.truncate(offset)
+        rebuilt = b"".join(OFFSET.pack(o) for o in offsets)
+        if rebuilt != data:
+            with open(index_path, 'wb') as f:
+                f.write(rebuilt)
+        self._tail_size = offset
+        return len(offsets)
+
+    def _migrate(self, legacy_file: str):
+        """Import the records of a legacy answer_log.json list"""
+        try:
+            with open(legacy_file, 'r') as f:
+                records = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.error(f"❌ [AnswerLogger] Could not import {legacy_file}: {e}")
+            return
+        for record in records if isinstance(records, list) else [records]:
+            self._append(record)
+        os.replace(legacy_file, legacy_file + '.migrated')
+        logging.info(f"Imported {self._count} records from {legacy_file} into {self.store_dir}")
+
+class _StoreLock:
+    """Thread lock plus, where available, an exclusive flock on the store's LOCK file"""
+    def __init__(self, lock: threading.Lock, lock_file):
+        self.lock = lock
+        self.lock_file = lock_file
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+        self.lock.release()
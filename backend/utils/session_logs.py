@@ -0,0 +1,321 @@
+"""
+Streaming queries over session event logs.
+
+Works on the layout written by services.logger.Logger: one directory per session
+holding an append-only events.jsonl of {"logged_at", "event"} lines. Events are
+read lazily with generators. A small index next to each log (events.index.json)
+stores the byte offsets of events by type, uuid and question_idx, so filtered
+queries seek straight to the matching lines instead of reading whole files. The
+index is extended incrementally as the log grows. A root sessions.index.json
+summarizes every session.
+
+Legacy per-type JSON files (segment_edits.json, stability_check.json, ...) can be
+regenerated on demand with materialize_legacy().
+
+Usage (from backend/):
+    python -m utils.session_logs logs sessions
+    python -m utils.session_logs logs count --by type [--session ID]
+    python -m utils.session_logs logs query --type segment_edit [--uuid U] [--question Q] [--session ID]
+    python -m utils.session_logs logs latency --start segment_edit --end analysis_complete [--key uuid]
+    python -m utils.session_logs logs materialize --session ID [--out DIR]
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import statistics
+import argparse
+import json
+import os
+
+from services.logger import EVENTS_FILE, UUID_EVENT_TYPES, LIST_EVENT_TYPES, QUESTION_EVENT_TYPES
+
+INDEX_FILE = "events.index.json"
+SESSIONS_INDEX_FILE = "sessions.index.json"
+INDEX_VERSION = 1
+
+def _question_of(event: Dict) -> Optional[str]:
+    question = event.get("question_idx", event.get("questionIdx", event.get("question_id")))
+    return str(question) if question is not None else None
+
+def _uuid_of(event: Dict) -> Optional[str]:
+    return event.get("uuid")
+
+class SessionLog:
+    """Lazy, indexed access to one session's events.jsonl"""
+    def __init__(self, session_dir: str):
+        self.session_dir = session_dir
+        self.session_id = os.path.basename(os.path.normpath(session_dir))
+        self.path = os.path.join(session_dir, EVENTS_FILE)
+        self.index_path = os.path.join(session_dir, INDEX_FILE)
+        self._index = None
+
+    def scan(self, start: int = 0) -> Iterator[Tuple[int, str, Dict]]:
+        """
+        (offset, logged_at, event) for every complete, readable line from byte offset start.
+        Afterwards scanned_to is the offset just past the last complete line.
+        """
+        self.scanned_to = start
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    return  # Torn or still being written
+                offset, self.scanned_to = self.scanned_to, self.scanned_to + len(raw)
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and "event" in record:
+                    yield offset, record.get("logged_at"), record["event"]
+
+    @property
+    def index(self) -> Dict:
+        """On-disk index, extended with any events appended since it was last built"""
+        if self._index is None and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    self._index = json.load(f)
+                if self._index.get("version") != INDEX_VERSION:
+                    self._index = None
+            except (json.JSONDecodeError, OSError):
+                self._index = None
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self._index is None or self._index["size"] > size:
+            self._index = {
+                "version": INDEX_VERSION, "size": 0, "count": 0, "first_logged_at": None, "last_logged_at": None,
+                "by_type": {}, "by_uuid": {}, "by_question": {}
+            }
+        if self._index["size"] < size:
+            self._extend_index(self._index)
+        return self._index
+
+    def _extend_index(self, index: Dict):
+        for offset, logged_at, event in self.scan(index["size"]):
+            index["count"] += 1
+            index["first_logged_at"] = index["first_logged_at"] or logged_at
+            index["last_logged_at"] = logged_at
+            index["by_type"].setdefault(str(event.get("type")), []).append(offset)
+            if _uuid_of(event) is not None:
+                index["by_uuid"].setdefault(str(_uuid_of(event)), []).append(offset)
+            if _question_of(event) is not None:
+                index["by_question"].setdefault(_question_of(event), []).append(offset)
+        index["size"] = self.scanned_to  # Resume after the last complete line next time
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _offsets(self, event_type: Optional[str], uuid: Optional[str], question_idx) -> Optional[List[int]]:
+        """Offsets matching every given filter (sorted), or None if no indexed filter was given"""
+        index = self.index
+        candidates = []
+        if event_type is not None:
+            candidates.append(index["by_type"].get(event_type, []))
+        if uuid is not None:
+            candidates.append(index["by_uuid"].get(uuid, []))
+        if question_idx is not None:
+            candidates.append(index["by_question"].get(str(question_idx), []))
+        if not candidates:
+            return None
+        smallest = min(candidates, key=len)
+        others = [set(c) for c in candidates if c is not smallest]
+        return [offset for offset in smallest if all(offset in other for other in others)]
+
+    def events(self, event_type: str = None, uuid: str = None, question_idx=None,
+               where: Callable[[Dict], bool] = None, with_logged_at: bool = False) -> Iterator:
+        """Stream matching events in log order; where is an extra predicate on the event"""
+        offsets = self._offsets(event_type, uuid, question_idx)
+        if offsets is None:
+            records = ((logged_at, event) for _, logged_at, event in self.scan())
+        else:
+            records = self._read_at(offsets)
+        for logged_at, event in records:
+            if where is None or where(event):
+                yield (logged_at, event) if with_logged_at else event
+
+    def _read_at(self, offsets: List[int]) -> Iterator[Tuple[str, Dict]]:
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                record = json.loads(f.readline())
+                yield record["logged_at"], record["event"]
+
+    def count(self, event_type: str = None, uuid: str = None, question_idx=None) -> int:
+        offsets = self._offsets(event_type, uuid, question_idx)
+        return self.index["count"] if offsets is None else len(offsets)
+
+    def summary(self) -> Dict:
+        index = self.index
+        return {
+            "session": self.session_id,
+            "events": index["count"],
+            "first_logged_at": index["first_logged_at"],
+            "last_logged_at": index["last_logged_at"],
+            "types": {event_type: len(offsets) for event_type, offsets in index["by_type"].items()},
+            "uuids": len(index["by_uuid"]),
+            "questions": sorted(index["by_question"])
+        }
+
+class LogStore:
+    """All sessions under a Logger base directory"""
+    def __init__(self, log_root: str):
+        self.log_root = log_root
+
+    def sessions(self) -> Iterator[SessionLog]:
+        for name in sorted(os.listdir(self.log_root)):
+            session_dir = os.path.join(self.log_root, name)
+            if os.path.isfile(os.path.join(session_dir, EVENTS_FILE)):
+                yield SessionLog(session_dir)
+
+    def session(self, session_id: str) -> SessionLog:
+        return SessionLog(os.path.join(self.log_root, session_id))
+
+    def _select(self, session_id: Optional[str]) -> Iterator[SessionLog]:
+        return iter([self.session(session_id)]) if session_id else self.sessions()
+
+    def build_sessions_index(self) -> Dict[str, Dict]:
+        """Refresh every session index and write the root sessions.index.json"""
+        summaries = {log.session_id: log.summary() for log in self.sessions()}
+        tmp_path = os.path.join(self.log_root, SESSIONS_INDEX_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(summaries, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.log_root, SESSIONS_INDEX_FILE))
+        return summaries
+
+    def events(self, session_id: str = None, **filters) -> Iterator[Tuple[str, Dict]]:
+        """(session_id, event) for matching events of one or all sessions"""
+        for log in self._select(session_id):
+            for event in log.events(**filters):
+                yield log.session_id, event
+
+    def count_by(self, key: Callable[[Dict], Any], session_id: str = None, **filters) -> Dict[Any, int]:
+        counts = {}
+        for _, event in self.events(session_id, **filters):
+            value = key(event)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def latencies(self, start_type: str, end_type: str, key: str = "uuid", session_id: str = None) -> Iterator[Dict]:
+        """
+        Pair each end event with the latest preceding start event of the same key
+        (e.g. segment_edit -> analysis_complete per uuid) and yield the latency in seconds.
+        """
+        for log in self._select(session_id):
+            started = {}
+            offsets = sorted(
+                [(o, 's') for o in log.index["by_type"].get(start_type, [])] +
+                [(o, 'e') for o in log.index["by_type"].get(end_type, [])]
+            )
+            records = log._read_at([o for o, _ in offsets])
+            for (_, kind), (logged_at, event) in zip(offsets, records):
+                value = event.get(key)
+                if kind == 's':
+                    started[value] = (logged_at, event)
+                elif value in started:
+                    start_logged_at, start_event = started.pop(value)
+                    yield {
+                        "session": log.session_id,
+                        key: value,
+                        "latency": (datetime.fromisoformat(logged_at) - datetime.fromisoformat(start_logged_at)).total_seconds(),
+                        "start": start_event,
+                        "end": event
+                    }
+
+def materialize_legacy(session_dir: str, out_dir: str = None) -> List[str]:
+    """
+    Regenerate the legacy per-type JSON files of a session from its event log.
+    Events are streamed to disk through the index, one group at a time.
+    """
+    log = SessionLog(session_dir)
+    out_dir = out_dir or session_dir
+    os.makedirs(out_dir, exist_ok=True)
+    index = log.index
+    written = []
+
+    def write_grouped(path: str, groups: Dict[str, List[int]]):
+        with open(path, 'w') as f:
+            f.write("{")
+            for i, (group, offsets) in enumerate(groups.items()):
+                events = [event for _, event in log._read_at(offsets)]
+                f.write(("," if i else "") + "\n  " + json.dumps(group) + ": " + json.dumps(events, indent=2).replace("\n", "\n  "))
+            f.write("\n}" if groups else "}")
+
+    for event_type in UUID_EVENT_TYPES + QUESTION_EVENT_TYPES + LIST_EVENT_TYPES + ["survey_submission"]:
+        offsets = index["by_type"].get(event_type)
+        if not offsets:
+            continue
+        if event_type in UUID_EVENT_TYPES:
+            # Intersect the type's offsets with the uuid index; groups in order of first appearance
+            of_type = set(offsets)
+            groups = {}
+            for key, key_offsets in index["by_uuid"].items():
+                matching = [o for o in key_offsets if o in of_type]
+                if matching:
+                    groups[key] = matching
+            groups = dict(sorted(groups.items(), key=lambda item: item[1][0]))
+            path = os.path.join(out_dir, f"{event_type}s.json")
+            write_grouped(path, groups)
+        elif event_type in QUESTION_EVENT_TYPES:
+            # Legacy files key on str(question_idx) only, so events without one go to "None"
+            groups = {}
+            for offset, (_, event) in zip(offsets, log._read_at(offsets)):
+                groups.setdefault(str(event.get("question_idx")), []).append(offset)
+            path = os.path.join(out_dir, f"{event_type}.json")
+            write_grouped(path, groups)
+        else:
+            path = os.path.join(out_dir, f"{event_type}.json")
+            with open(path, 'w') as f:
+                json.dump([event for _, event in log._read_at(offsets)], f, indent=2)
+        written.append(path)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log_root', help='Logger base directory (e.g. backend/logs)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('sessions', help='Summarize every session (and write sessions.index.json)')
+    count = commands.add_parser('count', help='Count events grouped by a field')
+    count.add_argument('--by', default='type')
+    query = commands.add_parser('query', help='Print matching events as JSON lines')
+    latency = commands.add_parser('latency', help='Latency from a start event to the next end event with the same key')
+    latency.add_argument('--start', required=True)
+    latency.add_argument('--end', required=True)
+    latency.add_argument('--key', default='uuid')
+    materialize = commands.add_parser('materialize', help='Regenerate the legacy per-type JSON files of a session')
+    materialize.add_argument('--out')
+    for command in (count, query, latency, materialize):
+        command.add_argument('--session', required=command is materialize)
+    for command in (count, query):
+        command.add_argument('--type')
+        command.add_argument('--uuid')
+        command.add_argument('--question')
+    args = parser.parse_args()
+
+    store = LogStore(args.log_root)
+    if args.command == 'sessions':
+        for summary in store.build_sessions_index().values():
+            print(json.dumps(summary))
+    elif args.command == 'count':
+        counts = store.count_by(
+            lambda e: e.get(args.by), args.session, event_type=args.type, uuid=args.uuid, question_idx=args.question
+        )
+        for value, n in sorted(counts.items(), key=lambda item: -item[1]):
+            print(f"{n:>8}  {value}")
+    elif args.command == 'query':
+        for session_id, event in store.events(args.session, event_type=args.type, uuid=args.uuid, question_idx=args.question):
+            print(json.dumps({"session": session_id, "event": event}))
+    elif args.command == 'latency':
+        values = [r["latency"] for r in store.latencies(args.start, args.end, args.key, args.session)]
+        if values:
+            ordered = sorted(values)
+            print(f"n={len(values)} mean={statistics.mean(values):.3f}s p50={statistics.median(values):.3f}s "
+                  f"p95={ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]:.3f}s max={ordered[-1]:.3f}s")
+        else:
+            print("No matching event pairs")
+    elif args.command == 'materialize':
+        for path in materialize_legacy(os.path.join(args.log_root, args.session), args.out):
+            print(path)
+
+if __name__ == '__main__':
+    main()
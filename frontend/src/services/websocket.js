@@ -29,6 +29,7 @@ export class WebSocketService {
         // Send initial state using direct property access
         this.sendMessage({
           type: 'sync_state',
+          sessionId: this.sessionId,  // Lets the backend resume the session after a reconnect
           segments: this.store.segments,
           analysisStatus: this.store.analysisStatus
         });
@@ -146,6 +147,14 @@ export class WebSocketService {
           }, 5000);
           break;
 
+        case 'survey_archive_complete':
+          console.log('Survey archive stored:', data);
+          break;
+
+        case 'survey_archive_failed':
+          console.error('Survey archive failed:', data);
+          break;
+
         default:
           console.warn('Unknown message type:', data.type);
       }